@@ -61,6 +61,76 @@ class Settings(BaseSettings):
         description="Comma-separated list of email addresses allowed to invite users.",
     )
     dev_auth_bypass: bool = Field(default=False, alias="DEV_AUTH_BYPASS")
+    firebase_local_token_verification: bool = Field(
+        default=True,
+        alias="FIREBASE_LOCAL_TOKEN_VERIFICATION",
+        description="Verify ID tokens against in-memory signing keys instead of firebase_admin.",
+    )
+    firebase_keys_refresh_margin_seconds: float = Field(
+        default=300.0,
+        alias="FIREBASE_KEYS_REFRESH_MARGIN_SECONDS",
+        description="How long before the signing keys expire the background refresh runs.",
+    )
+    auth_token_cache_size: int = Field(
+        default=4096,
+        alias="AUTH_TOKEN_CACHE_SIZE",
+        description="Maximum number of verified ID tokens kept in memory.",
+    )
+    profile_cache_ttl_seconds: float = Field(
+        default=60.0,
+        alias="PROFILE_CACHE_TTL_SECONDS",
+        description="How long user profiles read from Firestore are reused.",
+    )
+    profile_cache_size: int = Field(
+        default=2048,
+        alias="PROFILE_CACHE_SIZE",
+        description="Maximum number of user profiles kept in memory.",
+    )
+    exists_cache_size: int = Field(
+        default=10000,
+        alias="EXISTS_CACHE_SIZE",
+        description="Maximum ids kept per collection in the reference existence cache.",
+    )
+    collection_page_size_default: int = Field(
+        default=100,
+        alias="COLLECTION_PAGE_SIZE_DEFAULT",
+        description="Page size used by paginated collection listings without a limit.",
+    )
+    collection_page_size_max: int = Field(
+        default=1000,
+        alias="COLLECTION_PAGE_SIZE_MAX",
+        description="Largest page a collection listing may request.",
+    )
+    batch_create_max_items: int = Field(
+        default=5000,
+        alias="BATCH_CREATE_MAX_ITEMS",
+        description="Largest array accepted by POST /collections/{name}:batchCreate.",
+    )
+    billing_max_concurrent_chunks: int = Field(
+        default=8,
+        alias="BILLING_MAX_CONCURRENT_CHUNKS",
+        description="Invoice write batches a billing run commits concurrently.",
+    )
+    branch_stats_shards: int = Field(
+        default=10,
+        alias="BRANCH_STATS_SHARDS",
+        description="Counter shards per branchStats document; each takes about one write per second.",
+    )
+    student_roster_chunks: int = Field(
+        default=2,
+        alias="STUDENT_ROSTER_CHUNKS",
+        description="Roster documents per branch served by GET /students (about 7k students each).",
+    )
+    change_feed_max_pending: int = Field(
+        default=100,
+        alias="CHANGE_FEED_MAX_PENDING",
+        description="Undelivered change batches a feed subscriber may queue before it is dropped.",
+    )
+    change_feed_heartbeat_seconds: float = Field(
+        default=15.0,
+        alias="CHANGE_FEED_HEARTBEAT_SECONDS",
+        description="Idle interval after which a keep-alive comment is sent on change feeds.",
+    )
 
     @property
     def super_admin_emails(self) -> list[str]:
@@ -1,32 +1,126 @@
 """Authentication dependencies for FastAPI routes."""
 from __future__ import annotations
 
-import firebase_admin
+import asyncio
+import hashlib
+import json
+from functools import lru_cache
+from typing import Any
+
 from fastapi import Header, HTTPException, status
-from firebase_admin import auth as fb_auth, credentials
+from firebase_admin import auth as fb_auth
 
+from backend.cache_utils import ExpiringLRUCache
 from backend.config import get_settings
+from backend.deps.token_verifier import (
+    FirebaseTokenVerifier,
+    SigningKeyStore,
+    SigningKeysUnavailableError,
+)
 from backend.logging_utils import get_logger
+from backend.reps.firebase import ensure_firebase_initialized as _ensure_firebase_initialized
 from backend.services.users import get_user_profile
 
 logger = get_logger(__name__)
 
+_token_cache: ExpiringLRUCache[str, dict[str, Any]] | None = None
+_verifier: FirebaseTokenVerifier | None = None
 
-def _ensure_firebase_initialized() -> None:
-    if firebase_admin._apps:
-        return
+
+@lru_cache(maxsize=4)
+def _project_id_from_file(path: str) -> str | None:
+    try:
+        with open(path, encoding="utf-8") as handle:
+            return json.load(handle).get("project_id")
+    except (OSError, ValueError):
+        return None
+
+
+def _resolve_project_id() -> str | None:
     settings = get_settings()
-    cred = None
-    if settings.firebase_credentials_file:
-        cred = credentials.Certificate(settings.firebase_credentials_file)
-    options = {}
     if settings.firebase_project_id:
-        options["projectId"] = settings.firebase_project_id
-    firebase_admin.initialize_app(cred, options or None)
-    logger.info(
-        "firebase admin initialized",
-        extra={"component": "auth", "project_id": settings.firebase_project_id},
-    )
+        return settings.firebase_project_id
+    if settings.firebase_credentials_file:
+        return _project_id_from_file(settings.firebase_credentials_file)
+    return None
+
+
+def get_token_verifier() -> FirebaseTokenVerifier | None:
+    """Return the local verifier, or ``None`` when it cannot be configured."""
+
+    global _verifier
+    if _verifier is None:
+        settings = get_settings()
+        if not settings.firebase_local_token_verification:
+            return None
+        project_id = _resolve_project_id()
+        if not project_id:
+            return None
+        key_store = SigningKeyStore(refresh_margin=settings.firebase_keys_refresh_margin_seconds)
+        _verifier = FirebaseTokenVerifier(project_id, key_store)
+    return _verifier
+
+
+def start_token_verifier() -> None:
+    """Prime the signing keys and start their background refresh (app startup)."""
+
+    if get_settings().dev_auth_bypass:
+        return
+    verifier = get_token_verifier()
+    if verifier is not None:
+        verifier.key_store.start()
+
+
+def stop_token_verifier() -> None:
+    if _verifier is not None:
+        _verifier.key_store.stop()
+
+
+def _get_token_cache() -> ExpiringLRUCache[str, dict[str, Any]]:
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = ExpiringLRUCache(get_settings().auth_token_cache_size)
+    return _token_cache
+
+
+def reset_token_cache() -> None:
+    """Drop every cached token verification (handy in tests)."""
+
+    global _token_cache
+    _token_cache = None
+
+
+def token_cache_stats() -> dict[str, int]:
+    """Expose hit/miss counters of the verified token cache."""
+
+    return _get_token_cache().stats()
+
+
+def _verify_with_firebase_admin(token: str) -> dict[str, Any]:
+    _ensure_firebase_initialized()
+    return fb_auth.verify_id_token(token)
+
+
+async def _verify_token(token: str) -> dict[str, Any]:
+    """Verify ``token``, reusing earlier verifications until the token expires."""
+
+    cache = _get_token_cache()
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    decoded = cache.get(key)
+    if decoded is not None:
+        return decoded
+
+    verifier = get_token_verifier()
+    if verifier is not None:
+        # Only reads in-memory keys; a cold key store raises instead of downloading.
+        decoded = verifier.verify(token)
+    else:
+        # firebase_admin may download signing keys, so keep it off the event loop.
+        decoded = await asyncio.to_thread(_verify_with_firebase_admin, token)
+    expires_at = decoded.get("exp")
+    if isinstance(expires_at, (int, float)):
+        cache.set(key, decoded, float(expires_at))
+    return decoded
 
 
 def _dev_user() -> dict[str, str | list[str]]:
@@ -35,7 +129,7 @@ def _dev_user() -> dict[str, str | list[str]]:
     return {"uid": "dev", "roles": ["admin", "super_admin"], "branchId": "1", "email": "dev@example.com"}
 
 
-def get_user(x_firebase_token: str | None = Header(default=None)) -> dict[str, str | list[str] | None]:
+async def get_user(x_firebase_token: str | None = Header(default=None)) -> dict[str, str | list[str] | None]:
     """Validate a Firebase ID token and return the caller context."""
 
     settings = get_settings()
@@ -48,18 +142,29 @@ def get_user(x_firebase_token: str | None = Header(default=None)) -> dict[str, s
             detail="missing firebase token",
         )
 
-    _ensure_firebase_initialized()
-
     try:
-        decoded = fb_auth.verify_id_token(x_firebase_token)
-    except Exception as exc:  # pragma: no cover - firebase_admin specific
+        decoded = await _verify_token(x_firebase_token)
+    except SigningKeysUnavailableError as exc:
+        logger.warning("signing keys unavailable", extra={"component": "auth", "error": str(exc)})
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="token verification temporarily unavailable",
+            headers={"Retry-After": "1"},
+        ) from exc
+    except Exception as exc:
         logger.warning("invalid firebase token", extra={"component": "auth", "error": str(exc)})
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="invalid token",
         ) from exc
 
-    profile = get_user_profile(decoded["uid"]) or {}
+    # Tokens minted after provisioning carry roles/branchId as custom claims, so the
+    # profile read is only needed for older tokens; routes that want the full
+    # profile (e.g. /users/me) load it lazily through the profile cache.
+    if decoded.get("roles") and decoded.get("branchId"):
+        profile: dict[str, Any] = {}
+    else:
+        profile = await get_user_profile(decoded["uid"]) or {}
 
     roles = decoded.get("roles") or profile.get("roles") or ["student"]
     branch_id = decoded.get("branchId") or profile.get("branchId")
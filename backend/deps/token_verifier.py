@@ -0,0 +1,236 @@
+"""Local Firebase ID token verification backed by in-memory signing keys."""
+from __future__ import annotations
+
+import json
+import re
+import threading
+import time
+import urllib.request
+from typing import Any, Callable
+
+from google.auth import exceptions as google_exceptions
+from google.auth import jwt
+
+from backend.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+ID_TOKEN_CERT_URL = (
+    "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+)
+ID_TOKEN_ISSUER_PREFIX = "https://securetoken.google.com/"
+
+KeyFetcher = Callable[[], tuple[dict[str, str], float | None]]
+
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+
+
+class TokenVerificationError(Exception):
+    """Raised when an ID token cannot be verified locally."""
+
+
+class SigningKeysUnavailableError(TokenVerificationError):
+    """Raised when no unexpired key set is loaded; a background refresh has been requested."""
+
+
+def parse_max_age(cache_control: str | None) -> float | None:
+    """Return the ``max-age`` directive of a Cache-Control header, if any."""
+
+    if not cache_control:
+        return None
+    match = _MAX_AGE_RE.search(cache_control)
+    return float(match.group(1)) if match else None
+
+
+def fetch_google_certs(url: str = ID_TOKEN_CERT_URL, timeout: float = 10.0) -> tuple[dict[str, str], float | None]:
+    """Download the Firebase ID token signing certificates and their max-age."""
+
+    with urllib.request.urlopen(url, timeout=timeout) as response:  # noqa: S310 - fixed https url
+        certs = json.loads(response.read().decode("utf-8"))
+        max_age = parse_max_age(response.headers.get("Cache-Control"))
+    return {str(kid): str(pem) for kid, pem in certs.items()}, max_age
+
+
+class SigningKeyStore:
+    """Keep signing certificates in memory and refresh them before they expire.
+
+    A daemon thread wakes up ``refresh_margin`` seconds before the keys' max-age
+    runs out (or halfway through, for short max-ages) and swaps in a fresh key
+    set, so request handlers only ever read the current mapping and never
+    download keys themselves.
+    """
+
+    def __init__(
+        self,
+        fetcher: KeyFetcher = fetch_google_certs,
+        *,
+        clock: Callable[[], float] = time.time,
+        refresh_margin: float = 300.0,
+        default_max_age: float = 3600.0,
+        retry_interval: float = 30.0,
+    ) -> None:
+        self._fetcher = fetcher
+        self._clock = clock
+        self._refresh_margin = refresh_margin
+        self._default_max_age = default_max_age
+        self._retry_interval = retry_interval
+        self._certs: dict[str, str] = {}
+        self._expires_at = 0.0
+        self._next_refresh = 0.0
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @property
+    def expires_at(self) -> float:
+        return self._expires_at
+
+    @property
+    def next_refresh(self) -> float:
+        return self._next_refresh
+
+    def refresh(self) -> None:
+        """Fetch the current key set and swap it in atomically."""
+
+        certs, max_age = self._fetcher()
+        if not certs:
+            raise TokenVerificationError("signing key endpoint returned no keys")
+        max_age = max_age if max_age and max_age > 0 else self._default_max_age
+        now = self._clock()
+        margin = min(self._refresh_margin, max_age / 2)
+        with self._lock:
+            self._certs = dict(certs)
+            self._expires_at = now + max_age
+            self._next_refresh = now + max_age - margin
+        logger.info(
+            "firebase signing keys refreshed",
+            extra={"component": "auth", "key_count": len(certs), "max_age": max_age},
+        )
+
+    def certs(self) -> dict[str, str]:
+        """Return the in-memory key set.
+
+        Never fetches on the caller's thread: a missing or expired key set
+        wakes the background refresher and raises ``SigningKeysUnavailableError``.
+        """
+
+        with self._lock:
+            certs, expires_at = self._certs, self._expires_at
+        if not certs or self._clock() >= expires_at:
+            self.request_refresh()
+            raise SigningKeysUnavailableError(
+                "signing keys expired" if certs else "signing keys not loaded yet"
+            )
+        return certs
+
+    def request_refresh(self) -> None:
+        """Ask the background thread to refresh now (e.g. on an unknown key id).
+
+        Starts the refresher if it is not running yet.
+        """
+
+        with self._lock:
+            self._next_refresh = min(self._next_refresh, self._clock())
+        self._wake.set()
+        if not (self._thread and self._thread.is_alive()):
+            self.start(prime=False)
+
+    def start(self, *, prime: bool = True) -> None:
+        """Start the background refresher, loading the keys first when ``prime`` is set."""
+
+        with self._start_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            if prime:
+                try:
+                    self.refresh()
+                except Exception as exc:  # keep serving; the refresher retries
+                    logger.warning(
+                        "initial signing key fetch failed",
+                        extra={"component": "auth", "error": str(exc)},
+                    )
+                    self._next_refresh = self._clock() + self._retry_interval
+            self._stop.clear()
+            self._thread = threading.Thread(
+                target=self._run, name="firebase-signing-keys", daemon=True
+            )
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            delay = max(0.0, self._next_refresh - self._clock())
+            self._wake.wait(delay)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            if self._next_refresh > self._clock():
+                continue
+            try:
+                self.refresh()
+            except Exception as exc:
+                logger.warning(
+                    "signing key refresh failed",
+                    extra={"component": "auth", "error": str(exc)},
+                )
+                self._next_refresh = self._clock() + self._retry_interval
+
+
+class FirebaseTokenVerifier:
+    """Verify Firebase ID tokens against a :class:`SigningKeyStore` without network calls."""
+
+    def __init__(
+        self,
+        project_id: str,
+        key_store: SigningKeyStore,
+        *,
+        clock_skew_seconds: int = 0,
+    ) -> None:
+        self.project_id = project_id
+        self.key_store = key_store
+        self._issuer = ID_TOKEN_ISSUER_PREFIX + project_id
+        self._clock_skew = clock_skew_seconds
+
+    def verify(self, token: str) -> dict[str, Any]:
+        try:
+            header = jwt.decode_header(token)
+        except (ValueError, google_exceptions.GoogleAuthError) as exc:
+            raise TokenVerificationError(f"malformed token: {exc}") from exc
+
+        if header.get("alg") != "RS256":
+            raise TokenVerificationError("token must be signed with RS256")
+        key_id = header.get("kid")
+        if not key_id:
+            raise TokenVerificationError("token has no 'kid' header")
+
+        certs = self.key_store.certs()
+        if key_id not in certs:
+            self.key_store.request_refresh()
+            raise TokenVerificationError(f"unknown signing key '{key_id}'")
+
+        try:
+            claims = jwt.decode(
+                token,
+                certs=certs,
+                audience=self.project_id,
+                clock_skew_in_seconds=self._clock_skew,
+            )
+        except (ValueError, google_exceptions.GoogleAuthError) as exc:
+            raise TokenVerificationError(str(exc)) from exc
+
+        if claims.get("iss") != self._issuer:
+            raise TokenVerificationError("token has an unexpected issuer")
+        subject = claims.get("sub")
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise TokenVerificationError("token has an invalid 'sub' claim")
+
+        claims["uid"] = subject
+        return claims
@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import pathlib
 import sys
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
@@ -10,10 +11,25 @@ ROOT = pathlib.Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+from backend.deps.auth import start_token_verifier, stop_token_verifier
+from backend.routes.attendance import r as attendance_router
+from backend.routes.billing import r as billing_router
 from backend.routes.collections import r as collections_router
+from backend.routes.stats import r as stats_router
 from backend.routes.students import r as students_router
 from backend.routes.users import r as users_router
-app = FastAPI(title="shds-admin")
+from backend.services.changes import close_change_feeds
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    start_token_verifier()
+    yield
+    close_change_feeds()
+    stop_token_verifier()
+
+
+app = FastAPI(title="shds-admin", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # Add your frontend URLs
@@ -24,3 +40,6 @@ app.add_middleware(
 app.include_router(students_router)
 app.include_router(users_router)
 app.include_router(collections_router)
+app.include_router(attendance_router)
+app.include_router(billing_router)
+app.include_router(stats_router)
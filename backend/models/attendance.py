@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+from pydantic import BaseModel, Field
+
+
+class AttendanceMark(BaseModel):
+    studentId: str = Field(min_length=1)
+    status: str = Field(min_length=1, description="present, absent, late, ...")
+    notes: str | None = Field(default=None, max_length=500)
+
+
+class SessionAttendancePayload(BaseModel):
+    recordedBy: str = Field(min_length=1, description="Staff id of the person taking attendance")
+    records: list[AttendanceMark] = Field(min_length=1)
@@ -0,0 +1,12 @@
+from __future__ import annotations
+
+from datetime import date
+
+from pydantic import BaseModel, Field
+
+
+class BillingRunPayload(BaseModel):
+    branchId: str = Field(min_length=1)
+    billingPeriod: str = Field(pattern=r"^\d{4}-\d{2}$", description="Month to bill, YYYY-MM")
+    issueDate: date | None = Field(default=None, description="Defaults to the first day of the period")
+    dueInDays: int = Field(default=9, ge=0, le=90)
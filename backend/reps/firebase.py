@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+from types import ModuleType
+
+import firebase_admin
+from firebase_admin import auth as fb_auth, credentials
+
+from backend.config import get_settings
+from backend.logging_utils import get_logger
+
+logger = get_logger(__name__)
+
+
+def ensure_firebase_initialized() -> None:
+    if firebase_admin._apps:
+        return
+    settings = get_settings()
+    cred = None
+    if settings.firebase_credentials_file:
+        cred = credentials.Certificate(settings.firebase_credentials_file)
+    options = {}
+    if settings.firebase_project_id:
+        options["projectId"] = settings.firebase_project_id
+    firebase_admin.initialize_app(cred, options or None)
+    logger.info(
+        "firebase admin initialized",
+        extra={"component": "auth", "project_id": settings.firebase_project_id},
+    )
+
+
+def auth_client() -> ModuleType:
+    """Return the Firebase Auth admin API, initialising the app on first use."""
+
+    ensure_firebase_initialized()
+    return fb_auth
@@ -5,18 +5,30 @@ from google.cloud import firestore
 from backend.config import get_settings
 
 _client: firestore.Client | None = None
+_async_client: firestore.AsyncClient | None = None
 
-def _build_client() -> firestore.Client:
+def _client_kwargs() -> dict[str, str]:
     settings = get_settings()
     kwargs: dict[str, str] = {}
     if settings.firestore_project_id:
         kwargs["project"] = settings.firestore_project_id
     if settings.firestore_database_id:
         kwargs["database"] = settings.firestore_database_id
-    return firestore.Client(**kwargs)
+    return kwargs
+
+def _build_client() -> firestore.Client:
+    return firestore.Client(**_client_kwargs())
 
 def fs() -> firestore.Client:
     global _client
     if _client is None:
         _client = _build_client()
     return _client
+
+def afs() -> firestore.AsyncClient:
+    """Return the shared asyncio Firestore client used by request handlers."""
+
+    global _async_client
+    if _async_client is None:
+        _async_client = firestore.AsyncClient(**_client_kwargs())
+    return _async_client
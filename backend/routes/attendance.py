@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from backend.deps.auth import get_user
+from backend.models.attendance import SessionAttendancePayload
+from backend.services.attendance import mark_session_attendance
+from backend.services.collections import (
+    AuthorizationError,
+    CollectionError,
+    DocumentNotFoundError,
+    PreconditionFailedError,
+    ValidationError,
+)
+
+r = APIRouter(prefix="/batches", tags=["attendance"])
+
+
+@r.post("/{batch_id}/sessions/{session_date}/attendance")
+async def mark_attendance(
+    batch_id: str,
+    session_date: str,
+    payload: SessionAttendancePayload,
+    user=Depends(get_user),
+):
+    """Record the whole roster's attendance for one session in a single commit.
+
+    Re-sending the same session is safe: records are keyed by batch, date and
+    student, and only changed statuses are written.
+    """
+
+    try:
+        return await mark_session_attendance(
+            batch_id, session_date, payload.records, user, recorded_by=payload.recordedBy
+        )
+    except (AuthorizationError, ValidationError, DocumentNotFoundError, PreconditionFailedError) as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc)) from exc
+    except CollectionError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
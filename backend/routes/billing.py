@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from backend.deps.auth import get_user
+from backend.models.billing import BillingRunPayload
+from backend.services.billing import run_billing
+from backend.services.collections import (
+    AuthorizationError,
+    CollectionError,
+    PreconditionFailedError,
+    ValidationError,
+)
+
+r = APIRouter(prefix="/billing", tags=["billing"])
+
+
+@r.post("/runs")
+async def start_billing_run(payload: BillingRunPayload, user=Depends(get_user)):
+    """Invoice a branch's active enrollments for one period and report throughput.
+
+    Safe to repeat: invoices are keyed by enrollment and period, and existing
+    ones are counted instead of recreated.
+    """
+
+    try:
+        return await run_billing(
+            payload.branchId,
+            payload.billingPeriod,
+            user,
+            issue_date=payload.issueDate,
+            due_in_days=payload.dueInDays,
+        )
+    except (AuthorizationError, ValidationError, PreconditionFailedError) as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc)) from exc
+    except CollectionError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
@@ -1,51 +1,326 @@
 from __future__ import annotations
 
-from typing import Any
+import json
+from typing import Any, AsyncIterator
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Request
+from fastapi import APIRouter, Body, Depends, File, Header, HTTPException, Query, Request, Response, UploadFile
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 
+from backend.config import get_settings
 from backend.deps.auth import get_user
+from backend.services.changes import CLOSED, DROPPED, Subscription, change_feed_hub, subscribe_changes
 from backend.services.collections import (
     AuthorizationError,
     CollectionError,
+    DocumentExistsError,
+    DocumentNotFoundError,
+    PreconditionFailedError,
     UnknownCollectionError,
     ValidationError,
+    count_documents,
     create_document,
+    create_documents,
+    existence_cache_stats,
+    get_document,
+    get_documents,
     list_documents,
+    list_documents_page,
+    open_document_stream,
+    sum_documents,
+    uncovered_query_shapes,
+    update_document,
 )
+from backend.services.imports import detect_format, run_import
 
 r = APIRouter(prefix="/collections", tags=["collections"])
 
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+# Query parameters that control listing rather than filter documents.
+_LIST_CONTROL_PARAMS = frozenset({"limit", "orderBy", "pageToken", "fields", "ids", "expand"})
+
+
+@r.get("/_stats/cache")
+async def collection_cache_stats(user=Depends(get_user)):
+    """Expose hit/miss counters of the reference existence caches."""
+
+    if "admin" not in (user.get("roles") or []):
+        raise HTTPException(status_code=403, detail="forbidden")
+    return existence_cache_stats()
+
+
+@r.get("/_stats/queries")
+async def collection_query_stats(user=Depends(get_user)):
+    """List query shapes rejected because no declared composite index covers them."""
+
+    if "admin" not in (user.get("roles") or []):
+        raise HTTPException(status_code=403, detail="forbidden")
+    return {"uncovered": uncovered_query_shapes()}
+
+
+@r.get("/_stats/feeds")
+async def collection_feed_stats(user=Depends(get_user)):
+    """Subscribers attached to each shared change feed listener."""
+
+    if "admin" not in (user.get("roles") or []):
+        raise HTTPException(status_code=403, detail="forbidden")
+    return {"feeds": change_feed_hub().stats()}
+
+
+async def _ndjson_lines(documents: AsyncIterator[dict[str, Any]]) -> AsyncIterator[str]:
+    async for document in documents:
+        yield json.dumps(jsonable_encoder(document), ensure_ascii=False) + "\n"
+
+
+def _filter_params(request: Request, control: frozenset[str]) -> dict[str, str]:
+    return {key: value for key, value in request.query_params.items() if key not in control}
+
+
+@r.get("/{collection_name}:count")
+async def count_collection_documents(collection_name: str, request: Request, user=Depends(get_user)):
+    """Count documents matching the same filters and branch scope as the listing."""
+
+    try:
+        count = await count_documents(collection_name, user, _filter_params(request, frozenset()))
+    except (UnknownCollectionError, AuthorizationError, ValidationError) as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc)) from exc
+    except CollectionError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return {"count": count}
+
+
+@r.get("/{collection_name}:sum")
+async def sum_collection_documents(
+    collection_name: str,
+    request: Request,
+    field: str = Query(..., description="Numeric field to total."),
+    user=Depends(get_user),
+):
+    """Total a numeric field over the documents matching the listing filters."""
+
+    filters = _filter_params(request, frozenset({"field"}))
+    try:
+        total = await sum_documents(collection_name, user, filters, field=field)
+    except (UnknownCollectionError, AuthorizationError, ValidationError) as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc)) from exc
+    except CollectionError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return {"field": field, "sum": total}
+
+
+@r.post("/{collection_name}:batchCreate")
+async def batch_create_collection_documents(
+    collection_name: str,
+    payloads: list[Any] = Body(..., description="Array of document payloads to create."),
+    user=Depends(get_user),
+):
+    """Create many documents at once; the response reports every item's outcome."""
+
+    try:
+        return await create_documents(collection_name, payloads, user)
+    except (UnknownCollectionError, AuthorizationError, ValidationError) as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc)) from exc
+    except CollectionError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@r.post("/{collection_name}:import")
+async def import_collection_documents(
+    collection_name: str,
+    file: UploadFile = File(..., description="CSV (header row) or NDJSON file."),
+    format: str | None = Query(default=None, description="'csv' or 'ndjson'; inferred from the upload when omitted."),
+    job_id: str | None = Query(default=None, alias="jobId", description="Resume a failed import job."),
+    user=Depends(get_user),
+):
+    """Stream an uploaded file into a collection in validated, checkpointed chunks.
+
+    The response is the final job state; rows that failed validation are listed
+    in ``errors`` with their 1-based row number. A failed import can be resumed
+    by uploading the same file again with its ``jobId``.
+    """
+
+    try:
+        fmt = format or detect_format(file.filename, file.content_type)
+        return await run_import(collection_name, file.file, fmt, user, job_id=job_id)
+    except (UnknownCollectionError, AuthorizationError, ValidationError) as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc)) from exc
+    except CollectionError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
 
 @r.post("/{collection_name}")
-def create_collection_document(
+async def create_collection_document(
     collection_name: str,
     payload: dict[str, Any] = Body(..., description="Document payload to persist."),
     user=Depends(get_user),
 ):
-    """Create a document with metadata and relationship validation."""
+    """Create a document with metadata and relationship validation.
+
+    Collections that keep summaries, counters or rosters reject an existing
+    ``id`` with 409 so it is never counted twice; the others overwrite it.
+    """
 
     try:
-        return create_document(collection_name, payload, user)
-    except (UnknownCollectionError, AuthorizationError, ValidationError) as exc:
+        return await create_document(collection_name, payload, user)
+    except (UnknownCollectionError, AuthorizationError, ValidationError, DocumentExistsError) as exc:
         raise HTTPException(status_code=exc.status_code, detail=str(exc)) from exc
     except CollectionError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
 @r.get("/{collection_name}")
-def list_collection_documents(
+async def list_collection_documents(
     collection_name: str,
     request: Request,
+    limit: int | None = Query(default=None, ge=1, description="Page size; enables pagination."),
+    order_by: str | None = Query(default=None, alias="orderBy", description="'field' or 'field desc'."),
+    page_token: str | None = Query(default=None, alias="pageToken", description="nextPageToken of the previous page."),
+    fields: str | None = Query(default=None, description="Comma-separated field projection; 'id' is always returned."),
+    ids: str | None = Query(default=None, description="Comma-separated document ids fetched in one batched read."),
+    expand: str | None = Query(default=None, description="Relationship fields whose documents are embedded under '_expanded'."),
     user=Depends(get_user),
 ):
-    """List documents for the provided collection."""
+    """List documents for the provided collection.
+
+    Passing ``limit``, ``orderBy`` or ``pageToken`` switches to a paginated
+    ``{"items": [...], "nextPageToken": ...}`` envelope. Sending
+    ``Accept: application/x-ndjson`` streams the whole listing, one document per line.
+    ``ids=a,b,c`` returns those documents in the given order, skipping unknown ids.
+    """
 
-    filters = {key: value for key, value in request.query_params.items()}
+    filters = _filter_params(request, _LIST_CONTROL_PARAMS)
 
     try:
-        return list_documents(collection_name, user, filters)
+        if ids is not None:
+            if filters or limit or order_by or page_token:
+                raise ValidationError("'ids' cannot be combined with filters or pagination")
+            doc_ids = [doc_id.strip() for doc_id in ids.split(",") if doc_id.strip()]
+            return await get_documents(collection_name, user, doc_ids, fields=fields, expand=expand)
+        if NDJSON_MEDIA_TYPE in request.headers.get("accept", ""):
+            documents = open_document_stream(collection_name, user, filters, fields=fields, expand=expand)
+            return StreamingResponse(_ndjson_lines(documents), media_type=NDJSON_MEDIA_TYPE)
+        if limit or order_by or page_token:
+            return await list_documents_page(
+                collection_name,
+                user,
+                filters,
+                limit=limit,
+                order_by=order_by,
+                page_token=page_token,
+                fields=fields,
+                expand=expand,
+            )
+        return await list_documents(collection_name, user, filters, fields=fields, expand=expand)
     except (UnknownCollectionError, AuthorizationError, ValidationError) as exc:
         raise HTTPException(status_code=exc.status_code, detail=str(exc)) from exc
     except CollectionError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+def _sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
+
+
+async def _change_events(subscription: Subscription) -> AsyncIterator[str]:
+    heartbeat = get_settings().change_feed_heartbeat_seconds
+    try:
+        yield ": connected\n\n"
+        while True:
+            batch = await subscription.next(heartbeat)
+            if batch is None:
+                yield ": keep-alive\n\n"
+            elif batch is DROPPED:
+                yield _sse_event("dropped", {"reason": "client fell behind; reconnect and re-fetch"})
+                return
+            elif batch is CLOSED:
+                return
+            else:
+                for change in batch:
+                    yield _sse_event(change["type"], {"id": change["id"], "data": change["data"]})
+    finally:
+        subscription.close()
+
+
+@r.get("/{collection_name}/changes")
+async def stream_collection_changes(
+    collection_name: str,
+    branch_id: str | None = Query(default=None, alias="branchId", description="Branch to follow; defaults to the caller's branch."),
+    user=Depends(get_user),
+):
+    """Stream ``added``/``modified``/``removed`` events for the caller's branch as SSE.
+
+    Every subscriber of a (collection, branch) shares one Firestore listener.
+    Clients that fall behind receive a ``dropped`` event and are disconnected.
+    """
+
+    try:
+        subscription = subscribe_changes(collection_name, user, branch_id)
+    except (UnknownCollectionError, AuthorizationError, ValidationError) as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc)) from exc
+    return StreamingResponse(
+        _change_events(subscription),
+        media_type=SSE_MEDIA_TYPE,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@r.get("/{collection_name}/{document_id}")
+async def get_collection_document(
+    collection_name: str,
+    document_id: str,
+    response: Response,
+    fields: str | None = Query(default=None, description="Comma-separated field projection; 'id' is always returned."),
+    expand: str | None = Query(default=None, description="Relationship fields whose documents are embedded under '_expanded'."),
+    user=Depends(get_user),
+):
+    """Fetch one document; documents outside the caller's branch are reported as missing.
+
+    The ``ETag`` header carries the version to send back as ``If-Match`` on PATCH.
+    """
+
+    versions: dict[str, str] = {}
+    try:
+        document = await get_document(
+            collection_name, user, document_id, fields=fields, expand=expand, versions=versions
+        )
+    except (UnknownCollectionError, AuthorizationError, ValidationError) as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc)) from exc
+    except CollectionError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    if document is None:
+        raise HTTPException(status_code=404, detail="document not found")
+    if versions.get(document_id):
+        response.headers["ETag"] = f'"{versions[document_id]}"'
+    return document
+
+
+@r.patch("/{collection_name}/{document_id}")
+async def patch_collection_document(
+    collection_name: str,
+    document_id: str,
+    response: Response,
+    changes: dict[str, Any] = Body(..., description="Fields to merge; dotted keys address nested fields."),
+    if_match: str | None = Header(default=None, description="ETag from a previous read; the write fails with 412 if it changed."),
+    user=Depends(get_user),
+):
+    """Update only the sent fields of a document, optionally guarded by ``If-Match``."""
+
+    try:
+        updated, version = await update_document(
+            collection_name, document_id, changes, user, if_match=if_match
+        )
+    except (
+        UnknownCollectionError,
+        AuthorizationError,
+        ValidationError,
+        DocumentNotFoundError,
+        PreconditionFailedError,
+    ) as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc)) from exc
+    except CollectionError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    if version:
+        response.headers["ETag"] = f'"{version}"'
+    return updated
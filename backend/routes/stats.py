@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends, HTTPException
+
+from backend.deps.auth import get_user
+from backend.services.collections import AuthorizationError, CollectionError
+from backend.services.stats import get_branch_stats, reconcile_branch_stats
+
+r = APIRouter(prefix="/stats", tags=["stats"])
+
+
+@r.get("/branches/{branch_id}")
+async def branch_stats(branch_id: str, user=Depends(get_user)):
+    """Dashboard counters (active students, active batches, pending invoices, ...) for a branch."""
+
+    try:
+        return await get_branch_stats(branch_id, user)
+    except AuthorizationError as exc:
+        raise HTTPException(status_code=exc.status_code, detail=str(exc)) from exc
+    except CollectionError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@r.post("/branches/{branch_id}:reconcile")
+async def reconcile_branch(branch_id: str, user=Depends(get_user)):
+    """Recount a branch's counters from the collections and correct any drift."""
+
+    if "admin" not in (user.get("roles") or []):
+        raise HTTPException(status_code=403, detail="forbidden")
+    if user.get("branchId") and user["branchId"] != branch_id:
+        raise HTTPException(status_code=403, detail="branch scope violation")
+    result = await reconcile_branch_stats(branch_id)
+    return {"branchId": branch_id, **result["branches"][branch_id]}
@@ -24,11 +24,11 @@ class ProvisioningResponse(BaseModel):
 
 
 @r.post("/invites", response_model=InviteRecord, status_code=status.HTTP_201_CREATED)
-def issue_invite(payload: InviteCreatePayload, user=Depends(get_user)):
+async def issue_invite(payload: InviteCreatePayload, user=Depends(get_user)):
     """Allow a super-admin to invite staff/students."""
 
     try:
-        return create_invite(payload, user)
+        return await create_invite(payload, user)
     except InvitePermissionError as exc:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=str(exc)) from exc
     except InviteError as exc:
@@ -36,11 +36,11 @@ def issue_invite(payload: InviteCreatePayload, user=Depends(get_user)):
 
 
 @r.post("/setup", response_model=ProvisioningResponse)
-def setup_user(payload: InviteAcceptPayload, user=Depends(get_user)):
+async def setup_user(payload: InviteAcceptPayload, user=Depends(get_user)):
     """Complete profile provisioning using a secure invite token."""
 
     try:
-        profile = accept_invite(payload, user)
+        profile = await accept_invite(payload, user)
         return {
             "uid": profile["uid"],
             "branchId": profile["branchId"],
@@ -58,10 +58,10 @@ def setup_user(payload: InviteAcceptPayload, user=Depends(get_user)):
 
 
 @r.get("/me")
-def get_current_user(user=Depends(get_user)):
+async def get_current_user(user=Depends(get_user)):
     """Get current user info with persisted profile blend."""
 
-    profile = get_user_profile(user["uid"]) or {}
+    profile = user.get("profile") or await get_user_profile(user["uid"]) or {}
     merged_roles = user.get("roles") or profile.get("roles") or []
     merged_branch = user.get("branchId") or profile.get("branchId")
     merged_profile = profile or user.get("profile")
@@ -0,0 +1,186 @@
+"""Mark a whole batch session's attendance in one validated commit."""
+from __future__ import annotations
+
+import asyncio
+from datetime import date, datetime, timezone
+from typing import Any
+
+from google.api_core import exceptions as google_exceptions
+from google.cloud import firestore
+
+from backend.logging_utils import get_logger
+from backend.models.attendance import AttendanceMark
+from backend.reps.firestore import afs
+from backend.services.collections import (
+    WRITE_BATCH_LIMIT,
+    CollectionDefinition,
+    DocumentNotFoundError,
+    PendingWrite,
+    PreconditionFailedError,
+    ValidationError,
+    _ensure_role,
+    _fetch_documents,
+    _fetch_existing,
+    _get_definition,
+    _with_metadata,
+    aggregate_writes,
+    mark_created,
+    writes_per_document,
+)
+
+logger = get_logger(__name__)
+
+ATTENDANCE_COLLECTION = "attendanceRecords"
+# Concurrent markings of the same session are re-read and re-applied this many times.
+SESSION_WRITE_ATTEMPTS = 3
+
+
+def attendance_record_id(batch_id: str, session_date: str, student_id: str) -> str:
+    """Deterministic id, so re-sending a session updates instead of duplicating."""
+
+    return f"{batch_id}_{session_date}_{student_id}"
+
+
+def _session_date(value: str) -> str:
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError as exc:
+        raise ValidationError(f"session date must be YYYY-MM-DD, got '{value}'") from exc
+
+
+async def mark_session_attendance(
+    batch_id: str,
+    session_date: str,
+    marks: list[AttendanceMark],
+    user: dict[str, Any],
+    *,
+    recorded_by: str,
+) -> dict[str, Any]:
+    """Create or update the attendance record of every student in ``marks``.
+
+    The batch, the recording staff member and all students are checked with
+    one batched read per collection, run concurrently. Records use
+    ``attendance_record_id`` and are written, together with their summary
+    increments, in a single commit; students whose status is unchanged are
+    left alone, so retrying a request is a no-op.
+    """
+
+    definition = _get_definition(ATTENDANCE_COLLECTION)
+    _ensure_role(user.get("roles"), definition.create_roles)
+    session_date = _session_date(session_date)
+    limit = WRITE_BATCH_LIMIT // writes_per_document(definition)
+    if len(marks) > limit:
+        raise ValidationError(f"at most {limit} students per session")
+    student_ids = [mark.studentId for mark in marks]
+    duplicates = sorted({sid for sid in student_ids if student_ids.count(sid) > 1})
+    if duplicates:
+        raise ValidationError(f"duplicate studentId: {', '.join(duplicates)}")
+
+    client = afs()
+    batches, students, staff = await asyncio.gather(
+        _fetch_documents(client, _get_definition("batches"), user, [batch_id], ["branchId"]),
+        _fetch_documents(client, _get_definition("students"), user, student_ids, ["branchId"]),
+        _fetch_existing(client, {"staff": {recorded_by}}),
+    )
+    if not batches:
+        raise DocumentNotFoundError(f"batch '{batch_id}' not found")
+    if not staff:
+        raise ValidationError(f"recordedBy references missing staff '{recorded_by}'")
+    missing = sorted(set(student_ids) - {student["id"] for student in students})
+    if missing:
+        raise ValidationError(f"unknown students: {', '.join(missing)}")
+
+    recorded_at = datetime.now(timezone.utc).isoformat()
+    payloads = {}
+    for mark in marks:
+        payload = {
+            "studentId": mark.studentId,
+            "batchId": batch_id,
+            "sessionDate": session_date,
+            "status": mark.status,
+            "recordedBy": recorded_by,
+            "recordedAt": recorded_at,
+        }
+        if mark.notes is not None:
+            payload["notes"] = mark.notes
+        definition.validator.validate(payload)
+        payloads[attendance_record_id(batch_id, session_date, mark.studentId)] = payload
+
+    last_error: Exception | None = None
+    for attempt in range(1, SESSION_WRITE_ATTEMPTS + 1):
+        try:
+            return await _write_session(client, definition, user, batch_id, session_date, payloads)
+        except (google_exceptions.AlreadyExists, google_exceptions.FailedPrecondition) as exc:
+            logger.info(
+                "attendance session changed concurrently",
+                extra={"batch_id": batch_id, "session_date": session_date, "attempt": attempt},
+            )
+            last_error = exc
+    raise PreconditionFailedError("attendance was modified concurrently; retry") from last_error
+
+
+async def _write_session(
+    client: firestore.AsyncClient,
+    definition: CollectionDefinition,
+    user: dict[str, Any],
+    batch_id: str,
+    session_date: str,
+    payloads: dict[str, dict[str, Any]],
+) -> dict[str, Any]:
+    collection_ref = client.collection(ATTENDANCE_COLLECTION)
+    refs = {doc_id: collection_ref.document(doc_id) for doc_id in payloads}
+    read_fields = sorted({name for rule in definition.summaries for name in rule.source_fields} | {"notes"})
+    snapshots = {
+        snapshot.id: snapshot
+        async for snapshot in client.get_all(list(refs.values()), field_paths=read_fields)
+        if snapshot.exists
+    }
+
+    now = datetime.now(timezone.utc)
+    batch = client.batch()
+    moves: list[tuple[dict[str, Any] | None, dict[str, Any]]] = []
+    outcomes: list[dict[str, Any]] = []
+    created: list[PendingWrite] = []
+    for index, (doc_id, payload) in enumerate(payloads.items()):
+        snapshot = snapshots.get(doc_id)
+        outcome = {"studentId": payload["studentId"], "id": doc_id}
+        if snapshot is None:
+            data = _with_metadata(payload, user, now)
+            batch.create(refs[doc_id], data)
+            moves.append((None, data))
+            created.append(PendingWrite(index, refs[doc_id], data))
+            outcomes.append({**outcome, "result": "created"})
+            continue
+        before = snapshot.to_dict() or {}
+        changes = {
+            key: payload[key]
+            for key in ("status", "notes")
+            if key in payload and before.get(key) != payload[key]
+        }
+        if not changes:
+            outcomes.append({**outcome, "result": "unchanged"})
+            continue
+        changes.update(
+            recordedBy=payload["recordedBy"],
+            recordedAt=payload["recordedAt"],
+            updatedAt=now,
+            updatedBy=user.get("uid"),
+        )
+        batch.update(
+            refs[doc_id], changes, option=client.write_option(last_update_time=snapshot.update_time)
+        )
+        moves.append((before, {**before, **changes}))
+        outcomes.append({**outcome, "result": "updated"})
+
+    for ref, data in aggregate_writes(client, definition, moves):
+        batch.set(ref, data, merge=True)
+    if any(item["result"] != "unchanged" for item in outcomes):
+        await batch.commit()
+    for write in created:
+        mark_created(ATTENDANCE_COLLECTION, write)
+
+    counts = {
+        result: sum(1 for item in outcomes if item["result"] == result)
+        for result in ("created", "updated", "unchanged")
+    }
+    return {"batchId": batch_id, "sessionDate": session_date, **counts, "records": outcomes}
@@ -0,0 +1,254 @@
+"""Generate a branch's invoices for one billing period in concurrent write batches."""
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any
+
+from google.api_core import exceptions as google_exceptions
+from google.cloud import firestore
+
+from backend.config import get_settings
+from backend.logging_utils import get_logger
+from backend.reps.firestore import afs
+from backend.services.collections import (
+    WRITE_BATCH_LIMIT,
+    AuthorizationError,
+    CollectionDefinition,
+    PendingWrite,
+    PreconditionFailedError,
+    ValidationError,
+    _ensure_role,
+    _get_definition,
+    _with_metadata,
+    aggregate_writes,
+    mark_created,
+)
+
+logger = get_logger(__name__)
+
+INVOICES_COLLECTION = "invoices"
+# Months between invoices for each ``tuitionPlan.billingCycle``.
+BILLING_CYCLE_MONTHS = {"monthly": 1, "quarterly": 3, "half-yearly": 6, "yearly": 12, "annual": 12}
+# A chunk that loses a race with a concurrent run is re-read and retried this many times.
+CHUNK_WRITE_ATTEMPTS = 3
+
+
+def invoice_id(enrollment_id: str, billing_period: str) -> str:
+    """Deterministic id, so re-running a period never bills an enrollment twice."""
+
+    return f"{enrollment_id}_{billing_period}"
+
+
+def _parse_period(billing_period: str) -> date:
+    try:
+        return date.fromisoformat(f"{billing_period}-01")
+    except ValueError as exc:
+        raise ValidationError(f"billingPeriod must be YYYY-MM, got '{billing_period}'") from exc
+
+
+def _months_since_joining(enrollment: dict[str, Any], period_start: date) -> int | None:
+    joined_at = enrollment.get("joinedAt")
+    if not isinstance(joined_at, str):
+        return 0
+    try:
+        joined = date.fromisoformat(joined_at[:10])
+    except ValueError:
+        return 0
+    months = (period_start.year - joined.year) * 12 + period_start.month - joined.month
+    return months if months >= 0 else None
+
+
+def build_invoice(
+    enrollment_id: str,
+    enrollment: dict[str, Any],
+    billing_period: str,
+    issue_date: date,
+    due_date: date,
+) -> tuple[dict[str, Any] | None, str | None]:
+    """Return ``(invoice, None)`` or ``(None, reason)`` when the enrollment is not billed."""
+
+    plan = enrollment.get("tuitionPlan")
+    if not isinstance(plan, dict):
+        return None, "missing tuitionPlan"
+    fee = plan.get("feeAmount")
+    if isinstance(fee, bool) or not isinstance(fee, (int, float)) or fee <= 0:
+        return None, "missing tuitionPlan.feeAmount"
+    cycle = plan.get("billingCycle") or "monthly"
+    interval = BILLING_CYCLE_MONTHS.get(cycle)
+    if interval is None:
+        return None, f"unknown billingCycle '{cycle}'"
+    months = _months_since_joining(enrollment, _parse_period(billing_period))
+    if months is None:
+        return None, "joined after the billing period"
+    if months % interval:
+        return None, f"not due this period ({cycle})"
+
+    invoice: dict[str, Any] = {
+        "enrollmentId": enrollment_id,
+        "billingPeriod": billing_period,
+        "issueDate": issue_date.isoformat(),
+        "dueDate": due_date.isoformat(),
+        "status": "pending",
+        "totalAmount": fee,
+        "lineItems": [{"description": f"{billing_period} tuition ({cycle})", "amount": fee}],
+        "branchId": enrollment.get("branchId"),
+    }
+    if plan.get("currency"):
+        invoice["currency"] = plan["currency"]
+    return invoice, None
+
+
+async def _write_chunk(
+    client: firestore.AsyncClient,
+    definition: CollectionDefinition,
+    invoices: list[dict[str, Any]],
+    user: dict[str, Any],
+) -> tuple[int, int]:
+    """Create the chunk's invoices that do not exist yet; return ``(created, existing)``."""
+
+    collection_ref = client.collection(INVOICES_COLLECTION)
+    refs = [
+        collection_ref.document(invoice_id(invoice["enrollmentId"], invoice["billingPeriod"]))
+        for invoice in invoices
+    ]
+    attempt = 0
+    while True:
+        attempt += 1
+        existing = {
+            snapshot.id async for snapshot in client.get_all(refs, field_paths=[]) if snapshot.exists
+        }
+        now = datetime.now(timezone.utc)
+        writes = [
+            PendingWrite(index, ref, _with_metadata(invoice, user, now))
+            for index, (ref, invoice) in enumerate(zip(refs, invoices))
+            if ref.id not in existing
+        ]
+        if not writes:
+            return 0, len(existing)
+        batch = client.batch()
+        for write in writes:
+            batch.create(write.ref, write.data)
+        created = [(None, write.data) for write in writes]
+        for ref, increments in aggregate_writes(client, definition, created):
+            batch.set(ref, increments, merge=True)
+        try:
+            await batch.commit()
+        except google_exceptions.AlreadyExists as exc:
+            if attempt >= CHUNK_WRITE_ATTEMPTS:
+                raise PreconditionFailedError(
+                    "invoices were created concurrently; re-run the billing period"
+                ) from exc
+            continue
+        for write in writes:
+            mark_created(INVOICES_COLLECTION, write)
+        return len(writes), len(existing)
+
+
+async def run_billing(
+    branch_id: str,
+    billing_period: str,
+    user: dict[str, Any],
+    *,
+    issue_date: date | None = None,
+    due_in_days: int = 9,
+    chunk_size: int = WRITE_BATCH_LIMIT,
+    max_concurrent_chunks: int | None = None,
+) -> dict[str, Any]:
+    """Invoice every active enrollment of ``branch_id`` for ``billing_period`` (YYYY-MM).
+
+    Enrollments are streamed and amounts taken from their ``tuitionPlan``.
+    Invoices get ``invoice_id`` ids and are written with ``create`` in batches
+    of ``chunk_size``, up to ``BILLING_MAX_CONCURRENT_CHUNKS`` in flight, so a
+    re-run only creates what is missing. Enrollments are trusted as read, so
+    no per-invoice relationship reads are made.
+    """
+
+    definition = _get_definition(INVOICES_COLLECTION)
+    _ensure_role(user.get("roles"), definition.create_roles)
+    if user.get("branchId") and user["branchId"] != branch_id:
+        raise AuthorizationError("branch scope violation")
+    period_start = _parse_period(billing_period)
+    issue_date = issue_date or period_start
+    due_date = issue_date + timedelta(days=due_in_days)
+    # Every invoice of a run shares one branch, so counters add a single shard write per batch.
+    capacity = WRITE_BATCH_LIMIT - (1 if definition.counters else 0)
+    chunk_size = max(1, min(chunk_size, capacity))
+    limit = max_concurrent_chunks or get_settings().billing_max_concurrent_chunks
+    semaphore = asyncio.Semaphore(max(1, limit))
+
+    client = afs()
+    started = time.perf_counter()
+    report: dict[str, Any] = {
+        "branchId": branch_id,
+        "billingPeriod": billing_period,
+        "enrollments": 0,
+        "created": 0,
+        "existing": 0,
+        "skipped": 0,
+        "skippedReasons": {},
+        "chunks": 0,
+    }
+    pending: set[asyncio.Task[tuple[int, int]]] = set()
+
+    async def _run_chunk(invoices: list[dict[str, Any]]) -> tuple[int, int]:
+        try:
+            return await _write_chunk(client, definition, invoices, user)
+        finally:
+            semaphore.release()
+
+    async def _submit(invoices: list[dict[str, Any]]) -> None:
+        # Waiting for a free slot here keeps the stream from outrunning the writes.
+        await semaphore.acquire()
+        report["chunks"] += 1
+        pending.add(asyncio.ensure_future(_run_chunk(invoices)))
+
+    query = (
+        client.collection("enrollments")
+        .where("branchId", "==", branch_id)
+        .where("status", "==", "active")
+    )
+    chunk: list[dict[str, Any]] = []
+    try:
+        async for snapshot in query.stream():
+            report["enrollments"] += 1
+            invoice, reason = build_invoice(
+                snapshot.id, snapshot.to_dict() or {}, billing_period, issue_date, due_date
+            )
+            if invoice is None:
+                report["skipped"] += 1
+                report["skippedReasons"][reason] = report["skippedReasons"].get(reason, 0) + 1
+                continue
+            definition.validator.validate(invoice)
+            chunk.append(invoice)
+            if len(chunk) == chunk_size:
+                await _submit(chunk)
+                chunk = []
+        if chunk:
+            await _submit(chunk)
+        results = await asyncio.gather(*pending)
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        raise
+
+    for created, existing in results:
+        report["created"] += created
+        report["existing"] += existing
+    elapsed = time.perf_counter() - started
+    report["elapsedSeconds"] = round(elapsed, 3)
+    report["invoicesPerSecond"] = round(report["created"] / elapsed, 1) if elapsed > 0 else None
+    logger.info(
+        "billing run finished",
+        extra={
+            "branch_id": branch_id,
+            "billing_period": billing_period,
+            "created_count": report["created"],
+            "existing_count": report["existing"],
+            "skipped_count": report["skipped"],
+            "chunks": report["chunks"],
+            "elapsed_seconds": report["elapsedSeconds"],
+        },
+    )
+    return report
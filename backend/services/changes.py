@@ -0,0 +1,243 @@
+"""Shared Firestore snapshot listeners fanned out to server-sent event subscribers."""
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, Callable
+
+from backend.config import get_settings
+from backend.logging_utils import get_logger
+from backend.reps.firestore import fs
+from backend.services.collections import (
+    AuthorizationError,
+    ValidationError,
+    _ensure_role,
+    _get_definition,
+)
+
+logger = get_logger(__name__)
+
+# Queued for a subscriber that fell too far behind; its stream ends after this.
+DROPPED = object()
+# Queued for every subscriber when the feeds are shut down.
+CLOSED = object()
+
+_CHANGE_TYPES = {"ADDED": "added", "MODIFIED": "modified", "REMOVED": "removed"}
+
+SnapshotCallback = Callable[[Any, Any, Any], None]
+
+
+def _start_listener(
+    collection: str, scope_field: str | None, branch: str | None, callback: SnapshotCallback
+) -> Any:
+    """Attach a snapshot listener; the returned watch has ``unsubscribe()``.
+
+    Listeners are only available on the synchronous client, which runs the
+    callback on its own thread.
+    """
+
+    query: Any = fs().collection(collection)
+    if scope_field and branch:
+        query = query.where(scope_field, "==", branch)
+    return query.on_snapshot(callback)
+
+
+class Subscription:
+    """One SSE client: a bounded queue of change batches fed from the listener thread."""
+
+    def __init__(self, feed: "ChangeFeed", loop: asyncio.AbstractEventLoop, max_pending: int) -> None:
+        self._feed = feed
+        self._loop = loop
+        self.queue: asyncio.Queue[Any] = asyncio.Queue(max_pending)
+        self.dropped = False
+
+    def publish(self, events: list[dict[str, Any]]) -> None:
+        """Hand a batch over to the subscriber's event loop (safe from any thread)."""
+
+        try:
+            self._loop.call_soon_threadsafe(self._offer, events)
+        except RuntimeError:
+            # The subscriber's loop is gone; nobody is reading any more.
+            self.close()
+
+    def end(self) -> None:
+        """Finish the stream after anything already queued (safe from any thread)."""
+
+        try:
+            self._loop.call_soon_threadsafe(self._finish)
+        except RuntimeError:
+            pass
+
+    def _finish(self) -> None:
+        if self.dropped:
+            return
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(CLOSED)
+
+    def _offer(self, events: list[dict[str, Any]]) -> None:
+        if self.dropped:
+            return
+        try:
+            self.queue.put_nowait(events)
+        except asyncio.QueueFull:
+            self.dropped = True
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(DROPPED)
+            logger.warning(
+                "change feed subscriber dropped",
+                extra={"collection": self._feed.collection, "branch": self._feed.branch},
+            )
+            self.close()
+
+    async def next(self, timeout: float) -> Any:
+        """Return the next batch, ``DROPPED``/``CLOSED``, or ``None`` when ``timeout`` passes quietly."""
+
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self._feed.hub.unsubscribe(self._feed, self)
+
+
+class ChangeFeed:
+    """A single Firestore listener for one (collection, branch) pair."""
+
+    def __init__(self, hub: "ChangeFeedHub", collection: str, scope_field: str | None, branch: str | None):
+        self.hub = hub
+        self.collection = collection
+        self.scope_field = scope_field
+        self.branch = branch
+        self.subscribers: set[Subscription] = set()
+        self._watch: Any = None
+        self._primed = False
+
+    def start(self) -> None:
+        self._watch = _start_listener(self.collection, self.scope_field, self.branch, self._on_snapshot)
+
+    def stop(self) -> None:
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def _on_snapshot(self, docs: Any, changes: Any, read_time: Any) -> None:
+        # The first callback replays the current result set; subscribers only want changes.
+        if not self._primed:
+            self._primed = True
+            return
+        events = []
+        for change in changes:
+            kind = _CHANGE_TYPES.get(change.type.name, change.type.name.lower())
+            document = change.document
+            events.append(
+                {
+                    "type": kind,
+                    "id": document.id,
+                    "data": None if kind == "removed" else document.to_dict(),
+                }
+            )
+        if not events:
+            return
+        for subscriber in self.hub.subscribers_of(self):
+            subscriber.publish(events)
+
+
+class ChangeFeedHub:
+    """Share one listener per (collection, branch) between every subscriber of it."""
+
+    def __init__(self) -> None:
+        self._feeds: dict[tuple[str, str | None], ChangeFeed] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(
+        self,
+        collection: str,
+        scope_field: str | None,
+        branch: str | None,
+        loop: asyncio.AbstractEventLoop,
+        max_pending: int,
+    ) -> Subscription:
+        key = (collection, branch)
+        with self._lock:
+            feed = self._feeds.get(key)
+            if feed is None:
+                feed = ChangeFeed(self, collection, scope_field, branch)
+                feed.start()
+                self._feeds[key] = feed
+                logger.info("change feed listener started", extra={"collection": collection, "branch": branch})
+            subscription = Subscription(feed, loop, max_pending)
+            feed.subscribers.add(subscription)
+        return subscription
+
+    def subscribers_of(self, feed: ChangeFeed) -> list[Subscription]:
+        with self._lock:
+            return list(feed.subscribers)
+
+    def unsubscribe(self, feed: ChangeFeed, subscription: Subscription) -> None:
+        with self._lock:
+            feed.subscribers.discard(subscription)
+            if feed.subscribers or self._feeds.get((feed.collection, feed.branch)) is not feed:
+                return
+            del self._feeds[(feed.collection, feed.branch)]
+        feed.stop()
+        logger.info(
+            "change feed listener stopped", extra={"collection": feed.collection, "branch": feed.branch}
+        )
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                f"{collection}/{branch or '*'}": len(feed.subscribers)
+                for (collection, branch), feed in self._feeds.items()
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            feeds = list(self._feeds.values())
+            self._feeds.clear()
+        for feed in feeds:
+            feed.stop()
+            for subscription in list(feed.subscribers):
+                subscription.end()
+
+
+_hub = ChangeFeedHub()
+
+
+def change_feed_hub() -> ChangeFeedHub:
+    return _hub
+
+
+def close_change_feeds() -> None:
+    """Detach every listener and end open streams (called on application shutdown)."""
+
+    _hub.close()
+
+
+def subscribe_changes(
+    collection: str, user: dict[str, Any], branch_id: str | None = None
+) -> Subscription:
+    """Check access and attach the caller to the shared feed for their branch scope."""
+
+    definition = _get_definition(collection)
+    _ensure_role(user.get("roles"), definition.read_roles)
+    branch = None
+    if definition.branch_scope_field:
+        user_branch = user.get("branchId")
+        if branch_id and user_branch and branch_id != user_branch:
+            raise AuthorizationError("branch scope violation")
+        branch = branch_id or user_branch
+        if not branch:
+            raise ValidationError(
+                f"missing '{definition.branch_scope_field}' for branch-scoped collection"
+            )
+    return _hub.subscribe(
+        collection,
+        definition.branch_scope_field,
+        branch,
+        asyncio.get_running_loop(),
+        get_settings().change_feed_max_pending,
+    )
@@ -0,0 +1,103 @@
+"""Keep Firebase custom claims in sync with provisioned user profiles."""
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+from backend.logging_utils import get_logger
+from backend.reps.firebase import auth_client
+from backend.reps.firestore import afs
+
+logger = get_logger(__name__)
+
+CLAIM_KEYS = ("roles", "branchId")
+# auth.get_users accepts at most 100 identifiers per call.
+GET_USERS_BATCH = 100
+
+
+def build_claims(existing: dict[str, Any] | None, roles: list[str], branch_id: str | None) -> dict[str, Any]:
+    """Merge the provisioning claims into whatever custom claims the user already has."""
+
+    claims = {key: value for key, value in (existing or {}).items() if key not in CLAIM_KEYS}
+    claims["roles"] = list(roles)
+    if branch_id:
+        claims["branchId"] = branch_id
+    return claims
+
+
+async def sync_user_claims(uid: str, roles: list[str], branch_id: str | None) -> bool:
+    """Push roles/branchId into the user's custom claims. Returns True when they changed."""
+
+    # The Firebase Auth admin API is blocking HTTP, so keep it off the event loop.
+    client = auth_client()
+    record = await asyncio.to_thread(client.get_user, uid)
+    current = dict(record.custom_claims or {})
+    claims = build_claims(current, roles, branch_id)
+    if claims == current:
+        return False
+    await asyncio.to_thread(client.set_custom_user_claims, uid, claims)
+    logger.info(
+        "custom claims synced",
+        extra={"uid": uid, "roles": claims["roles"], "branchId": claims.get("branchId")},
+    )
+    return True
+
+
+async def _backfill_group(
+    client: Any, profiles: list[tuple[str, list[str], str]], summary: dict[str, int], dry_run: bool
+) -> None:
+    uids = [uid for uid, _, _ in profiles]
+    try:
+        result = await asyncio.to_thread(client.get_users, [client.UidIdentifier(uid) for uid in uids])
+    except Exception as exc:
+        summary["failed"] += len(profiles)
+        logger.warning("claims backfill lookup failed", extra={"uid_count": len(uids), "error": str(exc)})
+        return
+    records = {record.uid: record for record in result.users}
+    for uid, roles, branch_id in profiles:
+        record = records.get(uid)
+        if record is None:
+            summary["failed"] += 1
+            logger.warning("claims backfill failed", extra={"uid": uid, "error": "no such auth user"})
+            continue
+        current = dict(record.custom_claims or {})
+        claims = build_claims(current, roles, branch_id)
+        if claims == current:
+            summary["unchanged"] += 1
+            continue
+        try:
+            if not dry_run:
+                await asyncio.to_thread(client.set_custom_user_claims, uid, claims)
+        except Exception as exc:
+            summary["failed"] += 1
+            logger.warning("claims backfill failed", extra={"uid": uid, "error": str(exc)})
+            continue
+        summary["updated"] += 1
+
+
+async def backfill_user_claims(*, dry_run: bool = False) -> dict[str, int]:
+    """Copy roles/branchId from every stored profile into Firebase custom claims.
+
+    Auth users are looked up ``GET_USERS_BATCH`` at a time, and only users whose
+    claims differ are written.
+    """
+
+    summary = {"scanned": 0, "updated": 0, "unchanged": 0, "skipped": 0, "failed": 0}
+    client = auth_client()
+    group: list[tuple[str, list[str], str]] = []
+    async for snapshot in afs().collection("users").stream():
+        summary["scanned"] += 1
+        profile = snapshot.to_dict() or {}
+        roles = profile.get("roles")
+        branch_id = profile.get("branchId")
+        if not roles or not branch_id:
+            summary["skipped"] += 1
+            continue
+        group.append((profile.get("uid") or snapshot.id, list(roles), branch_id))
+        if len(group) == GET_USERS_BATCH:
+            await _backfill_group(client, group, summary, dry_run)
+            group = []
+    if group:
+        await _backfill_group(client, group, summary, dry_run)
+    logger.info("claims backfill finished", extra={"dry_run": dry_run, **summary})
+    return summary
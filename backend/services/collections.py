@@ -1,13 +1,38 @@
 """Generic collection service for Firestore-backed resources."""
 from __future__ import annotations
 
-from dataclasses import dataclass
-from datetime import datetime, timezone
-from typing import Any, Iterable
-
+import asyncio
+import base64
+import json
+import random
+import re
+import zlib
+from dataclasses import dataclass, field
+from datetime import date, datetime, timezone
+from functools import cached_property
+from typing import Annotated, Any, AsyncIterator, Callable, Iterable, Union
+
+from google.api_core import exceptions as google_exceptions
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
 from google.cloud import firestore
+from pydantic import AfterValidator, BaseModel, ConfigDict, StrictBool, StrictFloat, StrictInt, StrictStr
+from pydantic import ValidationError as PydanticValidationError
+from pydantic import create_model
+
+from backend.cache_utils import ExpiringLRUCache
+from backend.config import get_settings
+from backend.logging_utils import get_logger
+from backend.reps.firestore import afs
+
+logger = get_logger(__name__)
 
-from backend.reps.firestore import fs
+
+# Firestore accepts at most 500 writes per batch commit.
+WRITE_BATCH_LIMIT = 500
+# Per-branch counters live on ``branchStats/{branchId}/shards/{n}`` documents.
+BRANCH_STATS_COLLECTION = "branchStats"
+# Per-branch listings live on ``branchRosters/{branchId}/chunks/chunk_{n}`` documents.
+ROSTERS_COLLECTION = "branchRosters"
 
 
 class CollectionError(Exception):
@@ -37,6 +62,24 @@ class ValidationError(CollectionError):
     status_code = 422
 
 
+class DocumentNotFoundError(CollectionError):
+    """Raised when the addressed document does not exist (or is outside the caller's branch)."""
+
+    status_code = 404
+
+
+class PreconditionFailedError(CollectionError):
+    """Raised when an ``If-Match`` version no longer matches the stored document."""
+
+    status_code = 412
+
+
+class DocumentExistsError(CollectionError):
+    """Raised when a create addresses an id that is already taken."""
+
+    status_code = 409
+
+
 @dataclass(frozen=True)
 class RelationshipRule:
     """Describe a relationship constraint."""
@@ -46,6 +89,249 @@ class RelationshipRule:
     optional: bool = False
 
 
+@dataclass(frozen=True)
+class CompositeIndex:
+    """A composite index deployed for a collection.
+
+    Equality fields come first and the sort/range field last; ``"field desc"``
+    marks a descending field and ``"field[]"`` an array-contains field.
+    """
+
+    fields: tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class SummaryRule:
+    """Monthly tallies of a collection's documents, kept in ``target``.
+
+    Each record counts once towards the ``counters`` field of its status on the
+    summary for its ``key_fields`` and the month of ``date_field``. Writes to
+    the collection move that count in the same batch as the record.
+    """
+
+    target: str
+    key_fields: tuple[str, ...]
+    date_field: str
+    status_field: str
+    # (status value, counter field) pairs.
+    counters: tuple[tuple[str, str], ...]
+
+    @property
+    def source_fields(self) -> tuple[str, ...]:
+        return (*self.key_fields, self.date_field, self.status_field)
+
+    def key(self, record: dict[str, Any] | None) -> tuple[Any, ...] | None:
+        """Return ``(*keys, year, month, counter_field)`` or ``None`` if the record is not counted."""
+
+        if not record:
+            return None
+        keys = tuple(record.get(name) for name in self.key_fields)
+        if not all(isinstance(value, str) and value for value in keys):
+            return None
+        period = _month_of(record.get(self.date_field))
+        counter = dict(self.counters).get(record.get(self.status_field))
+        if period is None or counter is None:
+            return None
+        return (*keys, *period, counter)
+
+    def summary_id(self, key: tuple[Any, ...]) -> str:
+        *keys, year, month, _ = key
+        return "_".join(keys) + f"_{year:04d}-{month:02d}"
+
+    def summary_fields(self, key: tuple[Any, ...]) -> dict[str, Any]:
+        *keys, year, month, _ = key
+        return {**dict(zip(self.key_fields, keys)), "year": year, "month": month}
+
+
+def _month_of(value: Any) -> tuple[int, int] | None:
+    if isinstance(value, (date, datetime)):
+        return value.year, value.month
+    if isinstance(value, str):
+        try:
+            parsed = date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+        return parsed.year, parsed.month
+    return None
+
+
+class SummaryDeltas:
+    """Net counter moves per summary document, accumulated over many records."""
+
+    def __init__(self) -> None:
+        self._moves: dict[tuple[SummaryRule, tuple[Any, ...]], int] = {}
+
+    def add(self, rules: Iterable[SummaryRule], record: dict[str, Any] | None, amount: int) -> None:
+        for rule in rules:
+            key = rule.key(record)
+            if key is not None:
+                self._moves[(rule, key)] = self._moves.get((rule, key), 0) + amount
+
+    def change(
+        self, rules: Iterable[SummaryRule], before: dict[str, Any] | None, after: dict[str, Any] | None
+    ) -> None:
+        rules = tuple(rules)
+        self.add(rules, before, -1)
+        self.add(rules, after, 1)
+
+    def writes(self, client: firestore.AsyncClient, now: datetime) -> list[tuple[Any, dict[str, Any]]]:
+        """Return ``(ref, data)`` merge-sets applying the moves as atomic increments."""
+
+        grouped: dict[tuple[str, str], tuple[SummaryRule, dict[str, Any], dict[str, int]]] = {}
+        for (rule, key), amount in self._moves.items():
+            doc_key = (rule.target, rule.summary_id(key))
+            if doc_key not in grouped:
+                grouped[doc_key] = (rule, rule.summary_fields(key), {})
+            counts = grouped[doc_key][2]
+            counts[key[-1]] = counts.get(key[-1], 0) + amount
+
+        writes = []
+        for (target, summary_id), (rule, fields, counts) in grouped.items():
+            if not any(counts.values()):
+                continue
+            # Increment(0) creates missing counters without touching existing ones.
+            increments = {
+                counter: firestore.Increment(counts.get(counter, 0)) for _, counter in rule.counters
+            }
+            data = {**fields, **increments, "generatedAt": now}
+            writes.append((client.collection(target).document(summary_id), data))
+        return writes
+
+
+def branch_stats_shards(branch_id: str) -> str:
+    """Path of the collection holding a branch's counter shards."""
+
+    return f"{BRANCH_STATS_COLLECTION}/{branch_id}/shards"
+
+
+@dataclass(frozen=True)
+class CounterRule:
+    """A per-branch count of matching documents, kept on sharded ``branchStats`` documents.
+
+    Documents whose ``match`` fields hold the given values count once towards
+    ``name`` for the branch in ``branch_field`` (the collection's
+    ``branch_scope_field`` unless set).
+    """
+
+    name: str
+    match: tuple[tuple[str, Any], ...] = ()
+    branch_field: str | None = None
+
+    def matches(self, record: dict[str, Any]) -> bool:
+        return all(record.get(name) == value for name, value in self.match)
+
+
+class CounterDeltas:
+    """Net counter moves per branch, accumulated over many records."""
+
+    def __init__(self) -> None:
+        self._moves: dict[str, dict[str, int]] = {}
+
+    def add(self, definition: "CollectionDefinition", record: dict[str, Any] | None, amount: int) -> None:
+        if not record:
+            return
+        for rule in definition.counters:
+            branch = record.get(rule.branch_field or definition.branch_scope_field or "")
+            if isinstance(branch, str) and branch and rule.matches(record):
+                counts = self._moves.setdefault(branch, {})
+                counts[rule.name] = counts.get(rule.name, 0) + amount
+
+    def writes(self, client: firestore.AsyncClient, shards: int) -> list[tuple[Any, dict[str, Any]]]:
+        """Return one merge-set per branch, on a random shard to spread the write rate."""
+
+        writes = []
+        for branch, counts in self._moves.items():
+            increments = {name: firestore.Increment(amount) for name, amount in counts.items() if amount}
+            if not increments:
+                continue
+            shard = client.collection(branch_stats_shards(branch)).document(str(random.randrange(max(1, shards))))
+            writes.append((shard, increments))
+        return writes
+
+
+def branch_roster_chunks(branch_id: str) -> str:
+    """Path of the collection holding a branch's roster chunks."""
+
+    return f"{ROSTERS_COLLECTION}/{branch_id}/chunks"
+
+
+def roster_chunk_id(doc_id: str, chunks: int) -> str:
+    return f"chunk_{zlib.crc32(doc_id.encode()) % max(1, chunks)}"
+
+
+@dataclass(frozen=True)
+class RosterRule:
+    """A compact per-branch listing of a collection, kept on ``branchRosters`` chunk documents.
+
+    Each document's ``entry`` is stored under ``{collection}.{id}`` on one of
+    its branch's ``STUDENT_ROSTER_CHUNKS`` chunks, in the same batch as the
+    document. ``source_fields`` are the fields ``entry`` reads.
+    """
+
+    entry: Callable[[dict[str, Any]], dict[str, Any]]
+    source_fields: tuple[str, ...]
+    branch_field: str | None = None
+
+
+def roster_writes(
+    client: firestore.AsyncClient,
+    definition: "CollectionDefinition",
+    changes: Iterable[tuple[str, dict[str, Any] | None, dict[str, Any] | None]],
+) -> list[tuple[Any, dict[str, Any]]]:
+    """Roster entry upserts implied by ``(id, before, after)`` document changes.
+
+    A document moved to another branch is also removed from its old roster.
+    Each returned ``(ref, data)`` is meant for ``batch.set(ref, data, merge=True)``.
+    """
+
+    rule = definition.roster
+    if rule is None:
+        return []
+    branch_field = rule.branch_field or definition.branch_scope_field or ""
+    chunks = get_settings().student_roster_chunks
+    grouped: dict[tuple[str, str], tuple[Any, dict[str, Any]]] = {}
+
+    def _put(branch: Any, doc_id: str, value: Any) -> None:
+        if not isinstance(branch, str) or not branch:
+            return
+        chunk_id = roster_chunk_id(doc_id, chunks)
+        if (branch, chunk_id) not in grouped:
+            ref = client.collection(branch_roster_chunks(branch)).document(chunk_id)
+            grouped[(branch, chunk_id)] = (ref, {})
+        grouped[(branch, chunk_id)][1][doc_id] = value
+
+    for doc_id, before, after in changes:
+        old_branch = (before or {}).get(branch_field)
+        new_branch = (after or {}).get(branch_field)
+        if old_branch and old_branch != new_branch:
+            _put(old_branch, doc_id, firestore.DELETE_FIELD)
+        if after:
+            _put(new_branch, doc_id, rule.entry(after))
+    return [(ref, {definition.name: entries}) for ref, entries in grouped.values()]
+
+
+def aggregate_writes(
+    client: firestore.AsyncClient,
+    definition: "CollectionDefinition",
+    changes: Iterable[tuple[dict[str, Any] | None, dict[str, Any] | None]],
+) -> list[tuple[Any, dict[str, Any]]]:
+    """Summary and branch counter increments implied by ``(before, after)`` record pairs.
+
+    Each returned ``(ref, data)`` is meant for ``batch.set(ref, data, merge=True)``
+    in the same batch as the records themselves.
+    """
+
+    summaries = SummaryDeltas()
+    counters = CounterDeltas()
+    for before, after in changes:
+        summaries.change(definition.summaries, before, after)
+        counters.add(definition, before, -1)
+        counters.add(definition, after, 1)
+    return summaries.writes(client, datetime.now(timezone.utc)) + counters.writes(
+        client, get_settings().branch_stats_shards
+    )
+
+
 @dataclass(frozen=True)
 class CollectionDefinition:
     """Describe how to validate and scope a Firestore collection."""
@@ -56,12 +342,262 @@ class CollectionDefinition:
     branch_scope_field: str | None = None
     create_roles: tuple[str, ...] = ("admin",)
     read_roles: tuple[str, ...] = ("admin", "staff")
+    optional_fields: tuple[str, ...] = ()
+    # Existence cache used when other collections reference this one (seconds, 0 disables).
+    exists_cache_ttl: float = 0.0
+    exists_negative_ttl: float = 0.0
+    # Value types used to coerce query filters: string, int, number, bool, date, timestamp, array.
+    field_types: dict[str, str] = field(default_factory=dict)
+    indexes: tuple[CompositeIndex, ...] = ()
+    summaries: tuple[SummaryRule, ...] = ()
+    counters: tuple[CounterRule, ...] = ()
+    roster: RosterRule | None = None
+
+    @cached_property
+    def validator(self) -> "CollectionValidator":
+        """Validator compiled from this definition on first use."""
+
+        return CollectionValidator(self)
+
+    @property
+    def maintains_aggregates(self) -> bool:
+        return bool(self.summaries or self.counters or self.roster)
+
+    @cached_property
+    def aggregate_fields(self) -> frozenset[str]:
+        """Fields whose changes move a summary or counter or rewrite a roster entry."""
+
+        names = {name for rule in self.summaries for name in rule.source_fields}
+        for rule in self.counters:
+            names.update(name for name, _ in rule.match)
+            branch_field = rule.branch_field or self.branch_scope_field
+            if branch_field:
+                names.add(branch_field)
+        if self.roster:
+            names.update(self.roster.source_fields)
+            names.add(self.roster.branch_field or self.branch_scope_field or "")
+            names.discard("")
+        return frozenset(names)
+
+
+class PathAccessor:
+    """Precompiled reader for a field path such as ``guardianLinks[].guardianId``.
+
+    The path is split once; ``values`` walks it for each payload.
+    """
+
+    __slots__ = ("path", "_steps")
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._steps = tuple((part.removesuffix("[]"), part.endswith("[]")) for part in path.split("."))
+
+    def values(self, payload: Any) -> list[Any]:
+        current = [payload]
+        for key, is_list in self._steps:
+            found: list[Any] = []
+            for item in current:
+                if not isinstance(item, dict) or key not in item:
+                    continue
+                value = item[key]
+                if is_list:
+                    if isinstance(value, list):
+                        found.extend(value)
+                else:
+                    found.append(value)
+            current = found
+        return current
+
+
+def _iso_text(value: str) -> str:
+    datetime.fromisoformat(value)
+    return value
+
+
+def _is_list(value: Any) -> Any:
+    # Checked by type only so large arrays are not copied item by item.
+    if not isinstance(value, list):
+        raise ValueError("expected a list")
+    return value
+
+
+def _is_iso_text(value: Any) -> bool:
+    if type(value) is not str:
+        return False
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+
+# Plain checks that only accept values the strict model accepts too; the model
+# runs (and words the error) only when one of them says no.
+_FAST_TYPE_CHECKS: dict[str, Any] = {
+    "string": lambda value: type(value) is str,
+    "int": lambda value: type(value) is int,
+    "number": lambda value: type(value) is int or type(value) is float,
+    "bool": lambda value: type(value) is bool,
+    "date": _is_iso_text,
+    "timestamp": lambda value: isinstance(value, datetime) or _is_iso_text(value),
+    "array": lambda value: type(value) is list,
+}
+
+_PYDANTIC_FIELD_TYPES: dict[str, Any] = {
+    "string": StrictStr,
+    "int": StrictInt,
+    "number": Union[StrictInt, StrictFloat],
+    "bool": StrictBool,
+    "date": Annotated[StrictStr, AfterValidator(_iso_text)],
+    "timestamp": Union[datetime, Annotated[StrictStr, AfterValidator(_iso_text)]],
+    "array": Annotated[Any, AfterValidator(_is_list)],
+}
+
+
+class CollectionValidator:
+    """Checks compiled once from a ``CollectionDefinition``.
+
+    Required fields become a frozenset, relationship paths become
+    ``PathAccessor`` objects, and typed fields are checked by a generated
+    pydantic model that only ever sees the typed subset of a payload.
+    Definitions without ``field_types`` get no model at all, and valid typed
+    values are accepted by plain per-field checks before the model is needed.
+    """
+
+    def __init__(self, definition: CollectionDefinition) -> None:
+        self.definition = definition
+        self.required = frozenset(definition.required_fields)
+        self._required_order = definition.required_fields
+        self.relationships = tuple(
+            (rule, PathAccessor(rule.field_path))
+            for rule in definition.relationship_rules
+            if "varies" not in rule.target_collections
+        )
+        self.typed_fields = tuple(definition.field_types)
+        self._fast_checks = tuple(
+            (name, _FAST_TYPE_CHECKS[kind])
+            for name, kind in definition.field_types.items()
+            if kind in _FAST_TYPE_CHECKS
+        )
+        self.model: type[BaseModel] | None = None
+        if self.typed_fields:
+            self.model = create_model(
+                f"{definition.name[:1].upper()}{definition.name[1:]}Fields",
+                __config__=ConfigDict(strict=True),
+                **{
+                    name: (_PYDANTIC_FIELD_TYPES.get(kind, Any) | None, None)
+                    for name, kind in definition.field_types.items()
+                },
+            )
+
+    def validate(self, payload: dict[str, Any]) -> None:
+        """Raise ``ValidationError`` for missing required fields or mistyped known fields."""
+
+        if not self.required.issubset(payload.keys()):
+            missing = [name for name in self._required_order if name not in payload]
+            raise ValidationError(f"missing required fields: {', '.join(missing)}")
+        self._check_types(payload)
+
+    def validate_changes(self, changes: dict[str, Any]) -> None:
+        """Type-check a partial update; required fields may not be cleared."""
+
+        cleared = [name for name in self._required_order if name in changes and changes[name] is None]
+        if cleared:
+            raise ValidationError(f"required fields cannot be cleared: {', '.join(cleared)}")
+        self._check_types(changes)
+
+    def _check_types(self, payload: dict[str, Any]) -> None:
+        if self.model is None:
+            return
+        for name, check in self._fast_checks:
+            value = payload.get(name)
+            if value is not None and not check(value):
+                break
+        else:
+            return
+        typed = {name: payload[name] for name in self.typed_fields if name in payload}
+        try:
+            self.model.model_validate(typed)
+        except PydanticValidationError as exc:
+            name = str(exc.errors()[0]["loc"][0])
+            raise ValidationError(
+                f"invalid value for '{name}': expected {self.definition.field_types[name]}"
+            ) from None
+
+    def changed_relationships(self, field_paths: Iterable[str]) -> "CollectionValidator":
+        """Return a validator limited to the relationships touched by ``field_paths``."""
+
+        touched = []
+        for rule, accessor in self.relationships:
+            plain = rule.field_path.replace("[]", "")
+            if any(
+                plain == path or plain.startswith(f"{path}.") or path.startswith(f"{plain}.")
+                for path in field_paths
+            ):
+                touched.append((rule, accessor))
+        limited = object.__new__(CollectionValidator)
+        limited.__dict__.update(self.__dict__)
+        limited.relationships = tuple(touched)
+        return limited
+
+    def references(self, payload: dict[str, Any]) -> dict[str, set[str]]:
+        """Collect every candidate document id referenced by ``payload``, per target collection."""
+
+        references: dict[str, set[str]] = {}
+        for rule, accessor in self.relationships:
+            ids = {value for value in accessor.values(payload) if value and isinstance(value, str)}
+            if not ids:
+                continue
+            for target in rule.target_collections:
+                references.setdefault(target, set()).update(ids)
+        return references
+
+    def check_relationships(self, payload: dict[str, Any], existing: set[tuple[str, str]]) -> None:
+        for rule, accessor in self.relationships:
+            values = accessor.values(payload)
+            if not values:
+                if rule.optional:
+                    continue
+                raise ValidationError(f"missing relationship field '{rule.field_path}'")
+            targets = rule.target_collections
+            single = targets[0] if len(targets) == 1 else None
+            for value in values:
+                if value is None or value == "":
+                    if rule.optional:
+                        continue
+                    raise ValidationError(f"relationship '{rule.field_path}' cannot be empty")
+                if not isinstance(value, str):
+                    raise ValidationError(
+                        f"relationship '{rule.field_path}' values must be strings (document ids)"
+                    )
+                if single is not None:
+                    if (single, value) not in existing:
+                        raise ValidationError(f"related document '{value}' not found in '{single}'")
+                elif not any((target, value) in existing for target in targets):
+                    raise ValidationError(
+                        f"related document '{value}' not found in any of: {', '.join(targets)}"
+                    )
 
 
 def _split_multi(value: str) -> tuple[str, ...]:
     return tuple(part.strip() for part in value.split("|") if part.strip())
 
 
+def _student_roster_entry(record: dict[str, Any]) -> dict[str, Any]:
+    """Listing fields served by ``GET /students`` for either student document shape.
+
+    ``POST /students`` writes ``name``/``guardianPhone``; collection documents
+    carry ``firstName``/``lastName`` and a ``contact`` map instead.
+    """
+
+    name = record.get("name") or " ".join(
+        part for part in (record.get("firstName"), record.get("lastName")) if isinstance(part, str) and part
+    )
+    contact = record.get("contact")
+    phone = record.get("guardianPhone") or (contact.get("phone") if isinstance(contact, dict) else None)
+    return {"name": name, "guardianPhone": phone or "", "createdAt": record.get("createdAt")}
+
+
 COLLECTION_DEFINITIONS: dict[str, CollectionDefinition] = {
     "branches": CollectionDefinition(
         name="branches",
@@ -71,6 +607,9 @@ COLLECTION_DEFINITIONS: dict[str, CollectionDefinition] = {
         ),
         create_roles=("admin",),
         read_roles=("admin", "staff"),
+        exists_cache_ttl=600.0,
+        exists_negative_ttl=5.0,
+        field_types={"isActive": "bool"},
     ),
     "staff": CollectionDefinition(
         name="staff",
@@ -78,8 +617,12 @@ COLLECTION_DEFINITIONS: dict[str, CollectionDefinition] = {
         relationship_rules=(
             RelationshipRule("branchRoles[].branchId", ("branches",), optional=True),
         ),
+        optional_fields=("active",),
         create_roles=("admin",),
         read_roles=("admin",),
+        exists_cache_ttl=300.0,
+        exists_negative_ttl=5.0,
+        field_types={"active": "bool", "branchRoles": "array"},
     ),
     "guardians": CollectionDefinition(
         name="guardians",
@@ -87,8 +630,10 @@ COLLECTION_DEFINITIONS: dict[str, CollectionDefinition] = {
         relationship_rules=(
             RelationshipRule("studentIds[]", ("students",), optional=True),
         ),
+        optional_fields=("preferredChannel",),
         create_roles=("admin", "staff"),
         read_roles=("admin", "staff"),
+        field_types={"studentIds": "array"},
     ),
     "students": CollectionDefinition(
         name="students",
@@ -97,9 +642,23 @@ COLLECTION_DEFINITIONS: dict[str, CollectionDefinition] = {
             RelationshipRule("branchId", ("branches",)),
             RelationshipRule("guardianLinks[].guardianId", ("guardians",), optional=True),
         ),
+        optional_fields=("contact", "dateOfBirth", "gender", "notes"),
         branch_scope_field="branchId",
         create_roles=("admin", "staff"),
         read_roles=("admin", "staff"),
+        exists_cache_ttl=120.0,
+        exists_negative_ttl=5.0,
+        field_types={"dateOfBirth": "date"},
+        indexes=(
+            CompositeIndex(("branchId", "lastName")),
+            CompositeIndex(("branchId", "status", "lastName")),
+            CompositeIndex(("branchId", "createdAt desc")),
+        ),
+        counters=(CounterRule("activeStudents", (("status", "active"),)),),
+        roster=RosterRule(
+            _student_roster_entry,
+            ("name", "firstName", "lastName", "guardianPhone", "contact", "createdAt"),
+        ),
     ),
     "batches": CollectionDefinition(
         name="batches",
@@ -119,6 +678,14 @@ COLLECTION_DEFINITIONS: dict[str, CollectionDefinition] = {
         branch_scope_field="branchId",
         create_roles=("admin", "staff"),
         read_roles=("admin", "staff"),
+        exists_cache_ttl=300.0,
+        exists_negative_ttl=5.0,
+        field_types={"startDate": "date", "endDate": "date", "isActive": "bool"},
+        indexes=(
+            CompositeIndex(("branchId", "startDate")),
+            CompositeIndex(("branchId", "isActive", "startDate")),
+        ),
+        counters=(CounterRule("activeBatches", (("isActive", True),)),),
     ),
     "enrollments": CollectionDefinition(
         name="enrollments",
@@ -138,6 +705,12 @@ COLLECTION_DEFINITIONS: dict[str, CollectionDefinition] = {
         branch_scope_field="branchId",
         create_roles=("admin", "staff"),
         read_roles=("admin", "staff"),
+        field_types={"joinedAt": "date"},
+        indexes=(
+            CompositeIndex(("branchId", "status", "joinedAt")),
+            CompositeIndex(("branchId", "batchId", "joinedAt")),
+        ),
+        counters=(CounterRule("activeEnrollments", (("status", "active"),)),),
     ),
     "attendanceRecords": CollectionDefinition(
         name="attendanceRecords",
@@ -154,9 +727,25 @@ COLLECTION_DEFINITIONS: dict[str, CollectionDefinition] = {
             RelationshipRule("batchId", ("batches",)),
             RelationshipRule("recordedBy", ("staff",)),
         ),
+        optional_fields=("notes",),
         branch_scope_field=None,
         create_roles=("admin", "staff"),
         read_roles=("admin", "staff"),
+        field_types={"sessionDate": "date", "recordedAt": "date"},
+        indexes=(
+            CompositeIndex(("batchId", "sessionDate")),
+            CompositeIndex(("studentId", "sessionDate")),
+            CompositeIndex(("studentId", "sessionDate desc")),
+        ),
+        summaries=(
+            SummaryRule(
+                target="attendanceSummaries",
+                key_fields=("studentId", "batchId"),
+                date_field="sessionDate",
+                status_field="status",
+                counters=(("present", "presentCount"), ("absent", "absentCount"), ("late", "lateCount")),
+            ),
+        ),
     ),
     "attendanceSummaries": CollectionDefinition(
         name="attendanceSummaries",
@@ -173,8 +762,20 @@ COLLECTION_DEFINITIONS: dict[str, CollectionDefinition] = {
             RelationshipRule("studentId", ("students",)),
             RelationshipRule("batchId", ("batches",)),
         ),
+        optional_fields=("generatedAt",),
         create_roles=("admin", "staff"),
         read_roles=("admin", "staff"),
+        field_types={
+            "month": "int",
+            "year": "int",
+            "presentCount": "int",
+            "absentCount": "int",
+            "lateCount": "int",
+        },
+        indexes=(
+            CompositeIndex(("studentId", "year", "month")),
+            CompositeIndex(("batchId", "year", "month")),
+        ),
     ),
     "invoices": CollectionDefinition(
         name="invoices",
@@ -189,9 +790,17 @@ COLLECTION_DEFINITIONS: dict[str, CollectionDefinition] = {
         relationship_rules=(
             RelationshipRule("enrollmentId", ("enrollments",)),
         ),
+        optional_fields=("currency", "lineItems"),
         branch_scope_field=None,
         create_roles=("admin",),
         read_roles=("admin", "staff"),
+        field_types={"issueDate": "date", "dueDate": "date", "totalAmount": "number"},
+        indexes=(
+            CompositeIndex(("status", "dueDate")),
+            CompositeIndex(("enrollmentId", "issueDate desc")),
+        ),
+        # Invoices are not branch-scoped; billing runs stamp the enrollment's branchId.
+        counters=(CounterRule("pendingInvoices", (("status", "pending"),), branch_field="branchId"),),
     ),
     "payments": CollectionDefinition(
         name="payments",
@@ -199,8 +808,11 @@ COLLECTION_DEFINITIONS: dict[str, CollectionDefinition] = {
         relationship_rules=(
             RelationshipRule("invoiceId", ("invoices",)),
         ),
+        optional_fields=("currency", "status"),
         create_roles=("admin",),
         read_roles=("admin", "staff"),
+        field_types={"amount": "number", "receivedAt": "date"},
+        indexes=(CompositeIndex(("invoiceId", "receivedAt desc")),),
     ),
     "roleAssignments": CollectionDefinition(
         name="roleAssignments",
@@ -211,6 +823,7 @@ COLLECTION_DEFINITIONS: dict[str, CollectionDefinition] = {
         ),
         create_roles=("admin",),
         read_roles=("admin",),
+        field_types={"permissions": "array", "branchScope": "array"},
     ),
     "auditLogs": CollectionDefinition(
         name="auditLogs",
@@ -227,6 +840,11 @@ COLLECTION_DEFINITIONS: dict[str, CollectionDefinition] = {
         ),
         create_roles=("admin",),
         read_roles=("admin",),
+        field_types={"timestamp": "date"},
+        indexes=(
+            CompositeIndex(("action", "timestamp desc")),
+            CompositeIndex(("entityType", "entityId", "timestamp desc")),
+        ),
     ),
     "notifications": CollectionDefinition(
         name="notifications",
@@ -242,6 +860,8 @@ COLLECTION_DEFINITIONS: dict[str, CollectionDefinition] = {
         ),
         create_roles=("admin", "staff"),
         read_roles=("admin", "staff"),
+        field_types={"scheduledAt": "date"},
+        indexes=(CompositeIndex(("status", "scheduledAt")),),
     ),
     "config": CollectionDefinition(
         name="config",
@@ -252,101 +872,137 @@ COLLECTION_DEFINITIONS: dict[str, CollectionDefinition] = {
 }
 
 
-def _get_definition(collection: str) -> CollectionDefinition:
-    definition = COLLECTION_DEFINITIONS.get(collection)
-    if not definition:
-        raise UnknownCollectionError(collection)
-    return definition
+# Compile every validator at import so no request pays for it.
+for _definition in COLLECTION_DEFINITIONS.values():
+    _definition.validator
+del _definition
 
 
-def _ensure_role(user_roles: Iterable[str], allowed_roles: Iterable[str]) -> None:
-    if not set(user_roles or ()).intersection(allowed_roles):
-        raise AuthorizationError("forbidden")
-
-
-def _extract_values(payload: Any, field_path: str) -> list[Any]:
-    parts = field_path.split(".")
+_exists_caches: dict[str, ExpiringLRUCache[str, bool]] = {}
 
-    def _walk(current: Any, idx: int) -> list[Any]:
-        if current is None:
-            return []
-        part = parts[idx]
-        is_list = part.endswith("[]")
-        key = part[:-2] if is_list else part
 
-        if isinstance(current, dict):
-            if key not in current:
-                return []
-            value = current[key]
-        else:
-            return []
+def _exists_cache(collection: str) -> ExpiringLRUCache[str, bool] | None:
+    definition = COLLECTION_DEFINITIONS.get(collection)
+    if not definition or definition.exists_cache_ttl <= 0:
+        return None
+    cache = _exists_caches.get(collection)
+    if cache is None:
+        cache = ExpiringLRUCache(get_settings().exists_cache_size)
+        _exists_caches[collection] = cache
+    return cache
+
+
+def _remember_exists(collection: str, doc_id: str, exists: bool) -> None:
+    cache = _exists_cache(collection)
+    if cache is None:
+        return
+    definition = COLLECTION_DEFINITIONS[collection]
+    ttl = definition.exists_cache_ttl if exists else definition.exists_negative_ttl
+    if ttl > 0:
+        cache.set_for(doc_id, exists, ttl)
+    else:
+        cache.pop(doc_id)
 
-        if is_list:
-            if not isinstance(value, list):
-                return []
-            values: list[Any] = []
-            if idx == len(parts) - 1:
-                values.extend(value)
-            else:
-                for item in value:
-                    values.extend(_walk(item, idx + 1))
-            return values
 
-        if idx == len(parts) - 1:
-            return [value]
+def existence_cache_stats() -> dict[str, dict[str, int]]:
+    """Hit/miss counters of the reference existence caches, per target collection."""
 
-        return _walk(value, idx + 1)
+    return {name: cache.stats() for name, cache in sorted(_exists_caches.items())}
 
-    return _walk(payload, 0)
 
+def clear_existence_cache() -> None:
+    _exists_caches.clear()
 
-def _validate_required_fields(definition: CollectionDefinition, payload: dict[str, Any]) -> None:
-    missing = [field for field in definition.required_fields if field not in payload]
-    if missing:
-        raise ValidationError(f"missing required fields: {', '.join(missing)}")
 
+METADATA_FIELDS = ("createdAt", "createdBy", "updatedAt", "updatedBy")
 
-def _document_exists(client: firestore.Client, collection: str, doc_id: str) -> bool:
-    if not doc_id:
-        return False
-    return client.collection(collection).document(doc_id).get().exists
 
+def _known_fields(definition: CollectionDefinition) -> frozenset[str]:
+    """Top-level fields a collection's documents are expected to carry."""
 
-def _validate_relationships(definition: CollectionDefinition, payload: dict[str, Any], client: firestore.Client) -> None:
+    fields = {*definition.required_fields, *definition.optional_fields, *METADATA_FIELDS}
     for rule in definition.relationship_rules:
-        if "varies" in rule.target_collections:
-            continue
+        fields.add(rule.field_path.split(".")[0].removesuffix("[]"))
+    if definition.branch_scope_field:
+        fields.add(definition.branch_scope_field)
+    return frozenset(fields)
+
+
+def _resolve_projection(definition: CollectionDefinition, fields: str | None) -> list[str] | None:
+    """Turn a ``fields=a,b.c`` parameter into Firestore field paths (``id`` is implicit)."""
+
+    if fields is None:
+        return None
+    requested: list[str] = []
+    for field in fields.split(","):
+        field = field.strip()
+        if field and field != "id" and field not in requested:
+            requested.append(field)
+    known = _known_fields(definition)
+    unknown = [field for field in requested if field.split(".")[0] not in known]
+    if unknown:
+        raise ValidationError(
+            f"unknown fields for '{definition.name}': {', '.join(unknown)}"
+        )
+    return requested
 
-        values = _extract_values(payload, rule.field_path)
 
-        if not values:
-            if rule.optional:
-                continue
-            raise ValidationError(f"missing relationship field '{rule.field_path}'")
+def _get_definition(collection: str) -> CollectionDefinition:
+    definition = COLLECTION_DEFINITIONS.get(collection)
+    if not definition:
+        raise UnknownCollectionError(collection)
+    return definition
 
-        for value in values:
-            if value is None or value == "":
-                if rule.optional:
-                    continue
-                raise ValidationError(f"relationship '{rule.field_path}' cannot be empty")
 
-            if not isinstance(value, str):
-                raise ValidationError(
-                    f"relationship '{rule.field_path}' values must be strings (document ids)"
-                )
+def _ensure_role(user_roles: Iterable[str], allowed_roles: Iterable[str]) -> None:
+    if not set(user_roles or ()).intersection(allowed_roles):
+        raise AuthorizationError("forbidden")
 
-            targets = rule.target_collections
-            if len(targets) == 1:
-                if not _document_exists(client, targets[0], value):
-                    raise ValidationError(
-                        f"related document '{value}' not found in '{targets[0]}'"
-                    )
-            else:
-                if not any(_document_exists(client, target, value) for target in targets):
-                    targets_str = ", ".join(targets)
-                    raise ValidationError(
-                        f"related document '{value}' not found in any of: {targets_str}"
-                    )
+
+async def _fetch_existing(
+    client: firestore.AsyncClient, references: dict[str, set[str]]
+) -> set[tuple[str, str]]:
+    """Resolve references with one batched read per target collection, run concurrently.
+
+    Ids answered by the collection's existence cache are not read again.
+    """
+
+    async def _existing_in(collection: str, doc_ids: set[str]) -> set[tuple[str, str]]:
+        found: set[tuple[str, str]] = set()
+        cache = _exists_cache(collection)
+        if cache is not None:
+            pending: set[str] = set()
+            for doc_id in doc_ids:
+                cached = cache.get(doc_id)
+                if cached is None:
+                    pending.add(doc_id)
+                elif cached:
+                    found.add((collection, doc_id))
+            doc_ids = pending
+        if not doc_ids:
+            return found
+
+        collection_ref = client.collection(collection)
+        refs = [collection_ref.document(doc_id) for doc_id in sorted(doc_ids)]
+        async for snapshot in client.get_all(refs):
+            if snapshot.exists:
+                found.add((collection, snapshot.id))
+            _remember_exists(collection, snapshot.id, snapshot.exists)
+        return found
+
+    lookups = [_existing_in(name, ids) for name, ids in references.items() if ids]
+    existing: set[tuple[str, str]] = set()
+    for found in await asyncio.gather(*lookups):
+        existing |= found
+    return existing
+
+
+async def _validate_relationships(
+    definition: CollectionDefinition, payload: dict[str, Any], client: firestore.AsyncClient
+) -> None:
+    validator = definition.validator
+    existing = await _fetch_existing(client, validator.references(payload))
+    validator.check_relationships(payload, existing)
 
 
 def _enforce_branch_scope(
@@ -366,50 +1022,376 @@ def _enforce_branch_scope(
         raise AuthorizationError("branch scope violation")
 
 
-def create_document(collection: str, payload: dict[str, Any], user: dict[str, Any]) -> dict[str, Any]:
-    """Create a new document in the given collection with validation."""
+async def create_document(collection: str, payload: dict[str, Any], user: dict[str, Any]) -> dict[str, Any]:
+    """Create a new document in the given collection with validation.
+
+    An existing ``id`` raises ``DocumentExistsError`` when the collection
+    maintains aggregates and is overwritten otherwise.
+    """
 
     definition = _get_definition(collection)
     _ensure_role(user.get("roles"), definition.create_roles)
 
-    _validate_required_fields(definition, payload)
+    definition.validator.validate(payload)
     _enforce_branch_scope(definition, payload, user)
 
-    client = fs()
-    _validate_relationships(definition, payload, client)
+    client = afs()
+    await _validate_relationships(definition, payload, client)
 
-    now = datetime.now(timezone.utc)
+    data = _with_metadata(payload, user, datetime.now(timezone.utc))
+    doc_id = payload.get("id")
+
+    collection_ref = client.collection(collection)
+    doc_ref = collection_ref.document(doc_id) if doc_id else collection_ref.document()
+    if definition.maintains_aggregates:
+        batch = client.batch()
+        stage_creates(client, batch, definition, [PendingWrite(0, doc_ref, data)])
+        try:
+            await batch.commit()
+        except google_exceptions.AlreadyExists as exc:
+            raise DocumentExistsError(f"document '{doc_ref.id}' already exists") from exc
+    else:
+        await doc_ref.set(data)
+    _remember_exists(collection, doc_ref.id, True)
+
+    return {"id": doc_ref.id, **data}
+
+
+def _with_metadata(payload: dict[str, Any], user: dict[str, Any], now: datetime) -> dict[str, Any]:
     doc_meta = {
         "createdAt": now,
         "createdBy": user.get("uid"),
         "updatedAt": now,
         "updatedBy": user.get("uid"),
     }
+    return {**payload, **doc_meta}
 
-    data = {**payload, **doc_meta}
-    doc_id = payload.get("id")
 
-    collection_ref = client.collection(collection)
-    doc_ref = collection_ref.document(doc_id) if doc_id else collection_ref.document()
-    doc_ref.set(data)
+def _item_error(index: int, exc: CollectionError) -> dict[str, Any]:
+    return {"index": index, "status": "error", "statusCode": exc.status_code, "error": str(exc)}
 
-    return {"id": doc_ref.id, **data}
+
+@dataclass(frozen=True)
+class PendingWrite:
+    """A validated document waiting to be committed."""
+
+    index: int
+    ref: Any
+    data: dict[str, Any]
 
 
-def list_documents(
+async def prepare_creates(
     collection: str,
+    payloads: list[Any],
     user: dict[str, Any],
-    filters: dict[str, str] | None = None,
-) -> list[dict[str, Any]]:
-    """List documents from a collection respecting branch scoping."""
+    client: firestore.AsyncClient,
+) -> tuple[list[dict[str, Any] | None], list[PendingWrite]]:
+    """Validate many payloads for creation without writing anything.
+
+    Returns per-item error results (``None`` for valid items) and the writes for
+    the valid ones. Relationship lookups are deduplicated across all payloads,
+    one batched read per target collection. Collections written with ``create``
+    (those keeping aggregates) also look up the payload ids in that read, so an
+    existing id fails only its own item with 409.
+    """
 
     definition = _get_definition(collection)
-    _ensure_role(user.get("roles"), definition.read_roles)
+    _ensure_role(user.get("roles"), definition.create_roles)
+    validator = definition.validator
+
+    results: list[dict[str, Any] | None] = [None] * len(payloads)
+    candidates: list[tuple[int, dict[str, Any]]] = []
+    seen_ids: set[str] = set()
+    for index, payload in enumerate(payloads):
+        try:
+            if not isinstance(payload, dict):
+                raise ValidationError("each item must be a JSON object")
+            validator.validate(payload)
+            _enforce_branch_scope(definition, payload, user)
+            doc_id = payload.get("id")
+            if doc_id:
+                if doc_id in seen_ids:
+                    raise ValidationError(f"duplicate id '{doc_id}' in batch")
+                seen_ids.add(doc_id)
+        except CollectionError as exc:
+            results[index] = _item_error(index, exc)
+            continue
+        candidates.append((index, payload))
 
-    client = fs()
+    references: dict[str, set[str]] = {}
+    for _, payload in candidates:
+        for target, ids in validator.references(payload).items():
+            references.setdefault(target, set()).update(ids)
+    check_ids = definition.maintains_aggregates and bool(seen_ids)
+    if check_ids:
+        references.setdefault(collection, set()).update(seen_ids)
+    existing = await _fetch_existing(client, references)
+
+    now = datetime.now(timezone.utc)
     collection_ref = client.collection(collection)
-    query_filters = filters.copy() if filters else {}
+    writes: list[PendingWrite] = []
+    for index, payload in candidates:
+        doc_id = payload.get("id")
+        try:
+            if check_ids and doc_id and (collection, doc_id) in existing:
+                raise DocumentExistsError(f"document '{doc_id}' already exists")
+            validator.check_relationships(payload, existing)
+        except CollectionError as exc:
+            results[index] = _item_error(index, exc)
+            continue
+        doc_ref = collection_ref.document(doc_id) if doc_id else collection_ref.document()
+        writes.append(PendingWrite(index, doc_ref, _with_metadata(payload, user, now)))
+    return results, writes
+
+
+def writes_per_document(definition: CollectionDefinition) -> int:
+    """Most batch writes one created document can cost, counting increments and roster entries."""
+
+    return 1 + len(definition.summaries) + (1 if definition.counters else 0) + (1 if definition.roster else 0)
+
+
+def _aggregate_targets(definition: CollectionDefinition, write: PendingWrite) -> set[tuple[str, str]]:
+    data = write.data
+    targets = set()
+    for rule in definition.summaries:
+        key = rule.key(data)
+        if key is not None:
+            targets.add((rule.target, rule.summary_id(key)))
+    for rule in definition.counters:
+        branch = data.get(rule.branch_field or definition.branch_scope_field or "")
+        if isinstance(branch, str) and branch and rule.matches(data):
+            targets.add((BRANCH_STATS_COLLECTION, branch))
+    if definition.roster:
+        branch = data.get(definition.roster.branch_field or definition.branch_scope_field or "")
+        if isinstance(branch, str) and branch:
+            chunk_id = roster_chunk_id(write.ref.id, get_settings().student_roster_chunks)
+            targets.add((branch_roster_chunks(branch), chunk_id))
+    return targets
+
+
+def chunk_writes(
+    definition: CollectionDefinition, writes: list[PendingWrite], limit: int = WRITE_BATCH_LIMIT
+) -> list[list[PendingWrite]]:
+    """Split ``writes`` into chunks whose records and increment writes fit ``limit``."""
+
+    chunks: list[list[PendingWrite]] = []
+    chunk: list[PendingWrite] = []
+    targets: set[tuple[str, str]] = set()
+    for write in writes:
+        new_targets = _aggregate_targets(definition, write) - targets
+        if chunk and len(chunk) + len(targets) + 1 + len(new_targets) > limit:
+            chunks.append(chunk)
+            chunk, targets = [], set()
+            new_targets = _aggregate_targets(definition, write)
+        chunk.append(write)
+        targets |= new_targets
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def stage_creates(
+    client: firestore.AsyncClient,
+    batch: Any,
+    definition: CollectionDefinition,
+    writes: list[PendingWrite],
+) -> None:
+    """Add ``writes`` and the increments and roster entries they imply to ``batch``.
+
+    Counted documents are written with ``create`` so a retried id fails
+    instead of being counted twice.
+    """
+
+    if not definition.maintains_aggregates:
+        for write in writes:
+            batch.set(write.ref, write.data)
+        return
+    for write in writes:
+        batch.create(write.ref, write.data)
+    aggregates = aggregate_writes(client, definition, [(None, write.data) for write in writes])
+    aggregates += roster_writes(client, definition, [(write.ref.id, None, write.data) for write in writes])
+    for ref, data in aggregates:
+        batch.set(ref, data, merge=True)
+
+
+def mark_created(collection: str, write: PendingWrite) -> dict[str, Any]:
+    """Record a committed write in the existence cache and return its item result."""
+
+    _remember_exists(collection, write.ref.id, True)
+    return {"index": write.index, "status": "created", "id": write.ref.id}
+
+
+async def create_documents(
+    collection: str, payloads: list[Any], user: dict[str, Any]
+) -> dict[str, Any]:
+    """Validate and create many documents, reporting the outcome of every item.
+
+    Writes are committed in chunks that fit ``WRITE_BATCH_LIMIT`` together with
+    their summary increments; a failing chunk never blocks the others.
+    """
+
+    definition = _get_definition(collection)
+    _ensure_role(user.get("roles"), definition.create_roles)
+    settings = get_settings()
+    if len(payloads) > settings.batch_create_max_items:
+        raise ValidationError(f"at most {settings.batch_create_max_items} items per batch")
+
+    client = afs()
+    results, writes = await prepare_creates(collection, payloads, user, client)
+
+    for chunk in chunk_writes(definition, writes):
+        batch = client.batch()
+        stage_creates(client, batch, definition, chunk)
+        try:
+            await batch.commit()
+        except Exception as exc:
+            error = CollectionError(f"write failed: {exc}")
+            for write in chunk:
+                results[write.index] = _item_error(write.index, error)
+            continue
+        for write in chunk:
+            results[write.index] = mark_created(collection, write)
+
+    created = sum(1 for result in results if result and result["status"] == "created")
+    return {"created": created, "failed": len(payloads) - created, "results": results}
+
+
+def format_version(update_time: Any) -> str | None:
+    """Render a document update time as the opaque version used in ETag/If-Match."""
+
+    if update_time is None:
+        return None
+    if isinstance(update_time, DatetimeWithNanoseconds):
+        return update_time.rfc3339()
+    return update_time.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def _parse_version(version: str) -> DatetimeWithNanoseconds:
+    text = version.strip()
+    text = text[2:] if text.startswith("W/") else text
+    try:
+        return DatetimeWithNanoseconds.from_rfc3339(text.strip('"'))
+    except ValueError as exc:
+        raise ValidationError("If-Match must be a version returned in an ETag header") from exc
+
+
+def _nest(changes: dict[str, Any]) -> dict[str, Any]:
+    """Expand dotted field paths (``address.city``) into nested dicts."""
+
+    nested: dict[str, Any] = {}
+    for path, value in changes.items():
+        *parents, leaf = path.split(".")
+        target = nested
+        for part in parents:
+            target = target.setdefault(part, {})
+        target[leaf] = value
+    return nested
+
+
+def _apply_changes(data: dict[str, Any], changes: dict[str, Any]) -> dict[str, Any]:
+    """Return ``data`` as ``doc_ref.update(changes)`` would leave it (dotted paths set nested fields)."""
+
+    updated = dict(data)
+    for path, value in changes.items():
+        *parents, leaf = path.split(".")
+        target = updated
+        for part in parents:
+            child = target.get(part)
+            target[part] = dict(child) if isinstance(child, dict) else {}
+            target = target[part]
+        target[leaf] = value
+    return updated
+
+
+async def update_document(
+    collection: str,
+    doc_id: str,
+    changes: dict[str, Any],
+    user: dict[str, Any],
+    *,
+    if_match: str | None = None,
+) -> tuple[dict[str, Any], str | None]:
+    """Merge ``changes`` into one document and return the written fields and new version.
+
+    Only the sent fields (dotted paths allowed) are written, and only the
+    relationships they touch are re-validated. ``if_match`` makes the write
+    conditional on the document's update time. Branch-scoped documents are
+    read (scope field only) to check the caller's branch; changes to summarised,
+    counted or rostered fields read the old values to move those counts and
+    rewrite the roster entry in the same batch.
+    Either way the write is pinned to that read.
+    """
+
+    definition = _get_definition(collection)
+    _ensure_role(user.get("roles"), definition.create_roles)
+    if not isinstance(changes, dict) or not changes:
+        raise ValidationError("patch body must be a non-empty JSON object")
+    protected = [path for path in changes if path.split(".")[0] in ("id", *METADATA_FIELDS)]
+    if protected:
+        raise ValidationError(f"fields cannot be patched: {', '.join(protected)}")
+    validator = definition.validator
+    validator.validate_changes(changes)
+    scope_field = definition.branch_scope_field
+    if scope_field and scope_field in changes:
+        _enforce_branch_scope(definition, changes, user)
+
+    touches_aggregates = any(path.split(".")[0] in definition.aggregate_fields for path in changes)
+    read_fields = {scope_field} if scope_field and user.get("branchId") else set()
+    if touches_aggregates:
+        read_fields.update(definition.aggregate_fields)
+
+    client = afs()
+    doc_ref = client.collection(collection).document(doc_id)
+    expected = _parse_version(if_match) if if_match else None
+    before: dict[str, Any] = {}
+    if read_fields:
+        snapshot = await doc_ref.get(field_paths=sorted(read_fields))
+        before = snapshot.to_dict() or {}
+        if not snapshot.exists or not _in_branch_scope(definition, before, user):
+            raise DocumentNotFoundError("document not found")
+        if expected is not None and snapshot.update_time != expected:
+            raise PreconditionFailedError("document was modified; reload it and retry")
+        expected = snapshot.update_time
+
+    touched = validator.changed_relationships(changes)
+    if touched.relationships:
+        nested = _nest(changes)
+        existing = await _fetch_existing(client, touched.references(nested))
+        touched.check_relationships(nested, existing)
 
+    now = datetime.now(timezone.utc)
+    data = {**changes, "updatedAt": now, "updatedBy": user.get("uid")}
+    option = client.write_option(last_update_time=expected) if expected is not None else None
+    aggregates: list[tuple[Any, dict[str, Any]]] = []
+    if touches_aggregates:
+        after = _apply_changes(before, changes)
+        aggregates = aggregate_writes(client, definition, [(before, after)])
+        aggregates += roster_writes(client, definition, [(doc_id, before, after)])
+    try:
+        if aggregates:
+            batch = client.batch()
+            batch.update(doc_ref, data, option=option)
+            for ref, increments in aggregates:
+                batch.set(ref, increments, merge=True)
+            result = (await batch.commit())[0]
+        else:
+            result = await doc_ref.update(data, option=option)
+    except google_exceptions.NotFound as exc:
+        raise DocumentNotFoundError("document not found") from exc
+    except google_exceptions.FailedPrecondition as exc:
+        raise PreconditionFailedError("document was modified; reload it and retry") from exc
+    return {"id": doc_id, **data}, format_version(getattr(result, "update_time", None))
+
+
+def _scoped_collection(
+    client: firestore.AsyncClient,
+    definition: CollectionDefinition,
+    user: dict[str, Any],
+    query_filters: dict[str, str],
+) -> Any:
+    """Return the collection query restricted to the caller's branch (pops the scope filter)."""
+
+    collection_ref = client.collection(definition.name)
     if definition.branch_scope_field:
         scope_value = query_filters.pop(definition.branch_scope_field, None)
         if scope_value:
@@ -423,25 +1405,662 @@ def list_documents(
                     f"missing '{definition.branch_scope_field}' filter for branch-scoped collection"
                 )
         collection_ref = collection_ref.where(definition.branch_scope_field, "==", scope_value)
+    return collection_ref
+
+
+# ``field[op]=value`` query operators and the Firestore operator each maps to.
+FILTER_OPERATORS = {
+    "eq": "==",
+    "ne": "!=",
+    "lt": "<",
+    "lte": "<=",
+    "gt": ">",
+    "gte": ">=",
+    "in": "in",
+    "nin": "not-in",
+    "contains": "array_contains",
+    "containsAny": "array_contains_any",
+}
+_INEQUALITY_OPS = frozenset({"!=", "<", "<=", ">", ">=", "not-in"})
+_LIST_OPS = frozenset({"in", "not-in", "array_contains_any"})
+_ARRAY_OPS = frozenset({"array_contains", "array_contains_any"})
+# Firestore caps the number of values in in / not-in / array-contains-any.
+MAX_FILTER_VALUES = 30
+METADATA_FIELD_TYPES = {"createdAt": "timestamp", "updatedAt": "timestamp"}
+
+_FILTER_KEY_RE = re.compile(r"^(?P<field>[A-Za-z0-9_.]+)\[(?P<op>[A-Za-z]+)\]$")
+
+
+class UnindexedQueryError(ValidationError):
+    """Raised when a query shape is not served by a declared composite index."""
+
+    status_code = 400
+
+
+@dataclass(frozen=True)
+class FilterClause:
+    """One parsed ``field[op]=value`` query filter."""
+
+    field: str
+    op: str
+    value: Any
+
+
+def _field_type(definition: CollectionDefinition, field_path: str) -> str | None:
+    return definition.field_types.get(field_path) or METADATA_FIELD_TYPES.get(field_path)
+
+
+def coerce_value(definition: CollectionDefinition, field_path: str, raw: str) -> Any:
+    """Convert a query/CSV string into the type declared for ``field_path``.
+
+    Array fields coerce to their element (always a string); untyped fields stay strings.
+    """
+
+    kind = _field_type(definition, field_path)
+    text = raw.strip()
+    try:
+        if kind == "int":
+            return int(text)
+        if kind == "number":
+            number = float(text)
+            return int(number) if number.is_integer() and "." not in text else number
+        if kind == "bool":
+            lowered = text.lower()
+            if lowered not in ("true", "false", "1", "0"):
+                raise ValueError(text)
+            return lowered in ("true", "1")
+        if kind == "date":
+            # Stored as ISO-8601 text, so compare as text once the format is checked.
+            datetime.fromisoformat(text)
+            return text
+        if kind == "timestamp":
+            parsed = datetime.fromisoformat(text)
+            return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+    except ValueError as exc:
+        raise ValidationError(f"invalid value for '{field_path}': expected {kind}") from exc
+    return raw
+
+
+def _parse_filters(definition: CollectionDefinition, query_filters: dict[str, str]) -> list[FilterClause]:
+    """Parse ``field=value`` / ``field[op]=value`` parameters into typed clauses."""
+
+    clauses: list[FilterClause] = []
+    for key, raw in query_filters.items():
+        match = _FILTER_KEY_RE.match(key)
+        field_path, op_name = (match["field"], match["op"]) if match else (key, "eq")
+        op = FILTER_OPERATORS.get(op_name)
+        if op is None:
+            raise ValidationError(
+                f"unknown operator '{op_name}' for '{field_path}'; use one of {', '.join(FILTER_OPERATORS)}"
+            )
+        kind = _field_type(definition, field_path)
+        if op in _ARRAY_OPS and kind not in (None, "array"):
+            raise ValidationError(f"'{op_name}' needs an array field, '{field_path}' is {kind}")
+        if op in _INEQUALITY_OPS and kind == "array":
+            raise ValidationError(f"'{op_name}' cannot be used on array field '{field_path}'")
+        if op in _LIST_OPS:
+            values = [coerce_value(definition, field_path, part) for part in raw.split(",") if part.strip()]
+            if not values or len(values) > MAX_FILTER_VALUES:
+                raise ValidationError(
+                    f"'{field_path}[{op_name}]' takes between 1 and {MAX_FILTER_VALUES} comma-separated values"
+                )
+            clauses.append(FilterClause(field_path, op, values))
+        else:
+            clauses.append(FilterClause(field_path, op, coerce_value(definition, field_path, raw)))
+    return clauses
+
+
+def _range_field(clauses: list[FilterClause]) -> str | None:
+    fields = {clause.field for clause in clauses if clause.op in _INEQUALITY_OPS}
+    if len(fields) > 1:
+        raise ValidationError(f"range filters are limited to one field, got {', '.join(sorted(fields))}")
+    return next(iter(fields), None)
+
+
+def _check_query_shape(
+    definition: CollectionDefinition,
+    clauses: list[FilterClause],
+    order_field: str | None = None,
+    descending: bool = False,
+) -> None:
+    """Reject queries Firestore would refuse or that need an undeclared composite index."""
+
+    ops = [clause.op for clause in clauses]
+    if sum(op in _ARRAY_OPS for op in ops) > 1:
+        raise ValidationError("only one 'contains'/'containsAny' filter is allowed per query")
+    if "not-in" in ops and (ops.count("not-in") > 1 or {"!=", "in", "array_contains_any"} & set(ops)):
+        raise ValidationError("'nin' cannot be combined with 'ne', 'in', 'containsAny' or another 'nin'")
+
+    range_field = _range_field(clauses)
+    if range_field and order_field and order_field != range_field:
+        raise ValidationError(f"orderBy must be '{range_field}' when it has a range filter")
+    sort_field = range_field or order_field
+    equality = {clause.field for clause in clauses if clause.op not in _INEQUALITY_OPS}
+    if definition.branch_scope_field:
+        equality.add(definition.branch_scope_field)
+    equality.discard(sort_field)
+    # Equality-only queries merge single-field indexes; one sorted field alone has its own.
+    if sort_field is None or not equality:
+        return
+
+    wanted = f"{sort_field} desc" if descending else sort_field
+    for index in definition.indexes:
+        *prefix, last = index.fields
+        if last == wanted and {name.removesuffix("[]") for name in prefix} == equality:
+            return
+    array_fields = {clause.field for clause in clauses if clause.op in _ARRAY_OPS}
+    shape = tuple(
+        [f"{name}[]" if name in array_fields else name for name in sorted(equality)] + [wanted]
+    )
+    _record_uncovered_shape(definition.name, shape)
+    raise UnindexedQueryError(
+        f"query on '{definition.name}' needs a composite index on ({', '.join(shape)}); "
+        "declare it on the collection"
+    )
+
+
+_uncovered_shapes: dict[tuple[str, tuple[str, ...]], int] = {}
+
+
+def _record_uncovered_shape(collection: str, shape: tuple[str, ...]) -> None:
+    key = (collection, shape)
+    seen = _uncovered_shapes.get(key, 0)
+    _uncovered_shapes[key] = seen + 1
+    if not seen:
+        # Once per shape: paste ``index`` into the collection's ``indexes`` and regenerate the manifest.
+        logger.warning(
+            "query shape not covered by the index manifest",
+            extra={"collection": collection, "index": list(shape)},
+        )
+
+
+def uncovered_query_shapes() -> list[dict[str, Any]]:
+    """Query shapes rejected for lack of a composite index since start-up, most frequent first."""
+
+    return [
+        {"collection": collection, "index": list(shape), "count": count}
+        for (collection, shape), count in sorted(_uncovered_shapes.items(), key=lambda item: -item[1])
+    ]
+
+
+def clear_uncovered_query_shapes() -> None:
+    _uncovered_shapes.clear()
+
+
+def _apply_filters(query: Any, clauses: list[FilterClause]) -> Any:
+    for clause in clauses:
+        query = query.where(clause.field, clause.op, clause.value)
+    return query
+
+
+async def list_documents(
+    collection: str,
+    user: dict[str, Any],
+    filters: dict[str, str] | None = None,
+    *,
+    fields: str | None = None,
+    expand: str | None = None,
+) -> list[dict[str, Any]]:
+    """List documents from a collection respecting branch scoping."""
+
+    definition = _get_definition(collection)
+    _ensure_role(user.get("roles"), definition.read_roles)
+    expand_rules = _resolve_expand(definition, user, expand)
+    projection = _with_expand_fields(_resolve_projection(definition, fields), expand_rules)
+
+    client = afs()
+    query_filters = filters.copy() if filters else {}
+    collection_ref = _scoped_collection(client, definition, user, query_filters)
 
     doc_id = query_filters.pop("id", None)
     if doc_id:
-        snapshot = collection_ref.document(doc_id).get()
+        documents = await _fetch_documents(client, definition, user, [doc_id], projection)
+    else:
+        clauses = _parse_filters(definition, query_filters)
+        _check_query_shape(definition, clauses)
+        collection_ref = _apply_filters(collection_ref, clauses)
+        if projection is not None:
+            collection_ref = collection_ref.select(projection)
+        documents = [doc async for doc in _iter_documents(collection_ref)]
+
+    await _expand_documents(client, user, documents, expand_rules)
+    return documents
+
+
+def _in_branch_scope(definition: CollectionDefinition, data: dict[str, Any], user: dict[str, Any]) -> bool:
+    if not definition.branch_scope_field:
+        return True
+    user_branch = user.get("branchId")
+    return not user_branch or data.get(definition.branch_scope_field) == user_branch
+
+
+async def _fetch_documents(
+    client: firestore.AsyncClient,
+    definition: CollectionDefinition,
+    user: dict[str, Any],
+    doc_ids: list[str],
+    projection: list[str] | None,
+    versions: dict[str, str] | None = None,
+) -> list[dict[str, Any]]:
+    """Read ``doc_ids`` in one batched call, in request order, dropping missing or out-of-scope ones.
+
+    ``versions`` (when given) receives each returned document's ETag version.
+    """
+
+    ordered = list(dict.fromkeys(doc_id for doc_id in doc_ids if doc_id))
+    if not ordered:
+        return []
+    scope_field = definition.branch_scope_field
+    field_paths = projection
+    # Branch scope is checked on the stored data, so read the scope field even when not requested.
+    if projection is not None and scope_field and scope_field not in projection:
+        field_paths = projection + [scope_field]
+
+    collection_ref = client.collection(definition.name)
+    found: dict[str, dict[str, Any]] = {}
+    async for snapshot in client.get_all(
+        [collection_ref.document(doc_id) for doc_id in ordered], field_paths=field_paths
+    ):
         if not snapshot.exists:
-            return []
-        doc = snapshot.to_dict() or {}
-        return [{"id": snapshot.id, **doc}]
-
-    if query_filters:
-        # Apply additional filters if provided. Firestore requires indexes for compound queries,
-        # so keep expectations minimal.
-        for field, value in query_filters.items():
-            collection_ref = collection_ref.where(field, "==", value)
-
-    snapshots = collection_ref.stream()
-    results: list[dict[str, Any]] = []
-    for snap in snapshots:
+            continue
+        data = snapshot.to_dict() or {}
+        if not _in_branch_scope(definition, data, user):
+            continue
+        if field_paths is not projection:
+            data.pop(scope_field, None)
+        found[snapshot.id] = {"id": snapshot.id, **data}
+        if versions is not None:
+            versions[snapshot.id] = format_version(getattr(snapshot, "update_time", None))
+    return [found[doc_id] for doc_id in ordered if doc_id in found]
+
+
+async def get_documents(
+    collection: str,
+    user: dict[str, Any],
+    doc_ids: list[str],
+    *,
+    fields: str | None = None,
+    expand: str | None = None,
+    versions: dict[str, str] | None = None,
+) -> list[dict[str, Any]]:
+    """Fetch documents by id with one batched read; missing or out-of-branch ids are omitted."""
+
+    definition = _get_definition(collection)
+    _ensure_role(user.get("roles"), definition.read_roles)
+    expand_rules = _resolve_expand(definition, user, expand)
+    projection = _with_expand_fields(_resolve_projection(definition, fields), expand_rules)
+    max_ids = get_settings().collection_page_size_max
+    if len(doc_ids) > max_ids:
+        raise ValidationError(f"at most {max_ids} ids per request")
+    client = afs()
+    documents = await _fetch_documents(client, definition, user, doc_ids, projection, versions)
+    await _expand_documents(client, user, documents, expand_rules)
+    return documents
+
+
+async def get_document(
+    collection: str,
+    user: dict[str, Any],
+    doc_id: str,
+    *,
+    fields: str | None = None,
+    expand: str | None = None,
+    versions: dict[str, str] | None = None,
+) -> dict[str, Any] | None:
+    """Fetch one document by id, or ``None`` when it is missing or outside the caller's branch."""
+
+    documents = await get_documents(
+        collection, user, [doc_id], fields=fields, expand=expand, versions=versions
+    )
+    return documents[0] if documents else None
+
+
+EXPANDED_KEY = "_expanded"
+# Streams expand this many documents per batched read.
+STREAM_EXPAND_CHUNK = 100
+
+
+def _resolve_expand(
+    definition: CollectionDefinition, user: dict[str, Any], expand: str | None
+) -> list[RelationshipRule]:
+    """Map ``expand=studentId,batchId`` onto the collection's relationship rules."""
+
+    if not expand:
+        return []
+    rules = {rule.field_path: rule for rule in definition.relationship_rules}
+    selected: list[RelationshipRule] = []
+    for path in expand.split(","):
+        path = path.strip()
+        if not path:
+            continue
+        rule = rules.get(path)
+        if rule is None:
+            expandable = ", ".join(rules) or "none"
+            raise ValidationError(
+                f"cannot expand '{path}' on '{definition.name}' (expandable: {expandable})"
+            )
+        for target in rule.target_collections:
+            _ensure_role(user.get("roles"), _get_definition(target).read_roles)
+        if rule not in selected:
+            selected.append(rule)
+    return selected
+
+
+def _with_expand_fields(
+    projection: list[str] | None, rules: list[RelationshipRule]
+) -> list[str] | None:
+    if projection is None:
+        return None
+    extra = [rule.field_path.split(".")[0].removesuffix("[]") for rule in rules]
+    return projection + [name for name in dict.fromkeys(extra) if name not in projection]
+
+
+async def _expand_documents(
+    client: firestore.AsyncClient,
+    user: dict[str, Any],
+    documents: list[dict[str, Any]],
+    rules: list[RelationshipRule],
+) -> None:
+    """Embed referenced documents under ``_expanded``, one batched read per target collection.
+
+    Single references become a document (or ``None``); ``[]`` paths become a list.
+    Targets outside the caller's branch are left out like missing ones.
+    """
+
+    if not rules or not documents:
+        return
+    accessors = [(rule, PathAccessor(rule.field_path)) for rule in rules]
+    wanted: dict[str, set[str]] = {}
+    for rule, accessor in accessors:
+        ids = {
+            value
+            for document in documents
+            for value in accessor.values(document)
+            if isinstance(value, str) and value
+        }
+        for target in rule.target_collections:
+            wanted.setdefault(target, set()).update(ids)
+
+    async def _load(target: str, ids: set[str]) -> tuple[str, dict[str, dict[str, Any]]]:
+        found = await _fetch_documents(client, _get_definition(target), user, sorted(ids), None)
+        for document in found:
+            _remember_exists(target, document["id"], True)
+        return target, {document["id"]: document for document in found}
+
+    loaded = dict(await asyncio.gather(*(_load(target, ids) for target, ids in wanted.items() if ids)))
+    for document in documents:
+        expanded: dict[str, Any] = {}
+        for rule, accessor in accessors:
+            matches = []
+            for value in accessor.values(document):
+                for target in rule.target_collections:
+                    match = loaded.get(target, {}).get(value) if isinstance(value, str) else None
+                    if match is not None:
+                        matches.append(match)
+                        break
+            expanded[rule.field_path] = matches if "[]" in rule.field_path else next(iter(matches), None)
+        document[EXPANDED_KEY] = expanded
+
+
+async def _iter_expanded(
+    documents: AsyncIterator[dict[str, Any]],
+    client: firestore.AsyncClient,
+    user: dict[str, Any],
+    rules: list[RelationshipRule],
+) -> AsyncIterator[dict[str, Any]]:
+    chunk: list[dict[str, Any]] = []
+    async for document in documents:
+        chunk.append(document)
+        if len(chunk) >= STREAM_EXPAND_CHUNK:
+            await _expand_documents(client, user, chunk, rules)
+            for item in chunk:
+                yield item
+            chunk = []
+    await _expand_documents(client, user, chunk, rules)
+    for item in chunk:
+        yield item
+
+
+async def _iter_documents(query: Any) -> AsyncIterator[dict[str, Any]]:
+    async for snap in query.stream():
         data = snap.to_dict() or {}
-        results.append({"id": snap.id, **data})
+        yield {"id": snap.id, **data}
 
-    return results
+
+def open_document_stream(
+    collection: str,
+    user: dict[str, Any],
+    filters: dict[str, str] | None = None,
+    *,
+    fields: str | None = None,
+    expand: str | None = None,
+) -> AsyncIterator[dict[str, Any]]:
+    """Validate a listing eagerly and return an iterator that streams its documents.
+
+    Authorization and filter errors surface here, before any response bytes are
+    sent; documents are then yielded one snapshot at a time (or one expansion
+    chunk at a time with ``expand``).
+    """
+
+    definition = _get_definition(collection)
+    _ensure_role(user.get("roles"), definition.read_roles)
+    expand_rules = _resolve_expand(definition, user, expand)
+    projection = _with_expand_fields(_resolve_projection(definition, fields), expand_rules)
+
+    client = afs()
+    query_filters = filters.copy() if filters else {}
+    query = _scoped_collection(client, definition, user, query_filters)
+    if "id" in query_filters:
+        raise ValidationError("'id' lookups cannot be streamed")
+    clauses = _parse_filters(definition, query_filters)
+    _check_query_shape(definition, clauses)
+    query = _apply_filters(query, clauses)
+    if projection is not None:
+        query = query.select(projection)
+    if expand_rules:
+        return _iter_expanded(_iter_documents(query), client, user, expand_rules)
+    return _iter_documents(query)
+
+
+def _aggregation_query(
+    collection: str, user: dict[str, Any], filters: dict[str, str] | None
+) -> tuple[CollectionDefinition, Any]:
+    definition = _get_definition(collection)
+    _ensure_role(user.get("roles"), definition.read_roles)
+    query_filters = filters.copy() if filters else {}
+    query = _scoped_collection(afs(), definition, user, query_filters)
+    if "id" in query_filters:
+        raise ValidationError("'id' cannot be used as an aggregation filter")
+    clauses = _parse_filters(definition, query_filters)
+    _check_query_shape(definition, clauses)
+    return definition, _apply_filters(query, clauses)
+
+
+async def _run_aggregation(aggregation: Any, alias: str) -> Any:
+    results = await aggregation.get()
+    for row in results:
+        for result in row:
+            if result.alias == alias:
+                return result.value
+    return None
+
+
+async def count_documents(
+    collection: str, user: dict[str, Any], filters: dict[str, str] | None = None
+) -> int:
+    """Count matching documents with a server-side aggregation (no documents are read)."""
+
+    _, query = _aggregation_query(collection, user, filters)
+    return int(await _run_aggregation(query.count(alias="count"), "count") or 0)
+
+
+async def sum_documents(
+    collection: str,
+    user: dict[str, Any],
+    filters: dict[str, str] | None = None,
+    *,
+    field: str,
+) -> int | float:
+    """Sum a numeric field over matching documents with a server-side aggregation.
+
+    Documents where ``field`` is missing or not a number are ignored by Firestore.
+    """
+
+    definition, query = _aggregation_query(collection, user, filters)
+    if not field or field == "id" or field.split(".")[0] not in _known_fields(definition):
+        raise ValidationError(f"unknown field '{field}' for '{definition.name}'")
+    return await _run_aggregation(query.sum(field, alias="sum"), "sum") or 0
+
+
+def _parse_order_by(order_by: str | None) -> tuple[str | None, str]:
+    """Parse ``"field"``, ``"field asc"`` or ``"field desc"``."""
+
+    if not order_by:
+        return None, firestore.Query.ASCENDING
+    parts = order_by.split()
+    if len(parts) > 2 or (len(parts) == 2 and parts[1].lower() not in ("asc", "desc")):
+        raise ValidationError("orderBy must look like 'field' or 'field desc'")
+    descending = len(parts) == 2 and parts[1].lower() == "desc"
+    direction = firestore.Query.DESCENDING if descending else firestore.Query.ASCENDING
+    if parts[0] in ("id", "__name__"):
+        return None, direction
+    return parts[0], direction
+
+
+def _encode_cursor_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$ts": value.isoformat()}
+    return value
+
+
+def _decode_cursor_value(value: Any) -> Any:
+    if isinstance(value, dict) and set(value) == {"$ts"}:
+        return datetime.fromisoformat(value["$ts"])
+    return value
+
+
+def _encode_page_token(order_key: str, values: list[Any]) -> str:
+    raw = json.dumps({"o": order_key, "v": [_encode_cursor_value(v) for v in values]}, default=str)
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+_CURSOR_SCALARS = (str, int, float, bool, type(None))
+
+
+def _decode_page_token(token: str, order_key: str, size: int) -> list[Any]:
+    """Decode a cursor of ``size`` values (sort values, then the document id)."""
+
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        decoded = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        values = decoded["v"]
+        token_order = decoded["o"]
+    except (ValueError, KeyError, TypeError) as exc:
+        raise ValidationError("invalid pageToken") from exc
+    if token_order != order_key or not isinstance(values, list):
+        raise ValidationError("pageToken does not match the requested orderBy")
+    if len(values) != size or not isinstance(values[-1], str) or not values[-1]:
+        raise ValidationError("invalid pageToken")
+    try:
+        cursor = [_decode_cursor_value(v) for v in values]
+    except (ValueError, TypeError) as exc:
+        raise ValidationError("invalid pageToken") from exc
+    if not all(isinstance(value, (*_CURSOR_SCALARS, datetime)) for value in cursor):
+        raise ValidationError("invalid pageToken")
+    return cursor
+
+
+def _without_path(data: dict[str, Any], field_path: str) -> dict[str, Any]:
+    """Return ``data`` without ``field_path``, dropping parent maps it leaves empty."""
+
+    head, _, rest = field_path.partition(".")
+    if head not in data:
+        return data
+    trimmed = dict(data)
+    if not rest:
+        del trimmed[head]
+    elif isinstance(trimmed[head], dict):
+        inner = _without_path(trimmed[head], rest)
+        if inner:
+            trimmed[head] = inner
+        else:
+            del trimmed[head]
+    return trimmed
+
+
+def _get_path(data: dict[str, Any], field_path: str) -> Any:
+    current: Any = data
+    for part in field_path.split("."):
+        if not isinstance(current, dict):
+            return None
+        current = current.get(part)
+    return current
+
+
+async def list_documents_page(
+    collection: str,
+    user: dict[str, Any],
+    filters: dict[str, str] | None = None,
+    *,
+    limit: int | None = None,
+    order_by: str | None = None,
+    page_token: str | None = None,
+    fields: str | None = None,
+    expand: str | None = None,
+) -> dict[str, Any]:
+    """List one page of documents, ordered and resumable via an opaque cursor token."""
+
+    definition = _get_definition(collection)
+    _ensure_role(user.get("roles"), definition.read_roles)
+    expand_rules = _resolve_expand(definition, user, expand)
+    projection = _with_expand_fields(_resolve_projection(definition, fields), expand_rules)
+
+    settings = get_settings()
+    page_size = settings.collection_page_size_default if limit is None else limit
+    if page_size < 1 or page_size > settings.collection_page_size_max:
+        raise ValidationError(f"limit must be between 1 and {settings.collection_page_size_max}")
+
+    client = afs()
+    query_filters = filters.copy() if filters else {}
+    query = _scoped_collection(client, definition, user, query_filters)
+    if "id" in query_filters:
+        raise ValidationError("'id' lookups cannot be combined with pagination")
+    clauses = _parse_filters(definition, query_filters)
+    query = _apply_filters(query, clauses)
+
+    order_field, direction = _parse_order_by(order_by)
+    # Firestore sorts by the range-filtered field first; make that the page order.
+    order_field = order_field or _range_field(clauses)
+    _check_query_shape(definition, clauses, order_field, direction == firestore.Query.DESCENDING)
+    order_key = f"{order_field or '__name__'} {direction}"
+    if order_field:
+        query = query.order_by(order_field, direction=direction)
+    # Document id as tie-breaker keeps the cursor stable for duplicate sort values.
+    query = query.order_by("__name__", direction=direction)
+    if page_token:
+        cursor_size = 2 if order_field else 1
+        query = query.start_after(_decode_page_token(page_token, order_key, cursor_size))
+    query = query.limit(page_size + 1)
+    # The cursor needs the sort value, so project it even when it was not requested.
+    extra_field = None
+    if projection is not None and order_field and not any(
+        order_field == path or order_field.startswith(f"{path}.") for path in projection
+    ):
+        extra_field = order_field
+    if projection is not None:
+        query = query.select(projection + [extra_field] if extra_field else projection)
+
+    rows = [(snap.id, snap.to_dict() or {}) async for snap in query.stream()]
+    next_token = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last_id, last = rows[-1]
+        cursor = [_get_path(last, order_field), last_id] if order_field else [last_id]
+        next_token = _encode_page_token(order_key, cursor)
+    items = [
+        {"id": doc_id, **(_without_path(data, extra_field) if extra_field else data)}
+        for doc_id, data in rows
+    ]
+
+    await _expand_documents(client, user, items, expand_rules)
+    return {"items": items, "nextPageToken": next_token}
@@ -0,0 +1,320 @@
+"""Streaming CSV/NDJSON bulk import into generic collections."""
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import json
+import re
+import uuid
+from datetime import datetime, timezone
+from itertools import islice
+from typing import IO, Any, Callable, Iterator
+
+from backend.logging_utils import get_logger
+from backend.reps.firestore import afs
+from backend.services.collections import (
+    COLLECTION_DEFINITIONS,
+    WRITE_BATCH_LIMIT,
+    CollectionDefinition,
+    CollectionError,
+    AuthorizationError,
+    UnknownCollectionError,
+    ValidationError,
+    coerce_value,
+    mark_created,
+    prepare_creates,
+    stage_creates,
+    writes_per_document,
+)
+
+logger = get_logger(__name__)
+
+IMPORT_JOBS_COLLECTION = "importJobs"
+SUPPORTED_FORMATS = ("csv", "ndjson")
+# One slot of every write batch is reserved for the job checkpoint.
+MAX_CHUNK_SIZE = WRITE_BATCH_LIMIT - 1
+MAX_REPORTED_ERRORS = 100
+
+ProgressCallback = Callable[[dict[str, Any]], None]
+
+_NORMALIZE_RE = re.compile(r"[^a-z0-9]")
+
+
+class ImportJobError(CollectionError):
+    """Raised when an import cannot start or has to stop."""
+
+
+def detect_format(filename: str | None, content_type: str | None = None) -> str:
+    name = (filename or "").lower()
+    kind = (content_type or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in kind or "jsonl" in kind:
+        return "ndjson"
+    if name.endswith(".csv") or "csv" in kind:
+        return "csv"
+    raise ImportJobError("cannot infer import format; pass format=csv or format=ndjson")
+
+
+def _normalize(name: str) -> str:
+    return _NORMALIZE_RE.sub("", name.lower())
+
+
+def build_column_mapping(definition: CollectionDefinition, columns: list[str]) -> dict[str, str]:
+    """Map source columns onto definition fields, ignoring case, spaces and underscores.
+
+    ``first_name`` maps onto ``firstName``; dotted (``address.city``) and list
+    (``studentIds[]``) columns keep their shape. Raises when a required field
+    has no column.
+    """
+
+    known: dict[str, str] = {}
+    for field in (
+        *definition.required_fields,
+        *definition.optional_fields,
+        *(rule.field_path.split(".")[0].removesuffix("[]") for rule in definition.relationship_rules),
+    ):
+        known.setdefault(_normalize(field), field)
+
+    mapping: dict[str, str] = {}
+    for column in columns:
+        if column is None:
+            continue
+        head, dot, rest = column.strip().partition(".")
+        is_list = head.endswith("[]")
+        base = head.removesuffix("[]")
+        field = known.get(_normalize(base), base)
+        mapping[column] = f"{field}{'[]' if is_list else ''}{dot}{rest}"
+
+    present = {target.split(".")[0].removesuffix("[]") for target in mapping.values()}
+    missing = [field for field in definition.required_fields if field not in present]
+    if missing:
+        raise ImportJobError(f"no column for required fields: {', '.join(missing)}")
+    return mapping
+
+
+def _parse_cell(value: str) -> Any:
+    text = value.strip()
+    if text in ("true", "false"):
+        return text == "true"
+    if text[:1] in ("{", "[") and text[-1:] in ("}", "]"):
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text
+    return text
+
+
+def _typed_cell(definition: CollectionDefinition | None, field_path: str, text: str) -> Any:
+    if definition is not None and definition.field_types.get(field_path) not in (None, "array"):
+        try:
+            return coerce_value(definition, field_path, text)
+        except ValidationError:
+            # Keep the text; the collection validator reports the row with a typed error.
+            return text.strip()
+    return _parse_cell(text)
+
+
+def map_row(
+    mapping: dict[str, str],
+    row: dict[str, Any],
+    definition: CollectionDefinition | None = None,
+) -> dict[str, Any]:
+    """Turn a flat CSV row into a nested document payload.
+
+    With a ``definition``, top-level cells are converted to the declared field types.
+    """
+
+    document: dict[str, Any] = {}
+    for column, target in mapping.items():
+        raw = row.get(column)
+        if raw is None or (isinstance(raw, str) and not raw.strip()):
+            continue
+        head, _, rest = target.partition(".")
+        if head.endswith("[]"):
+            value: Any = [_parse_cell(part) for part in str(raw).split("|") if part.strip()]
+            head = head[:-2]
+        elif isinstance(raw, str):
+            value = _parse_cell(raw) if rest else _typed_cell(definition, head, raw)
+        else:
+            value = raw
+        if rest:
+            container = document.setdefault(head, {})
+            parts = rest.split(".")
+            for part in parts[:-1]:
+                container = container.setdefault(part, {})
+            container[parts[-1]] = value
+        else:
+            document[head] = value
+    return document
+
+
+def iter_records(
+    stream: IO[bytes], fmt: str, definition: CollectionDefinition
+) -> Iterator[dict[str, Any]]:
+    """Lazily parse ``stream`` into payloads; only one line is held in memory at a time."""
+
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(text)
+            mapping = build_column_mapping(definition, list(reader.fieldnames or []))
+            for row in reader:
+                yield map_row(mapping, row, definition)
+        elif fmt == "ndjson":
+            for line_no, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as exc:
+                    raise ImportJobError(f"line {line_no}: invalid JSON ({exc.msg})") from exc
+                yield record
+        else:
+            raise ImportJobError(f"unsupported import format '{fmt}'")
+    finally:
+        # Leave the caller's stream open.
+        text.detach()
+
+
+def _read_chunk(records: Iterator[dict[str, Any]], size: int) -> list[dict[str, Any]]:
+    return list(islice(records, size))
+
+
+def _skip_rows(records: Iterator[dict[str, Any]], count: int) -> None:
+    for _ in islice(records, count):
+        pass
+
+
+async def _load_job(client: Any, job_id: str, collection: str) -> dict[str, Any]:
+    snapshot = await client.collection(IMPORT_JOBS_COLLECTION).document(job_id).get()
+    if not snapshot.exists:
+        return {}
+    job = snapshot.to_dict() or {}
+    if job.get("collection") != collection:
+        raise ImportJobError(f"import job '{job_id}' belongs to collection '{job.get('collection')}'")
+    if job.get("status") == "completed":
+        raise ImportJobError(f"import job '{job_id}' already completed")
+    return job
+
+
+async def run_import(
+    collection: str,
+    stream: IO[bytes],
+    fmt: str,
+    user: dict[str, Any],
+    *,
+    job_id: str | None = None,
+    chunk_size: int = 400,
+    on_progress: ProgressCallback | None = None,
+) -> dict[str, Any]:
+    """Import ``stream`` into ``collection`` chunk by chunk.
+
+    Each chunk is validated with batched relationship checks and committed in
+    a single write batch together with the job checkpoint (``importJobs/{id}``),
+    so re-running with the same ``job_id`` resumes right after the last
+    committed chunk. Parsing of the next chunk overlaps with the current commit.
+    Rows whose id already exists (in collections written with ``create``) are
+    recorded in the job's ``errors`` with a 409 rather than failing the chunk.
+    """
+
+    definition = COLLECTION_DEFINITIONS.get(collection)
+    if not definition:
+        raise UnknownCollectionError(collection)
+    if not set(user.get("roles") or []) & set(definition.create_roles):
+        raise AuthorizationError("forbidden")
+    if fmt not in SUPPORTED_FORMATS:
+        raise ImportJobError(f"unsupported import format '{fmt}'")
+    chunk_size = max(1, min(chunk_size, MAX_CHUNK_SIZE // writes_per_document(definition)))
+
+    client = afs()
+    job_id = job_id or uuid.uuid4().hex
+    job_ref = client.collection(IMPORT_JOBS_COLLECTION).document(job_id)
+    job = await _load_job(client, job_id, collection)
+    state: dict[str, Any] = {
+        "jobId": job_id,
+        "collection": collection,
+        "format": fmt,
+        "status": "running",
+        "committedRows": int(job.get("committedRows") or 0),
+        "committedChunks": int(job.get("committedChunks") or 0),
+        "created": int(job.get("created") or 0),
+        "failed": int(job.get("failed") or 0),
+        "errors": list(job.get("errors") or []),
+        "startedBy": job.get("startedBy") or user.get("uid"),
+    }
+    resumed_from = state["committedRows"]
+
+    records = iter_records(stream, fmt, definition)
+    # Rows committed by a previous run of this job are parsed but not re-imported.
+    await asyncio.to_thread(_skip_rows, records, resumed_from)
+
+    next_chunk = asyncio.ensure_future(asyncio.to_thread(_read_chunk, records, chunk_size))
+    while True:
+        try:
+            chunk = await next_chunk
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise ImportJobError(f"could not parse import file: {exc}") from exc
+        if not chunk:
+            break
+        next_chunk = asyncio.ensure_future(asyncio.to_thread(_read_chunk, records, chunk_size))
+
+        row_offset = state["committedRows"]
+        results, writes = await prepare_creates(collection, chunk, user, client)
+        errors = [
+            {**result, "row": row_offset + result["index"] + 1}
+            for result in results
+            if result is not None
+        ]
+        checkpoint = {
+            **state,
+            "committedRows": row_offset + len(chunk),
+            "committedChunks": state["committedChunks"] + 1,
+            "created": state["created"] + len(writes),
+            "failed": state["failed"] + len(errors),
+            "errors": (state["errors"] + errors)[:MAX_REPORTED_ERRORS],
+            "updatedAt": datetime.now(timezone.utc),
+        }
+        batch = client.batch()
+        stage_creates(client, batch, definition, writes)
+        batch.set(job_ref, checkpoint, merge=True)
+        try:
+            await batch.commit()
+        except Exception as exc:
+            next_chunk.cancel()
+            failed_state = {**state, "status": "failed", "lastError": str(exc)}
+            await job_ref.set({**failed_state, "updatedAt": datetime.now(timezone.utc)}, merge=True)
+            logger.warning("import chunk failed", extra={"job_id": job_id, "error": str(exc)})
+            raise ImportJobError(
+                f"import stopped after row {state['committedRows']}; resume with jobId={job_id}"
+            ) from exc
+
+        for write in writes:
+            mark_created(collection, write)
+        state = {k: v for k, v in checkpoint.items() if k != "updatedAt"}
+        if on_progress:
+            on_progress(dict(state))
+
+    state["status"] = "completed"
+    await job_ref.set({**state, "updatedAt": datetime.now(timezone.utc)}, merge=True)
+    logger.info(
+        "import completed",
+        extra={
+            "job_id": job_id,
+            "collection": collection,
+            "rows": state["committedRows"],
+            "created_count": state["created"],
+            "failed_count": state["failed"],
+            "resumed_from": resumed_from,
+        },
+    )
+    return {**state, "resumedFrom": resumed_from}
+
+
+__all__ = [
+    "ImportJobError",
+    "build_column_mapping",
+    "detect_format",
+    "iter_records",
+    "map_row",
+    "run_import",
+]
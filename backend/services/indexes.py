@@ -0,0 +1,59 @@
+"""Generate ``firestore.indexes.json`` from the composite indexes declared on collections."""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Mapping
+
+from backend.services.collections import (
+    COLLECTION_DEFINITIONS,
+    CollectionDefinition,
+    CompositeIndex,
+)
+
+MANIFEST_PATH = Path(__file__).resolve().parents[2] / "firestore.indexes.json"
+
+
+def _index_field(spec: str) -> dict[str, str]:
+    name, _, direction = spec.partition(" ")
+    if name.endswith("[]"):
+        return {"fieldPath": name[:-2], "arrayConfig": "CONTAINS"}
+    order = "DESCENDING" if direction.strip().lower() == "desc" else "ASCENDING"
+    return {"fieldPath": name, "order": order}
+
+
+def _index_entry(collection: str, index: CompositeIndex) -> dict[str, Any]:
+    return {
+        "collectionGroup": collection,
+        "queryScope": "COLLECTION",
+        "fields": [_index_field(spec) for spec in index.fields],
+    }
+
+
+def build_index_manifest(
+    definitions: Mapping[str, CollectionDefinition] | None = None,
+) -> dict[str, Any]:
+    """Return the Firebase CLI index manifest for every declared composite index."""
+
+    entries: list[dict[str, Any]] = []
+    seen: set[str] = set()
+    for name, definition in sorted((definitions or COLLECTION_DEFINITIONS).items()):
+        for index in definition.indexes:
+            entry = _index_entry(name, index)
+            key = json.dumps(entry, sort_keys=True)
+            if key not in seen:
+                seen.add(key)
+                entries.append(entry)
+    return {"indexes": entries, "fieldOverrides": []}
+
+
+def render_index_manifest(definitions: Mapping[str, CollectionDefinition] | None = None) -> str:
+    return json.dumps(build_index_manifest(definitions), indent=2) + "\n"
+
+
+def write_index_manifest(path: str | Path = MANIFEST_PATH) -> Path:
+    """Write the manifest for ``firebase deploy --only firestore:indexes``."""
+
+    target = Path(path)
+    target.write_text(render_index_manifest(), encoding="utf-8")
+    return target
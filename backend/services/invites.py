@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import hashlib
 import secrets
 from datetime import datetime, timezone
@@ -8,7 +9,7 @@ from typing import Any
 from backend.config import get_settings
 from backend.logging_utils import get_logger
 from backend.models.invite import InviteAcceptPayload, InviteCreatePayload
-from backend.reps.firestore import fs
+from backend.reps.firestore import afs
 from backend.services.email import send_invite_email
 from backend.services.users import setup_user_profile
 
@@ -44,7 +45,7 @@ def _ensure_super_admin(user: dict[str, Any]) -> None:
     raise InvitePermissionError("only super admins can manage invites")
 
 
-def create_invite(payload: InviteCreatePayload, actor: dict[str, Any]) -> dict[str, Any]:
+async def create_invite(payload: InviteCreatePayload, actor: dict[str, Any]) -> dict[str, Any]:
     _ensure_super_admin(actor)
 
     token = secrets.token_urlsafe(32)
@@ -65,11 +66,12 @@ def create_invite(payload: InviteCreatePayload, actor: dict[str, Any]) -> dict[s
             {"status": "pending", "at": now.isoformat(), "by": actor.get("uid")}
         ],
     }
-    client = fs()
+    client = afs()
     ref = client.collection("userInvites").document()
-    ref.set(record)
+    await ref.set(record)
 
-    invite_link = send_invite_email(payload, token)
+    # SMTP delivery is blocking; run it in a worker thread.
+    invite_link = await asyncio.to_thread(send_invite_email, payload, token)
     logger.info(
         "invite created",
         extra={"invite_id": ref.id, "email": payload.email},
@@ -82,14 +84,14 @@ def create_invite(payload: InviteCreatePayload, actor: dict[str, Any]) -> dict[s
     return safe_record
 
 
-def accept_invite(payload: InviteAcceptPayload, actor: dict[str, Any]) -> dict[str, Any]:
+async def accept_invite(payload: InviteAcceptPayload, actor: dict[str, Any]) -> dict[str, Any]:
     # Manual fall-back: allow setup without an invite token (e.g., self-onboarding)
     if payload.inviteToken == "-1":
         branch_id = payload.branchId or actor.get("branchId")
         if not branch_id:
             raise InviteError("branchId is required for manual setup")
         roles = payload.roles or ["student"]
-        profile = setup_user_profile(
+        profile = await setup_user_profile(
             uid=actor["uid"],
             branch_id=branch_id,
             roles=roles,
@@ -105,10 +107,10 @@ def accept_invite(payload: InviteAcceptPayload, actor: dict[str, Any]) -> dict[s
         return profile
 
     token_hash = _token_hash(payload.inviteToken)
-    client = fs()
+    client = afs()
     collection = client.collection("userInvites").where("tokenHash", "==", token_hash)
     snapshot = None
-    for snap in collection.stream():
+    async for snap in collection.stream():
         if getattr(snap, "exists", False):
             snapshot = snap
             break
@@ -124,7 +126,7 @@ def accept_invite(payload: InviteAcceptPayload, actor: dict[str, Any]) -> dict[s
     if not actor_email or actor_email != invite_email:
         raise InvitePermissionError("invite email mismatch")
 
-    profile = setup_user_profile(
+    profile = await setup_user_profile(
         uid=actor["uid"],
         branch_id=data["branchId"],
         roles=list(data.get("roles") or []),
@@ -138,7 +140,7 @@ def accept_invite(payload: InviteAcceptPayload, actor: dict[str, Any]) -> dict[s
     now = datetime.now(timezone.utc)
     history = list(data.get("history") or [])
     history.append({"status": "accepted", "at": now.isoformat(), "by": actor.get("uid")})
-    client.collection("userInvites").document(snapshot.id).set(
+    await client.collection("userInvites").document(snapshot.id).set(
         {
             "status": "accepted",
             "acceptedAt": now,
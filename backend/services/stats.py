@@ -0,0 +1,116 @@
+"""Read and reconcile the sharded per-branch counters declared with ``CounterRule``."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+from typing import Any
+
+from google.cloud import firestore
+
+from backend.logging_utils import get_logger
+from backend.reps.firestore import afs
+from backend.services.collections import (
+    BRANCH_STATS_COLLECTION,
+    COLLECTION_DEFINITIONS,
+    AuthorizationError,
+    CollectionDefinition,
+    CounterRule,
+    _ensure_role,
+    _run_aggregation,
+    branch_stats_shards,
+)
+
+logger = get_logger(__name__)
+
+STATS_READ_ROLES = ("admin", "staff")
+
+
+def counter_rules() -> list[tuple[CollectionDefinition, CounterRule]]:
+    return [
+        (definition, rule)
+        for definition in COLLECTION_DEFINITIONS.values()
+        for rule in definition.counters
+    ]
+
+
+async def _shard_totals(client: firestore.AsyncClient, branch_id: str) -> dict[str, int]:
+    totals = {rule.name: 0 for _, rule in counter_rules()}
+    async for snapshot in client.collection(branch_stats_shards(branch_id)).stream():
+        for name, value in (snapshot.to_dict() or {}).items():
+            if name in totals and isinstance(value, int):
+                totals[name] += value
+    return totals
+
+
+async def get_branch_stats(branch_id: str, user: dict[str, Any]) -> dict[str, Any]:
+    """Sum a branch's counter shards (one small query, independent of collection sizes)."""
+
+    _ensure_role(user.get("roles"), STATS_READ_ROLES)
+    if user.get("branchId") and user["branchId"] != branch_id:
+        raise AuthorizationError("branch scope violation")
+    client = afs()
+    totals, summary = await asyncio.gather(
+        _shard_totals(client, branch_id),
+        client.collection(BRANCH_STATS_COLLECTION).document(branch_id).get(),
+    )
+    return {
+        "branchId": branch_id,
+        "counters": totals,
+        "reconciledAt": (summary.to_dict() or {}).get("reconciledAt") if summary.exists else None,
+    }
+
+
+async def _recount(
+    client: firestore.AsyncClient, branch_id: str, definition: CollectionDefinition, rule: CounterRule
+) -> int:
+    branch_field = rule.branch_field or definition.branch_scope_field
+    query = client.collection(definition.name).where(branch_field, "==", branch_id)
+    for name, value in rule.match:
+        query = query.where(name, "==", value)
+    return int(await _run_aggregation(query.count(alias="count"), "count") or 0)
+
+
+async def _reconcile_branch(client: firestore.AsyncClient, branch_id: str) -> dict[str, Any]:
+    rules = counter_rules()
+    counts, current = await asyncio.gather(
+        asyncio.gather(*(_recount(client, branch_id, definition, rule) for definition, rule in rules)),
+        _shard_totals(client, branch_id),
+    )
+    actual = {rule.name: count for (_, rule), count in zip(rules, counts)}
+    corrections = {name: actual[name] - current.get(name, 0) for name in actual}
+    corrections = {name: delta for name, delta in corrections.items() if delta}
+
+    batch = client.batch()
+    if corrections:
+        shard = client.collection(branch_stats_shards(branch_id)).document("0")
+        batch.set(shard, {name: firestore.Increment(delta) for name, delta in corrections.items()}, merge=True)
+    batch.set(
+        client.collection(BRANCH_STATS_COLLECTION).document(branch_id),
+        {"branchId": branch_id, "reconciledAt": datetime.now(timezone.utc)},
+        merge=True,
+    )
+    await batch.commit()
+    return {"counters": actual, "corrections": corrections}
+
+
+async def reconcile_branch_stats(branch_id: str | None = None) -> dict[str, Any]:
+    """Recount every counter with aggregation queries and fix the shards by the difference.
+
+    Corrections are applied as increments, so counts moved by writes that land
+    after the recount are kept. Without ``branch_id`` every branch is reconciled.
+    """
+
+    client = afs()
+    if branch_id:
+        branches = [branch_id]
+    else:
+        branches = [snapshot.id async for snapshot in client.collection("branches").select([]).stream()]
+    results = {}
+    for branch in branches:
+        results[branch] = await _reconcile_branch(client, branch)
+        if results[branch]["corrections"]:
+            logger.warning(
+                "branch stats drifted",
+                extra={"branch_id": branch, "corrections": results[branch]["corrections"]},
+            )
+    return {"branches": results}
@@ -1,9 +1,31 @@
 from datetime import datetime, timezone
 
+from backend.config import get_settings
+from backend.logging_utils import get_logger
 from backend.models.students import Student, StudentCreate
-from backend.reps.firestore import fs
+from backend.reps.firestore import afs
+from backend.services.collections import (
+    COLLECTION_DEFINITIONS,
+    ROSTERS_COLLECTION,
+    branch_roster_chunks,
+    roster_chunk_id,
+    roster_writes,
+)
 
-def create_student(dto: StudentCreate, actor_uid: str) -> Student:
+logger = get_logger(__name__)
+
+# branchRosters/{branchId} marks the roster complete; entries live on the
+# chunk documents as a ``students`` map keyed by id (see ``RosterRule``).
+STUDENTS = COLLECTION_DEFINITIONS["students"]
+
+
+def _roster_refs(client, branch_id: str, chunks: int):
+    meta_ref = client.collection(ROSTERS_COLLECTION).document(branch_id)
+    chunk_collection = client.collection(branch_roster_chunks(branch_id))
+    return meta_ref, [chunk_collection.document(f"chunk_{n}") for n in range(chunks)]
+
+
+async def create_student(dto: StudentCreate, actor_uid: str) -> Student:
     now = datetime.now(timezone.utc)
     doc = {
         "name": dto.name,
@@ -12,25 +34,92 @@ def create_student(dto: StudentCreate, actor_uid: str) -> Student:
         "createdAt": now,
         "createdBy": actor_uid,
     }
-    ref = fs().collection("students").document()  # server-generated id
-    ref.set(doc)
+    client = afs()
+    ref = client.collection("students").document()  # server-generated id
+    # The roster entry commits with the student, so a complete roster never misses one.
+    batch = client.batch()
+    batch.set(ref, doc)
+    for roster_ref, entries in roster_writes(client, STUDENTS, [(ref.id, None, doc)]):
+        batch.set(roster_ref, entries, merge=True)
+    await batch.commit()
     return Student(id=ref.id, createdAt=now, **{k: doc[k] for k in ("name","guardianPhone","branchId")})
 
-def list_students(branch_id: str) -> list[Student]:
-    """List all students for a given branch."""
-    students_ref = fs().collection("students")
+
+async def _read_roster(client, branch_id: str) -> list[Student] | None:
+    """Return the branch roster from one batched read, or ``None`` if it is not complete."""
+
+    chunks = get_settings().student_roster_chunks
+    meta_ref, chunk_refs = _roster_refs(client, branch_id, chunks)
+    found = {
+        snapshot.id: snapshot.to_dict() or {}
+        async for snapshot in client.get_all([meta_ref, *chunk_refs])
+        if snapshot.exists
+    }
+    meta = found.get(branch_id)
+    if not meta or not meta.get("complete") or meta.get("chunks") != chunks:
+        return None
+    entries: dict[str, dict] = {}
+    for chunk_ref in chunk_refs:
+        entries.update(found.get(chunk_ref.id, {}).get(STUDENTS.name) or {})
+    # Entries were validated when written; skip re-validating every one.
+    return [
+        Student.model_construct(id=student_id, branchId=branch_id, **entry)
+        for student_id, entry in sorted(entries.items())
+    ]
+
+
+async def _query_students(client, branch_id: str) -> list[Student]:
+    students_ref = client.collection("students")
     query = students_ref.where("branchId", "==", branch_id)
-    docs = query.stream()
-    
+
     students = []
-    for doc in docs:
+    async for doc in query.stream():
         data = doc.to_dict()
-        students.append(Student(
-            id=doc.id,
-            name=data["name"],
-            guardianPhone=data["guardianPhone"],
-            branchId=data["branchId"],
-            createdAt=data["createdAt"]
-        ))
-    
+        students.append(Student(id=doc.id, branchId=data["branchId"], **STUDENTS.roster.entry(data)))
+    return students
+
+
+async def rebuild_roster(branch_id: str, students: list[Student] | None = None) -> int:
+    """Write the branch roster from the students query and mark it complete.
+
+    Chunks are merged rather than replaced, so entries added by concurrent
+    student writes survive the rebuild.
+    """
+
+    client = afs()
+    if students is None:
+        students = await _query_students(client, branch_id)
+    chunks = get_settings().student_roster_chunks
+    meta_ref, chunk_refs = _roster_refs(client, branch_id, chunks)
+    grouped: dict[str, dict[str, dict]] = {chunk_ref.id: {} for chunk_ref in chunk_refs}
+    for student in students:
+        grouped[roster_chunk_id(student.id, chunks)][student.id] = STUDENTS.roster.entry(student.model_dump())
+
+    batch = client.batch()
+    for chunk_ref in chunk_refs:
+        batch.set(chunk_ref, {STUDENTS.name: grouped[chunk_ref.id]}, merge=True)
+    batch.set(
+        meta_ref,
+        {"branchId": branch_id, "chunks": chunks, "complete": True, "rebuiltAt": datetime.now(timezone.utc)},
+    )
+    await batch.commit()
+    return len(students)
+
+
+async def list_students(branch_id: str) -> list[Student]:
+    """List all students for a given branch.
+
+    Served from the branch roster when it is complete; otherwise the students
+    are queried and the roster is rebuilt for the next call.
+    """
+    client = afs()
+    roster = await _read_roster(client, branch_id)
+    if roster is not None:
+        return roster
+
+    students = await _query_students(client, branch_id)
+    try:
+        await rebuild_roster(branch_id, students)
+    except Exception as exc:  # the listing itself already succeeded
+        logger.warning("student roster rebuild failed", extra={"branch_id": branch_id, "error": str(exc)})
     return students
@@ -0,0 +1,104 @@
+"""Rebuild summary collections (see ``SummaryRule``) from their source records."""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator
+
+from google.cloud import firestore
+
+from backend.logging_utils import get_logger
+from backend.reps.firestore import afs
+from backend.services.collections import (
+    COLLECTION_DEFINITIONS,
+    WRITE_BATCH_LIMIT,
+    UnknownCollectionError,
+    ValidationError,
+)
+
+logger = get_logger(__name__)
+
+
+async def _iter_records(
+    client: firestore.AsyncClient, collection: str, fields: list[str], page_size: int
+) -> AsyncIterator[dict[str, Any]]:
+    query = client.collection(collection).select(fields).order_by("__name__").limit(page_size)
+    cursor: str | None = None
+    while True:
+        page = query.start_after([cursor]) if cursor else query
+        count = 0
+        async for snapshot in page.stream():
+            count += 1
+            cursor = snapshot.id
+            yield snapshot.to_dict() or {}
+        if count < page_size:
+            return
+
+
+async def rebuild_summaries(
+    collection: str = "attendanceRecords", *, page_size: int = 1000, concurrency: int = 8
+) -> dict[str, int]:
+    """Recompute every summary fed by ``collection`` from scratch.
+
+    Records are paged through (summarised fields only) and tallied in memory.
+    Summaries are then rewritten with absolute counts, and summaries left
+    without records are deleted, in write batches committed ``concurrency``
+    at a time. Record writes made while this runs can be lost, so pause them.
+    """
+
+    definition = COLLECTION_DEFINITIONS.get(collection)
+    if definition is None:
+        raise UnknownCollectionError(collection)
+    if not definition.summaries:
+        raise ValidationError(f"collection '{collection}' has no summaries")
+
+    client = afs()
+    now = datetime.now(timezone.utc)
+    fields = sorted({name for rule in definition.summaries for name in rule.source_fields})
+    summaries: dict[tuple[str, str], dict[str, Any]] = {}
+    records = 0
+    async for record in _iter_records(client, collection, fields, page_size):
+        records += 1
+        for rule in definition.summaries:
+            key = rule.key(record)
+            if key is None:
+                continue
+            doc_key = (rule.target, rule.summary_id(key))
+            summary = summaries.get(doc_key)
+            if summary is None:
+                counters = {counter: 0 for _, counter in rule.counters}
+                summary = summaries[doc_key] = {**rule.summary_fields(key), **counters, "generatedAt": now}
+            summary[key[-1]] += 1
+
+    operations: list[tuple[Any, dict[str, Any] | None]] = [
+        (client.collection(target).document(summary_id), data)
+        for (target, summary_id), data in summaries.items()
+    ]
+    deleted = 0
+    for target in sorted({rule.target for rule in definition.summaries}):
+        async for snapshot in client.collection(target).select([]).stream():
+            if (target, snapshot.id) not in summaries:
+                operations.append((client.collection(target).document(snapshot.id), None))
+                deleted += 1
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+
+    async def _commit(chunk: list[tuple[Any, dict[str, Any] | None]]) -> None:
+        async with semaphore:
+            batch = client.batch()
+            for ref, data in chunk:
+                if data is None:
+                    batch.delete(ref)
+                else:
+                    batch.set(ref, data)
+            await batch.commit()
+
+    chunks = [
+        operations[start : start + WRITE_BATCH_LIMIT]
+        for start in range(0, len(operations), WRITE_BATCH_LIMIT)
+    ]
+    await asyncio.gather(*(_commit(chunk) for chunk in chunks))
+
+    result = {"records": records, "summaries": len(summaries), "deleted": deleted, "batches": len(chunks)}
+    logger.info("summaries rebuilt", extra={"collection": collection, **result})
+    return result
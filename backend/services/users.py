@@ -1,11 +1,53 @@
 """User management service."""
+import asyncio
 from datetime import datetime, timezone
 from typing import Any
 
-from backend.reps.firestore import fs
+from backend.cache_utils import ExpiringLRUCache
+from backend.config import get_settings
+from backend.logging_utils import get_logger
+from backend.reps.firestore import afs
+from backend.services.claims import sync_user_claims
 
+logger = get_logger(__name__)
 
-def setup_user_profile(
+_profile_cache: ExpiringLRUCache[str, dict[str, Any]] | None = None
+_inflight_reads: dict[str, asyncio.Future[dict[str, Any] | None]] = {}
+
+
+def _get_profile_cache() -> ExpiringLRUCache[str, dict[str, Any]]:
+    global _profile_cache
+    if _profile_cache is None:
+        _profile_cache = ExpiringLRUCache(get_settings().profile_cache_size)
+    return _profile_cache
+
+
+def _cache_profile(uid: str, profile: dict[str, Any]) -> None:
+    # Misses are never cached: a profile set up on another worker must show up on the next read.
+    ttl = get_settings().profile_cache_ttl_seconds
+    if ttl > 0:
+        _get_profile_cache().set_for(uid, profile, ttl)
+
+
+def invalidate_user_profile(uid: str) -> None:
+    """Forget the cached profile for ``uid`` so the next read hits Firestore."""
+
+    _get_profile_cache().pop(uid)
+
+
+def clear_profile_cache() -> None:
+    """Drop every cached profile (handy in tests)."""
+
+    global _profile_cache
+    _profile_cache = None
+    _inflight_reads.clear()
+
+
+def profile_cache_stats() -> dict[str, int]:
+    return _get_profile_cache().stats()
+
+
+async def setup_user_profile(
     uid: str,
     branch_id: str,
     roles: list[str],
@@ -19,8 +61,8 @@ def setup_user_profile(
 ) -> dict[str, Any]:
     """Create or update a user profile in Firestore."""
 
-    user_ref = fs().collection("users").document(uid)
-    snapshot = user_ref.get()
+    user_ref = afs().collection("users").document(uid)
+    snapshot = await user_ref.get()
     existing = snapshot.to_dict() if snapshot and snapshot.exists else {}
 
     now = datetime.now(timezone.utc)
@@ -49,16 +91,46 @@ def setup_user_profile(
     }
 
     filtered = {k: v for k, v in user_data.items() if v is not None}
-    user_ref.set(filtered, merge=True)
+    await user_ref.set(filtered, merge=True)
+    # Write-through: the merged document is exactly what the next read would return.
+    # A read still in flight started before this write; detach it so its result is not cached.
+    _inflight_reads.pop(uid, None)
+    _cache_profile(uid, {**(existing or {}), **filtered})
+    try:
+        await sync_user_claims(uid, roles, branch_id)
+    except Exception as exc:
+        # Claims only short-circuit the profile read in get_user; the profile stays authoritative.
+        logger.warning("custom claims sync failed", extra={"uid": uid, "error": str(exc)})
     return filtered
 
 
-def get_user_profile(uid: str) -> dict | None:
-    """Get user profile from Firestore."""
+async def _read_profile(uid: str) -> dict[str, Any] | None:
+    doc = await afs().collection("users").document(uid).get()
+    return doc.to_dict() if doc.exists else None
+
+
+def _finish_read(uid: str, pending: asyncio.Future[dict[str, Any] | None]) -> None:
+    if _inflight_reads.get(uid) is not pending:
+        return  # detached by a profile write, so the result may be stale
+    del _inflight_reads[uid]
+    if not pending.cancelled() and pending.exception() is None and pending.result() is not None:
+        _cache_profile(uid, pending.result())
+
+
+async def get_user_profile(uid: str) -> dict | None:
+    """Get user profile from Firestore, served from a short-lived cache when possible.
+
+    Concurrent misses for the same uid share a single in-flight read.
+    """
 
-    user_ref = fs().collection("users").document(uid)
-    doc = user_ref.get()
+    cached = _get_profile_cache().get(uid)
+    if cached is not None:
+        return dict(cached)
 
-    if doc.exists:
-        return doc.to_dict()
-    return None
+    pending = _inflight_reads.get(uid)
+    if pending is None:
+        pending = asyncio.ensure_future(_read_profile(uid))
+        _inflight_reads[uid] = pending
+        pending.add_done_callback(lambda done: _finish_read(uid, done))
+    profile = await asyncio.shield(pending)
+    return dict(profile) if profile is not None else None
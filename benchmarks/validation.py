@@ -0,0 +1,197 @@
+"""Compare compiled collection validators with the interpreted validation path.
+
+Run from the repo root:
+
+    python -m benchmarks.validation [--students 2000] [--rounds 5]
+
+Both paths are fed the same large guardian and notification payloads and an
+``existing`` set that satisfies every relationship, so only CPU-side
+validation is timed (no Firestore calls).
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Any, Callable
+
+from backend.services.collections import COLLECTION_DEFINITIONS, CollectionDefinition, ValidationError
+
+# The interpreted path CollectionValidator replaced, kept here as the baseline
+# and as the reference tests/test_validators.py checks the validator against.
+
+
+def extract_values(payload: Any, field_path: str) -> list[Any]:
+    parts = field_path.split(".")
+
+    def _walk(current: Any, idx: int) -> list[Any]:
+        if current is None:
+            return []
+        part = parts[idx]
+        is_list = part.endswith("[]")
+        key = part[:-2] if is_list else part
+
+        if isinstance(current, dict):
+            if key not in current:
+                return []
+            value = current[key]
+        else:
+            return []
+
+        if is_list:
+            if not isinstance(value, list):
+                return []
+            values: list[Any] = []
+            if idx == len(parts) - 1:
+                values.extend(value)
+            else:
+                for item in value:
+                    values.extend(_walk(item, idx + 1))
+            return values
+
+        if idx == len(parts) - 1:
+            return [value]
+
+        return _walk(value, idx + 1)
+
+    return _walk(payload, 0)
+
+
+def validate_required_fields(definition: CollectionDefinition, payload: dict[str, Any]) -> None:
+    missing = [field for field in definition.required_fields if field not in payload]
+    if missing:
+        raise ValidationError(f"missing required fields: {', '.join(missing)}")
+
+
+def relationship_references(definition: CollectionDefinition, payload: dict[str, Any]) -> dict[str, set[str]]:
+    references: dict[str, set[str]] = {}
+    for rule in definition.relationship_rules:
+        if "varies" in rule.target_collections:
+            continue
+        for value in extract_values(payload, rule.field_path):
+            if not isinstance(value, str) or not value:
+                continue
+            for target in rule.target_collections:
+                references.setdefault(target, set()).add(value)
+    return references
+
+
+def check_relationships(
+    definition: CollectionDefinition, payload: dict[str, Any], existing: set[tuple[str, str]]
+) -> None:
+    for rule in definition.relationship_rules:
+        if "varies" in rule.target_collections:
+            continue
+
+        values = extract_values(payload, rule.field_path)
+
+        if not values:
+            if rule.optional:
+                continue
+            raise ValidationError(f"missing relationship field '{rule.field_path}'")
+
+        for value in values:
+            if value is None or value == "":
+                if rule.optional:
+                    continue
+                raise ValidationError(f"relationship '{rule.field_path}' cannot be empty")
+
+            if not isinstance(value, str):
+                raise ValidationError(
+                    f"relationship '{rule.field_path}' values must be strings (document ids)"
+                )
+
+            targets = rule.target_collections
+            if len(targets) == 1:
+                if (targets[0], value) not in existing:
+                    raise ValidationError(
+                        f"related document '{value}' not found in '{targets[0]}'"
+                    )
+            else:
+                if not any((target, value) in existing for target in targets):
+                    targets_str = ", ".join(targets)
+                    raise ValidationError(
+                        f"related document '{value}' not found in any of: {targets_str}"
+                    )
+
+
+def guardian_payload(students: int) -> dict[str, Any]:
+    return {
+        "name": "Large Household",
+        "phone": "+91-90000-00000",
+        "email": "household@example.com",
+        "relationship": "Guardian",
+        "preferredChannel": "sms",
+        "studentIds": [f"student_{idx:05d}" for idx in range(students)],
+    }
+
+
+def notification_payload(metadata_keys: int) -> dict[str, Any]:
+    return {
+        "recipient": {"type": "guardian", "id": "guardian_00001"},
+        "channel": "email",
+        "message": "Term fees are due. " * 50,
+        "status": "scheduled",
+        "scheduledAt": "2025-04-05T10:00:00+05:30",
+        "metadata": {f"key_{idx}": idx for idx in range(metadata_keys)},
+    }
+
+
+def _existing_for(collection: str, payload: dict[str, Any]) -> set[tuple[str, str]]:
+    references = relationship_references(COLLECTION_DEFINITIONS[collection], payload)
+    return {(target, doc_id) for target, ids in references.items() for doc_id in ids}
+
+
+def interpreted(collection: str) -> Callable[[dict[str, Any], set[tuple[str, str]]], None]:
+    definition = COLLECTION_DEFINITIONS[collection]
+
+    def _run(payload: dict[str, Any], existing: set[tuple[str, str]]) -> None:
+        validate_required_fields(definition, payload)
+        relationship_references(definition, payload)
+        check_relationships(definition, payload, existing)
+
+    return _run
+
+
+def compiled(collection: str) -> Callable[[dict[str, Any], set[tuple[str, str]]], None]:
+    validator = COLLECTION_DEFINITIONS[collection].validator
+
+    def _run(payload: dict[str, Any], existing: set[tuple[str, str]]) -> None:
+        validator.validate(payload)
+        validator.references(payload)
+        validator.check_relationships(payload, existing)
+
+    return _run
+
+
+def _time(run: Callable[..., None], payload: dict[str, Any], existing: set, iterations: int, rounds: int) -> float:
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            run(payload, existing)
+        best = min(best, time.perf_counter() - start)
+    return best / iterations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--students", type=int, default=2000, help="studentIds per guardian payload.")
+    parser.add_argument("--metadata-keys", type=int, default=500, help="metadata keys per notification.")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    cases = {
+        "guardians": guardian_payload(args.students),
+        "notifications": notification_payload(args.metadata_keys),
+    }
+    print(f"{'collection':<15}{'interpreted':>14}{'compiled':>14}{'speedup':>10}")
+    for collection, payload in cases.items():
+        existing = _existing_for(collection, payload)
+        slow = _time(interpreted(collection), payload, existing, args.iterations, args.rounds)
+        fast = _time(compiled(collection), payload, existing, args.iterations, args.rounds)
+        print(f"{collection:<15}{slow * 1e6:>12.1f}us{fast * 1e6:>12.1f}us{slow / fast:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ finance.
 from __future__ import annotations
 
 import argparse
+import asyncio
 import os
 from dataclasses import asdict, dataclass
 from datetime import datetime, timezone
@@ -625,6 +626,82 @@ def seed_firestore(
     print("\nAll placeholder documents created or updated successfully.")
 
 
+def backfill_claims(dry_run: bool) -> None:
+    """Copy roles/branchId from Firestore user profiles into Firebase custom claims."""
+
+    from backend.services.claims import backfill_user_claims
+
+    summary = asyncio.run(backfill_user_claims(dry_run=dry_run))
+    prefix = "[DRY-RUN] " if dry_run else ""
+    print(
+        f"{prefix}Scanned {summary['scanned']} profiles: {summary['updated']} updated, "
+        f"{summary['unchanged']} unchanged, {summary['skipped']} skipped, {summary['failed']} failed."
+    )
+
+
+def import_file(path: str, collection: str, fmt: str | None, job_id: str | None) -> None:
+    """Stream a CSV/NDJSON file into a collection, resuming ``job_id`` if it was interrupted."""
+
+    from backend.services.imports import detect_format, run_import
+
+    fmt = fmt or detect_format(path)
+    user = {"uid": "cli-import", "roles": ["admin"], "branchId": None}
+
+    def _progress(state: dict) -> None:
+        print(
+            f"  chunk {state['committedChunks']}: {state['committedRows']} rows "
+            f"({state['created']} created, {state['failed']} failed)"
+        )
+
+    with open(path, "rb") as handle:
+        summary = asyncio.run(
+            run_import(collection, handle, fmt, user, job_id=job_id, on_progress=_progress)
+        )
+    if summary["resumedFrom"]:
+        print(f"Resumed job {summary['jobId']} after row {summary['resumedFrom']}.")
+    print(
+        f"Imported {summary['committedRows']} rows into {collection}: "
+        f"{summary['created']} created, {summary['failed']} failed (job {summary['jobId']})."
+    )
+    for error in summary["errors"]:
+        print(f"  row {error['row']}: {error['error']}")
+
+
+def rebuild_summaries(collection: str | None) -> None:
+    """Recompute the summary documents fed by a collection (default: attendanceRecords)."""
+
+    from backend.services.summaries import rebuild_summaries as rebuild
+
+    source = collection or "attendanceRecords"
+    result = asyncio.run(rebuild(source))
+    print(
+        f"Rebuilt {result['summaries']} summaries from {result['records']} {source} records "
+        f"({result['deleted']} stale summaries deleted, {result['batches']} batches)."
+    )
+
+
+def reconcile_stats(branch_id: str | None) -> None:
+    """Recount the sharded branchStats counters and correct any drift."""
+
+    from backend.services.stats import reconcile_branch_stats
+
+    result = asyncio.run(reconcile_branch_stats(branch_id))
+    for branch, outcome in result["branches"].items():
+        corrections = ", ".join(f"{name} {delta:+d}" for name, delta in outcome["corrections"].items())
+        print(f"{branch}: {outcome['counters']}" + (f" (corrected {corrections})" if corrections else ""))
+
+
+def write_indexes(path: str | None) -> None:
+    """Regenerate firestore.indexes.json from the backend collection definitions."""
+
+    from backend.services.indexes import MANIFEST_PATH, build_index_manifest, write_index_manifest
+
+    target = write_index_manifest(path or MANIFEST_PATH)
+    count = len(build_index_manifest()["indexes"])
+    print(f"Wrote {count} composite indexes to {target}.")
+    print("Deploy with: firebase deploy --only firestore:indexes")
+
+
 def build_parser() -> argparse.ArgumentParser:
     """Configure the CLI parser."""
 
@@ -657,10 +734,51 @@ def build_parser() -> argparse.ArgumentParser:
         default="(default)",
         help="Firestore database ID to target (default: (default)).",
     )
+    parser.add_argument(
+        "--backfill-claims",
+        action="store_true",
+        help="Push roles/branchId from existing user profiles into Firebase custom claims.",
+    )
+    parser.add_argument(
+        "--import-file",
+        help="CSV or NDJSON file to import into --collection through the backend validation rules.",
+    )
+    parser.add_argument(
+        "--collection",
+        help="Target collection for --import-file (e.g. students, guardians) or source for --rebuild-summaries.",
+    )
+    parser.add_argument(
+        "--format",
+        choices=("csv", "ndjson"),
+        help="Format of --import-file; inferred from the file extension when omitted.",
+    )
+    parser.add_argument(
+        "--job-id",
+        help="Import job id; pass the id of a failed import to resume after its last committed chunk.",
+    )
+    parser.add_argument(
+        "--write-indexes",
+        nargs="?",
+        const="",
+        metavar="PATH",
+        help="Generate firestore.indexes.json from the collection definitions (default: repo root).",
+    )
+    parser.add_argument(
+        "--rebuild-summaries",
+        action="store_true",
+        help="Recompute attendanceSummaries (or the summaries of --collection) from the source records.",
+    )
+    parser.add_argument(
+        "--reconcile-stats",
+        nargs="?",
+        const="",
+        metavar="BRANCH",
+        help="Recount branchStats counters for one branch (default: every branch) and fix drift.",
+    )
     parser.add_argument(
         "--dry-run",
         action="store_true",
-        help="Preview the writes that would occur when seeding without touching Firestore.",
+        help="Preview the writes that would occur when seeding or backfilling without touching anything.",
     )
     return parser
 
@@ -671,7 +789,19 @@ def main() -> None:
     parser = build_parser()
     args = parser.parse_args()
 
-    if args.seed:
+    if args.write_indexes is not None:
+        write_indexes(args.write_indexes or None)
+    elif args.reconcile_stats is not None:
+        reconcile_stats(args.reconcile_stats or None)
+    elif args.rebuild_summaries:
+        rebuild_summaries(args.collection)
+    elif args.import_file:
+        if not args.collection:
+            parser.error("--import-file requires --collection")
+        import_file(args.import_file, args.collection, args.format, args.job_id)
+    elif args.backfill_claims:
+        backfill_claims(dry_run=args.dry_run)
+    elif args.seed:
         seed_firestore(
             credential_path=args.credentials,
             project_id=args.project,
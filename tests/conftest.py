@@ -0,0 +1,445 @@
+from __future__ import annotations
+
+import os
+import pathlib
+import sys
+import uuid
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from typing import Any, AsyncIterator
+
+import pytest
+from fastapi.testclient import TestClient
+from firebase_admin import auth as fb_auth
+from google.api_core import exceptions as google_exceptions
+from google.api_core.datetime_helpers import DatetimeWithNanoseconds
+from google.cloud import firestore
+
+os.environ["DEV_AUTH_BYPASS"] = "1"
+os.environ["SUPER_ADMIN_EMAILS"] = "ops@example.com"
+
+ROOT = pathlib.Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from backend.config import reset_settings_cache  # noqa: E402
+
+reset_settings_cache()
+
+from backend.main import app  # noqa: E402
+from backend.deps.auth import get_user as auth_dependency  # noqa: E402
+from backend.services.collections import clear_existence_cache, clear_uncovered_query_shapes  # noqa: E402
+from backend.services.users import clear_profile_cache  # noqa: E402
+
+
+def _lookup(data: dict[str, Any], field_path: str) -> Any:
+    value: Any = data
+    for part in field_path.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def _project(data: dict[str, Any] | None, field_paths: list[str] | None) -> dict[str, Any] | None:
+    if data is None or field_paths is None:
+        return dict(data) if data is not None else None
+    projected: dict[str, Any] = {}
+    for path in field_paths:
+        source: Any = data
+        target = projected
+        parts = path.split(".")
+        for part in parts[:-1]:
+            source = source.get(part) if isinstance(source, dict) else None
+            target = target.setdefault(part, {})
+        if isinstance(source, dict) and parts[-1] in source:
+            target[parts[-1]] = source[parts[-1]]
+    return projected
+
+
+_FILTER_OPS = {
+    "==": lambda actual, expected: actual == expected,
+    "!=": lambda actual, expected: actual is not None and actual != expected,
+    "<": lambda actual, expected: actual < expected,
+    "<=": lambda actual, expected: actual <= expected,
+    ">": lambda actual, expected: actual > expected,
+    ">=": lambda actual, expected: actual >= expected,
+    "in": lambda actual, expected: actual in expected,
+    "not-in": lambda actual, expected: actual is not None and actual not in expected,
+    "array_contains": lambda actual, expected: isinstance(actual, list) and expected in actual,
+    "array_contains_any": lambda actual, expected: isinstance(actual, list)
+    and any(value in actual for value in expected),
+}
+
+
+def _resolve(current: Any, value: Any) -> Any:
+    if isinstance(value, firestore.Increment):
+        return (current if isinstance(current, (int, float)) else 0) + value.value
+    return value
+
+
+def _merged(current: dict[str, Any], payload: dict[str, Any]) -> dict[str, Any]:
+    # set(merge=True) merges nested maps field by field, like Firestore does.
+    merged = dict(current)
+    for key, value in payload.items():
+        if value is firestore.DELETE_FIELD:
+            merged.pop(key, None)
+        elif isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merged(merged[key], value)
+        else:
+            merged[key] = _resolve(merged.get(key), value)
+    return merged
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, doc_id: str, data: dict[str, Any] | None, update_time: Any = None):
+        self.id = doc_id
+        self._data = data
+        self.update_time = update_time
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> dict[str, Any] | None:
+        if self._data is None:
+            return None
+        return dict(self._data)
+
+
+class FakeDocumentReference:
+    def __init__(self, client: "FakeFirestoreClient", collection: str, doc_id: str):
+        self._client = client
+        self._collection = collection
+        self.id = doc_id
+
+    async def set(self, payload: dict[str, Any], merge: bool = False) -> None:
+        bucket = self._client._store.setdefault(self._collection, {})
+        current = bucket[self.id] if merge and self.id in bucket else {}
+        bucket[self.id] = _merged(current, payload) if merge else _merged({}, payload)
+        return FakeWriteResult(self._client._touch(self._collection, self.id))
+
+    def _check_update(self, option: Any) -> None:
+        if self.id not in self._client._store.get(self._collection, {}):
+            raise google_exceptions.NotFound(f"no document {self._collection}/{self.id}")
+        if option is not None and option.last_update_time != self._client.update_time(self._collection, self.id):
+            raise google_exceptions.FailedPrecondition("the document was modified")
+
+    async def update(self, field_updates: dict[str, Any], option: Any = None) -> "FakeWriteResult":
+        self._check_update(option)
+        bucket = self._client._store[self._collection]
+        for path, value in field_updates.items():
+            *parents, leaf = path.split(".")
+            target = bucket[self.id]
+            for part in parents:
+                target = target.setdefault(part, {})
+            target[leaf] = _resolve(target.get(leaf), value)
+        return FakeWriteResult(self._client._touch(self._collection, self.id))
+
+    async def get(self, field_paths: list[str] | None = None) -> FakeDocumentSnapshot:
+        self._client.reads += 1
+        bucket = self._client._store.setdefault(self._collection, {})
+        data = bucket.get(self.id)
+        return FakeDocumentSnapshot(
+            self.id, _project(data, field_paths), self._client.update_time(self._collection, self.id)
+        )
+
+
+class FakeWriteResult:
+    def __init__(self, update_time: Any):
+        self.update_time = update_time
+
+
+class FakeWriteOption:
+    def __init__(self, last_update_time: Any):
+        self.last_update_time = last_update_time
+
+
+class FakeCollectionReference:
+    def __init__(
+        self,
+        client: "FakeFirestoreClient",
+        name: str,
+        filters: tuple[tuple[str, str, Any], ...] = (),
+        orders: tuple[tuple[str, str], ...] = (),
+        limit: int | None = None,
+        cursor: list[Any] | None = None,
+        projection: list[str] | None = None,
+    ):
+        self._client = client
+        self._name = name
+        self._filters = filters
+        self._orders = orders
+        self._limit = limit
+        self._cursor = cursor
+        self._projection = projection
+
+    def _clone(self, **changes: Any) -> "FakeCollectionReference":
+        state = {
+            "filters": self._filters,
+            "orders": self._orders,
+            "limit": self._limit,
+            "cursor": self._cursor,
+            "projection": self._projection,
+        }
+        state.update(changes)
+        return FakeCollectionReference(self._client, self._name, **state)
+
+    def document(self, doc_id: str | None = None) -> FakeDocumentReference:
+        if not doc_id:
+            doc_id = uuid.uuid4().hex
+        return FakeDocumentReference(self._client, self._name, doc_id)
+
+    def where(self, field: str, op: str, value: Any) -> "FakeCollectionReference":
+        if op not in _FILTER_OPS:
+            raise NotImplementedError(f"Unsupported filter operator {op!r}")
+        return self._clone(filters=self._filters + ((field, op, value),))
+
+    def order_by(self, field: str, direction: str = "ASCENDING") -> "FakeCollectionReference":
+        return self._clone(orders=self._orders + ((field, direction),))
+
+    def limit(self, count: int) -> "FakeCollectionReference":
+        return self._clone(limit=count)
+
+    def start_after(self, values: list[Any]) -> "FakeCollectionReference":
+        return self._clone(cursor=list(values))
+
+    def select(self, field_paths: list[str]) -> "FakeCollectionReference":
+        return self._clone(projection=list(field_paths))
+
+    def count(self, alias: str | None = None) -> FakeAggregationQuery:
+        return FakeAggregationQuery(self, alias or "count")
+
+    def sum(self, field: str, alias: str | None = None) -> FakeAggregationQuery:
+        return FakeAggregationQuery(self, alias or "sum", field)
+
+    def _matches(self, data: dict[str, Any]) -> bool:
+        for field, op, expected in self._filters:
+            actual = data.get(field)
+            if op not in ("==", "!=", "not-in") and actual is None:
+                return False
+            try:
+                if not _FILTER_OPS[op](actual, expected):
+                    return False
+            except TypeError:
+                return False
+        return True
+
+    def _sort_key(self, doc_id: str, data: dict[str, Any]) -> tuple[Any, ...]:
+        return tuple(doc_id if field == "__name__" else _lookup(data, field) for field, _ in self._orders)
+
+    def _ordered(self, docs: list[tuple[str, dict[str, Any]]]) -> list[tuple[str, dict[str, Any]]]:
+        for idx in reversed(range(len(self._orders))):
+            field, direction = self._orders[idx]
+            docs.sort(
+                key=lambda item: item[0] if field == "__name__" else _lookup(item[1], field),
+                reverse=direction == "DESCENDING",
+            )
+        if self._cursor is not None:
+            descending = self._orders[0][1] == "DESCENDING"
+            cursor = tuple(self._cursor)
+            docs = [
+                item
+                for item in docs
+                if (self._sort_key(*item) < cursor if descending else self._sort_key(*item) > cursor)
+            ]
+        return docs
+
+    async def stream(self) -> AsyncIterator[FakeDocumentSnapshot]:
+        bucket = self._client._store.setdefault(self._name, {})
+        docs = [(doc_id, data) for doc_id, data in list(bucket.items()) if self._matches(data)]
+        docs = self._ordered(docs)
+        if self._limit is not None:
+            docs = docs[: self._limit]
+        for doc_id, data in docs:
+            yield FakeDocumentSnapshot(doc_id, _project(data, self._projection))
+
+
+class FakeAggregationResult:
+    def __init__(self, alias: str, value: Any):
+        self.alias = alias
+        self.value = value
+
+
+class FakeAggregationQuery:
+    def __init__(self, query: FakeCollectionReference, alias: str, field: str | None = None):
+        self._query = query
+        self._alias = alias
+        self._field = field
+
+    async def get(self) -> list[list[FakeAggregationResult]]:
+        self._query._client.aggregations += 1
+        bucket = self._query._client._store.get(self._query._name, {})
+        docs = [data for data in bucket.values() if self._query._matches(data)]
+        if self._field is None:
+            value: Any = len(docs)
+        else:
+            values = [data.get(self._field) for data in docs]
+            value = sum(v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool))
+        return [[FakeAggregationResult(self._alias, value)]]
+
+
+class FakeWriteBatch:
+    def __init__(self, client: "FakeFirestoreClient"):
+        self._client = client
+        self._writes: list[tuple[str, FakeDocumentReference, dict[str, Any] | None, Any]] = []
+
+    def set(self, ref: FakeDocumentReference, payload: dict[str, Any], merge: bool = False) -> None:
+        self._writes.append(("set", ref, payload, merge))
+
+    def create(self, ref: FakeDocumentReference, payload: dict[str, Any]) -> None:
+        self._writes.append(("create", ref, payload, None))
+
+    def update(self, ref: FakeDocumentReference, field_updates: dict[str, Any], option: Any = None) -> None:
+        self._writes.append(("update", ref, field_updates, option))
+
+    def delete(self, ref: FakeDocumentReference) -> None:
+        self._writes.append(("delete", ref, None, None))
+
+    async def commit(self) -> list[Any]:
+        if len(self._writes) > 500:
+            raise ValueError("too many writes in one batch")
+        # Preconditions are checked up front so a failing batch writes nothing.
+        for kind, ref, _, option in self._writes:
+            if kind == "create" and ref.id in self._client._store.get(ref._collection, {}):
+                raise google_exceptions.AlreadyExists(f"document {ref._collection}/{ref.id} exists")
+            if kind == "update":
+                ref._check_update(option)
+        self._client.commits.append(len(self._writes))
+        results = []
+        for kind, ref, payload, option in self._writes:
+            if kind == "delete":
+                self._client._store.get(ref._collection, {}).pop(ref.id, None)
+                results.append(FakeWriteResult(None))
+            elif kind == "update":
+                results.append(await ref.update(payload))
+            else:
+                results.append(await ref.set(payload, merge=kind == "set" and option))
+        return results
+
+
+class FakeFirestoreClient:
+    def __init__(self) -> None:
+        self._store: dict[str, dict[str, dict[str, Any]]] = {}
+        self.reads = 0
+        self.batch_reads: list[tuple[str, ...]] = []
+        self.commits: list[int] = []
+        self.aggregations = 0
+        self._update_times: dict[tuple[str, str], DatetimeWithNanoseconds] = {}
+        self._clock = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+    def _touch(self, collection: str, doc_id: str) -> DatetimeWithNanoseconds:
+        self._clock += timedelta(microseconds=1)
+        stamp = DatetimeWithNanoseconds.from_rfc3339(self._clock.strftime("%Y-%m-%dT%H:%M:%S.%fZ"))
+        self._update_times[(collection, doc_id)] = stamp
+        return stamp
+
+    def update_time(self, collection: str, doc_id: str) -> DatetimeWithNanoseconds | None:
+        if doc_id not in self._store.get(collection, {}):
+            return None
+        # Documents seeded straight into ``_store`` get a version on first sight.
+        return self._update_times.get((collection, doc_id)) or self._touch(collection, doc_id)
+
+    @staticmethod
+    def write_option(last_update_time: Any = None) -> FakeWriteOption:
+        return FakeWriteOption(last_update_time)
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, name)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    async def get_all(
+        self, references: list[FakeDocumentReference], field_paths: Any = None
+    ) -> AsyncIterator[FakeDocumentSnapshot]:
+        self.batch_reads.append(tuple(f"{ref._collection}/{ref.id}" for ref in references))
+        for ref in references:
+            data = self._store.get(ref._collection, {}).get(ref.id)
+            yield FakeDocumentSnapshot(
+                ref.id, _project(data, field_paths), self.update_time(ref._collection, ref.id)
+            )
+
+
+class FakeUserRecord:
+    def __init__(self, uid: str, custom_claims: dict[str, Any] | None = None):
+        self.uid = uid
+        self.custom_claims = custom_claims
+
+
+class FakeAuth:
+    """Local stand-in for ``firebase_admin.auth`` custom-claims calls."""
+
+    def __init__(self) -> None:
+        self.claims: dict[str, dict[str, Any]] = {}
+        self.writes = 0
+        self.lookups: list[int] = []
+
+    UidIdentifier = staticmethod(fb_auth.UidIdentifier)
+
+    def get_user(self, uid: str) -> FakeUserRecord:
+        return FakeUserRecord(uid, self.claims.get(uid))
+
+    def get_users(self, identifiers: list[Any]) -> SimpleNamespace:
+        if len(identifiers) > 100:
+            raise ValueError("at most 100 identifiers per call")
+        self.lookups.append(len(identifiers))
+        return SimpleNamespace(users=[self.get_user(item.uid) for item in identifiers], not_found=[])
+
+    def set_custom_user_claims(self, uid: str, claims: dict[str, Any]) -> None:
+        self.writes += 1
+        self.claims[uid] = dict(claims)
+
+
+@pytest.fixture(autouse=True)
+def fake_auth(monkeypatch: pytest.MonkeyPatch) -> FakeAuth:
+    stand_in = FakeAuth()
+    monkeypatch.setattr("backend.services.claims.auth_client", lambda: stand_in)
+    return stand_in
+
+
+@pytest.fixture(autouse=True)
+def fake_firestore(monkeypatch: pytest.MonkeyPatch) -> FakeFirestoreClient:
+    fake_client = FakeFirestoreClient()
+
+    monkeypatch.setattr("backend.reps.firestore.afs", lambda: fake_client)
+    monkeypatch.setattr("backend.services.collections.afs", lambda: fake_client)
+    monkeypatch.setattr("backend.services.students.afs", lambda: fake_client)
+    monkeypatch.setattr("backend.services.users.afs", lambda: fake_client)
+    monkeypatch.setattr("backend.services.invites.afs", lambda: fake_client)
+    monkeypatch.setattr("backend.services.claims.afs", lambda: fake_client)
+    monkeypatch.setattr("backend.services.imports.afs", lambda: fake_client)
+    monkeypatch.setattr("backend.services.attendance.afs", lambda: fake_client)
+    monkeypatch.setattr("backend.services.billing.afs", lambda: fake_client)
+    monkeypatch.setattr("backend.services.stats.afs", lambda: fake_client)
+    monkeypatch.setattr("backend.services.summaries.afs", lambda: fake_client)
+    clear_profile_cache()
+    clear_existence_cache()
+    clear_uncovered_query_shapes()
+
+    def _fake_send(payload, token):
+        return f"https://setup.local/invite?token={token}"
+
+    monkeypatch.setattr("backend.services.email.send_invite_email", _fake_send)
+
+    return fake_client
+
+
+@pytest.fixture(autouse=True)
+def override_auth_dependency() -> Any:
+    def _set(user: dict[str, Any] | None = None) -> dict[str, Any]:
+        payload = user or {
+            "uid": "dev",
+            "roles": ["admin", "staff", "super_admin"],
+            "branchId": "branch_demo_001",
+            "email": "ops@example.com",
+        }
+        app.dependency_overrides[auth_dependency] = lambda: payload
+        return payload
+
+    _set()
+    yield _set
+    app.dependency_overrides.pop(auth_dependency, None)
+
+
+@pytest.fixture(scope="module")
+def client() -> TestClient:
+    return TestClient(app)
@@ -1,147 +1,19 @@
 from __future__ import annotations
 
-import os
-import pathlib
-import sys
-import uuid
+import asyncio
+import base64
+import io
+import json
+from datetime import datetime, timezone
 from typing import Any
 
 import pytest
 from fastapi.testclient import TestClient
 
-os.environ["DEV_AUTH_BYPASS"] = "1"
-os.environ["SUPER_ADMIN_EMAILS"] = "ops@example.com"
-
-ROOT = pathlib.Path(__file__).resolve().parents[1]
-if str(ROOT) not in sys.path:
-    sys.path.insert(0, str(ROOT))
-
-from backend.config import reset_settings_cache  # noqa: E402
-
-reset_settings_cache()
-
-from backend.main import app  # noqa: E402
-from backend.deps.auth import get_user as auth_dependency  # noqa: E402
-
-
-class FakeDocumentSnapshot:
-    def __init__(self, doc_id: str, data: dict[str, Any] | None):
-        self.id = doc_id
-        self._data = data
-
-    @property
-    def exists(self) -> bool:
-        return self._data is not None
-
-    def to_dict(self) -> dict[str, Any] | None:
-        if self._data is None:
-            return None
-        return dict(self._data)
-
-
-class FakeDocumentReference:
-    def __init__(self, client: "FakeFirestoreClient", collection: str, doc_id: str):
-        self._client = client
-        self._collection = collection
-        self.id = doc_id
-
-    def set(self, payload: dict[str, Any], merge: bool = False) -> None:
-        bucket = self._client._store.setdefault(self._collection, {})
-        if merge and self.id in bucket:
-            bucket[self.id].update(payload)
-        else:
-            bucket[self.id] = dict(payload)
-
-    def get(self) -> FakeDocumentSnapshot:
-        bucket = self._client._store.setdefault(self._collection, {})
-        data = bucket.get(self.id)
-        return FakeDocumentSnapshot(self.id, dict(data) if data is not None else None)
-
-
-class FakeCollectionReference:
-    def __init__(
-        self,
-        client: "FakeFirestoreClient",
-        name: str,
-        filters: tuple[tuple[str, Any], ...] = (),
-    ):
-        self._client = client
-        self._name = name
-        self._filters = filters
-
-    def document(self, doc_id: str | None = None) -> FakeDocumentReference:
-        if not doc_id:
-            doc_id = uuid.uuid4().hex
-        return FakeDocumentReference(self._client, self._name, doc_id)
-
-    def where(self, field: str, op: str, value: Any) -> "FakeCollectionReference":
-        if op != "==":
-            raise NotImplementedError("Only equality filters supported in tests")
-        return FakeCollectionReference(
-            self._client, self._name, self._filters + ((field, value),)
-        )
-
-    def _matches(self, data: dict[str, Any]) -> bool:
-        for field, expected in self._filters:
-            if data.get(field) != expected:
-                return False
-        return True
-
-    def stream(self) -> list[FakeDocumentSnapshot]:
-        bucket = self._client._store.setdefault(self._name, {})
-        snapshots: list[FakeDocumentSnapshot] = []
-        for doc_id, data in bucket.items():
-            if self._matches(data):
-                snapshots.append(FakeDocumentSnapshot(doc_id, dict(data)))
-        return snapshots
-
-
-class FakeFirestoreClient:
-    def __init__(self) -> None:
-        self._store: dict[str, dict[str, dict[str, Any]]] = {}
-
-    def collection(self, name: str) -> FakeCollectionReference:
-        return FakeCollectionReference(self, name)
-
-
-@pytest.fixture(autouse=True)
-def fake_firestore(monkeypatch: pytest.MonkeyPatch) -> FakeFirestoreClient:
-    fake_client = FakeFirestoreClient()
-
-    monkeypatch.setattr("backend.reps.firestore.fs", lambda: fake_client)
-    monkeypatch.setattr("backend.services.collections.fs", lambda: fake_client)
-    monkeypatch.setattr("backend.services.students.fs", lambda: fake_client)
-    monkeypatch.setattr("backend.services.users.fs", lambda: fake_client)
-    monkeypatch.setattr("backend.services.invites.fs", lambda: fake_client)
-
-    def _fake_send(payload, token):
-        return f"https://setup.local/invite?token={token}"
-
-    monkeypatch.setattr("backend.services.email.send_invite_email", _fake_send)
-
-    return fake_client
-
-
-@pytest.fixture(autouse=True)
-def override_auth_dependency() -> Any:
-    def _set(user: dict[str, Any] | None = None) -> dict[str, Any]:
-        payload = user or {
-            "uid": "dev",
-            "roles": ["admin", "staff", "super_admin"],
-            "branchId": "branch_demo_001",
-            "email": "ops@example.com",
-        }
-        app.dependency_overrides[auth_dependency] = lambda: payload
-        return payload
-
-    _set()
-    yield _set
-    app.dependency_overrides.pop(auth_dependency, None)
-
-
-@pytest.fixture(scope="module")
-def client() -> TestClient:
-    return TestClient(app)
+from backend.services.claims import backfill_user_claims
+from backend.services.collections import clear_existence_cache
+from backend.services.imports import ImportJobError, run_import
+from backend.services.users import get_user_profile, setup_user_profile
 
 
 def test_setup_user_and_get_me(client: TestClient, override_auth_dependency) -> None:
@@ -182,6 +54,106 @@ def test_setup_user_and_get_me(client: TestClient, override_auth_dependency) ->
     override_auth_dependency()
 
 
+def test_setup_pushes_custom_claims_and_backfill_covers_existing_users(
+    client: TestClient, fake_firestore, fake_auth, override_auth_dependency
+) -> None:
+    override_auth_dependency(
+        {"uid": "claims_uid", "roles": [], "branchId": None, "email": "claims@example.com"}
+    )
+    setup_resp = client.post(
+        "/users/setup",
+        json={"inviteToken": "-1", "branchId": "branch_demo_001", "roles": ["staff"]},
+    )
+    assert setup_resp.status_code == 200, setup_resp.text
+    assert fake_auth.claims["claims_uid"] == {"roles": ["staff"], "branchId": "branch_demo_001"}
+    override_auth_dependency()
+
+    fake_firestore._store["users"]["legacy_uid"] = {
+        "uid": "legacy_uid",
+        "roles": ["admin"],
+        "branchId": "branch_demo_002",
+    }
+    fake_firestore._store["users"]["pending_uid"] = {"uid": "pending_uid"}
+    fake_auth.claims["legacy_uid"] = {"tier": "gold"}
+
+    preview = asyncio.run(backfill_user_claims(dry_run=True))
+    assert preview["updated"] == 1
+    assert fake_auth.claims["legacy_uid"] == {"tier": "gold"}
+
+    summary = asyncio.run(backfill_user_claims())
+    assert summary == {"scanned": 3, "updated": 1, "unchanged": 1, "skipped": 1, "failed": 0}
+    assert fake_auth.claims["legacy_uid"] == {
+        "tier": "gold",
+        "roles": ["admin"],
+        "branchId": "branch_demo_002",
+    }
+
+
+def test_claims_backfill_batches_lookups_and_skips_matching_users(fake_firestore, fake_auth) -> None:
+    fake_firestore._store["users"] = {
+        f"u{idx:03d}": {"uid": f"u{idx:03d}", "roles": ["staff"], "branchId": "branch_demo_001"}
+        for idx in range(150)
+    }
+    fake_auth.claims["u000"] = {"roles": ["staff"], "branchId": "branch_demo_001"}
+
+    summary = asyncio.run(backfill_user_claims())
+
+    assert fake_auth.lookups == [100, 50]
+    assert (summary["updated"], summary["unchanged"]) == (149, 1)
+    assert fake_auth.writes == 149
+
+
+def test_profile_reads_are_cached_and_written_through(
+    client: TestClient, fake_firestore, override_auth_dependency
+) -> None:
+    # Misses are not cached, so a profile set up elsewhere is seen right away.
+    assert asyncio.run(get_user_profile("manual_uid")) is None
+    assert asyncio.run(get_user_profile("manual_uid")) is None
+    assert fake_firestore.reads == 2
+
+    async def _concurrent_reads() -> list[Any]:
+        return await asyncio.gather(*(get_user_profile("other_uid") for _ in range(5)))
+
+    assert asyncio.run(_concurrent_reads()) == [None] * 5
+    assert fake_firestore.reads == 3
+
+    override_auth_dependency(
+        {"uid": "manual_uid", "roles": [], "branchId": None, "email": "manual@example.com"}
+    )
+    setup_resp = client.post(
+        "/users/setup",
+        json={"inviteToken": "-1", "branchId": "branch_demo_001", "roles": ["staff"]},
+    )
+    assert setup_resp.status_code == 200, setup_resp.text
+    reads_after_setup = fake_firestore.reads
+
+    me = client.get("/users/me").json()
+    assert me["profile"]["branchId"] == "branch_demo_001"
+    assert fake_firestore.reads == reads_after_setup
+
+    override_auth_dependency()
+
+
+def test_profile_write_detaches_inflight_read(monkeypatch: pytest.MonkeyPatch) -> None:
+    release = asyncio.Event()
+
+    async def _stale_read(uid: str) -> dict[str, Any]:
+        await release.wait()
+        return {"uid": uid, "branchId": "branch_old", "roles": []}
+
+    monkeypatch.setattr("backend.services.users._read_profile", _stale_read)
+
+    async def _race() -> dict[str, Any] | None:
+        reader = asyncio.ensure_future(get_user_profile("racing_uid"))
+        await asyncio.sleep(0)
+        await setup_user_profile("racing_uid", "branch_demo_001", ["staff"])
+        release.set()
+        await reader
+        return await get_user_profile("racing_uid")
+
+    assert asyncio.run(_race())["branchId"] == "branch_demo_001"
+
+
 def _create_branch(client: TestClient) -> dict[str, Any]:
     payload = {
         "id": "branch_demo_001",
@@ -259,6 +231,503 @@ def test_collection_create_and_list(client: TestClient) -> None:
     assert any(item["id"] == student["id"] for item in students_list)
 
 
+def test_fetch_documents_by_id_with_one_batched_read(client: TestClient, fake_firestore) -> None:
+    students = fake_firestore._store.setdefault("students", {})
+    students["s1"] = {"firstName": "A", "lastName": "One", "branchId": "branch_demo_001", "status": "active"}
+    students["s2"] = {"firstName": "B", "lastName": "Two", "branchId": "branch_demo_001", "status": "active"}
+    students["s_other"] = {"firstName": "C", "lastName": "Three", "branchId": "branch_other", "status": "active"}
+
+    single = client.get("/collections/students/s1")
+    assert single.status_code == 200, single.text
+    assert single.json()["firstName"] == "A"
+    assert client.get("/collections/students/s_other").status_code == 404
+    assert client.get("/collections/students/missing").status_code == 404
+
+    legacy = client.get("/collections/students?id=s2").json()
+    assert [doc["id"] for doc in legacy] == ["s2"]
+
+    fake_firestore.batch_reads.clear()
+    many = client.get("/collections/students", params={"ids": "s2,missing,s_other,s1,s2", "fields": "firstName"})
+    assert many.status_code == 200, many.text
+    assert many.json() == [{"id": "s2", "firstName": "B"}, {"id": "s1", "firstName": "A"}]
+    assert fake_firestore.batch_reads == [
+        ("students/s2", "students/missing", "students/s_other", "students/s1")
+    ]
+
+    mixed = client.get("/collections/students", params={"ids": "s1", "status": "active"})
+    assert mixed.status_code == 422
+
+
+def test_list_expands_relationships_with_one_read_per_target(client: TestClient, fake_firestore) -> None:
+    store = fake_firestore._store
+    store["students"] = {
+        f"s{idx}": {"firstName": f"S{idx}", "lastName": "X", "branchId": "branch_demo_001", "status": "active"}
+        for idx in range(3)
+    }
+    store["students"]["s_other"] = {"firstName": "O", "lastName": "X", "branchId": "branch_other", "status": "active"}
+    store["batches"] = {"b1": {"name": "Morning", "branchId": "branch_demo_001"}}
+    store["enrollments"] = {
+        f"e{idx}": {"studentId": f"s{idx % 3}", "batchId": "b1", "branchId": "branch_demo_001", "status": "active"}
+        for idx in range(6)
+    }
+    store["enrollments"]["e_leak"] = {
+        "studentId": "s_other", "batchId": "b1", "branchId": "branch_demo_001", "status": "active"
+    }
+    store["guardians"] = {"g1": {"name": "G", "studentIds": ["s0", "missing", "s2"]}}
+
+    fake_firestore.batch_reads.clear()
+    response = client.get("/collections/enrollments", params={"expand": "studentId,batchId"})
+    assert response.status_code == 200, response.text
+    rows = {row["id"]: row for row in response.json()}
+
+    assert rows["e4"]["_expanded"]["studentId"]["firstName"] == "S1"
+    assert rows["e4"]["_expanded"]["batchId"]["name"] == "Morning"
+    assert rows["e_leak"]["_expanded"]["studentId"] is None
+    assert sorted(len(read) for read in fake_firestore.batch_reads) == [1, 4]
+
+    guardian = client.get("/collections/guardians/g1", params={"expand": "studentIds[]"}).json()
+    assert [doc["id"] for doc in guardian["_expanded"]["studentIds[]"]] == ["s0", "s2"]
+
+    lines = client.get(
+        "/collections/enrollments",
+        params={"expand": "batchId", "fields": "status"},
+        headers={"Accept": "application/x-ndjson"},
+    ).text.splitlines()
+    first = json.loads(lines[0])
+    assert first["_expanded"]["batchId"]["id"] == "b1"
+    assert first["batchId"] == "b1"
+
+    assert client.get("/collections/enrollments", params={"expand": "status"}).status_code == 422
+
+
+def test_patch_merges_fields_with_if_match(client: TestClient, fake_firestore) -> None:
+    store = fake_firestore._store
+    store["staff"] = {"staff_1": {"name": "Lead"}}
+    store["batches"] = {
+        "b1": {
+            "name": "Morning",
+            "branchId": "branch_demo_001",
+            "startDate": "2025-04-01",
+            "endDate": "2025-09-30",
+            "schedule": {"days": ["Mon"], "time": "09:00"},
+            "isActive": True,
+            "leadInstructorId": "staff_1",
+        },
+        "b_other": {"name": "Elsewhere", "branchId": "branch_other"},
+    }
+
+    read = client.get("/collections/batches/b1")
+    etag = read.headers["ETag"]
+    fake_firestore.batch_reads.clear()
+
+    patched = client.patch(
+        "/collections/batches/b1",
+        json={"name": "Early", "schedule.time": "08:00"},
+        headers={"If-Match": etag},
+    )
+    assert patched.status_code == 200, patched.text
+    assert patched.headers["ETag"] != etag
+    assert patched.json()["name"] == "Early"
+    assert fake_firestore.batch_reads == []
+    stored = store["batches"]["b1"]
+    assert stored["schedule"] == {"days": ["Mon"], "time": "08:00"}
+    assert stored["leadInstructorId"] == "staff_1"
+    assert stored["updatedBy"] == "dev"
+
+    stale = client.patch("/collections/batches/b1", json={"name": "Late"}, headers={"If-Match": etag})
+    assert stale.status_code == 412
+    assert store["batches"]["b1"]["name"] == "Early"
+
+    bad_ref = client.patch("/collections/batches/b1", json={"leadInstructorId": "ghost"})
+    assert bad_ref.status_code == 422
+    assert fake_firestore.batch_reads == [("staff/ghost",)]
+
+    assert client.patch("/collections/batches/b_other", json={"name": "Mine"}).status_code == 404
+    assert client.patch("/collections/batches/missing", json={"name": "Mine"}).status_code == 404
+    assert client.patch("/collections/batches/b1", json={"createdAt": "2020-01-01"}).status_code == 422
+    assert client.patch("/collections/batches/b1", json={"isActive": "yes"}).status_code == 422
+    assert client.patch("/collections/batches/b1", json={"name": None}).status_code == 422
+    # Unscoped collections skip the read; a missing document surfaces from the write.
+    assert client.patch("/collections/invoices/missing", json={"status": "paid"}).status_code == 404
+
+
+def test_relationships_are_checked_with_one_batched_read(client: TestClient, fake_firestore) -> None:
+    _create_branch(client)
+    student_ids = []
+    for idx in range(10):
+        response = client.post(
+            "/collections/students",
+            json={
+                "id": f"student_{idx}",
+                "firstName": f"Student {idx}",
+                "lastName": "Demo",
+                "branchId": "branch_demo_001",
+                "status": "active",
+            },
+        )
+        assert response.status_code == 200, response.text
+        student_ids.append(response.json()["id"])
+
+    clear_existence_cache()
+    fake_firestore.reads = 0
+    fake_firestore.batch_reads.clear()
+    guardian = {
+        "name": "Meera Rao",
+        "phone": "+91-90000-55555",
+        "email": "meera.rao@example.com",
+        "relationship": "Mother",
+        "studentIds": student_ids,
+    }
+    response = client.post("/collections/guardians", json=guardian)
+    assert response.status_code == 200, response.text
+    assert fake_firestore.reads == 0
+    assert len(fake_firestore.batch_reads) == 1
+    assert len(fake_firestore.batch_reads[0]) == 10
+
+    missing = client.post(
+        "/collections/guardians", json={**guardian, "studentIds": [*student_ids, "ghost"]}
+    )
+    assert missing.status_code == 422
+    assert missing.json()["detail"] == "related document 'ghost' not found in 'students'"
+
+
+def test_reference_existence_cache(client: TestClient, fake_firestore) -> None:
+    student = {
+        "firstName": "Kabir",
+        "lastName": "Das",
+        "branchId": "branch_demo_001",
+        "status": "active",
+    }
+    missing = client.post("/collections/students", json=student)
+    assert missing.status_code == 422
+    assert client.post("/collections/students", json=student).status_code == 422
+    assert len(fake_firestore.batch_reads) == 1
+
+    _create_branch(client)  # write-through replaces the negative entry
+    fake_firestore.batch_reads.clear()
+    for _ in range(3):
+        response = client.post("/collections/students", json=student)
+        assert response.status_code == 200, response.text
+    assert fake_firestore.batch_reads == []
+
+    stats = client.get("/collections/_stats/cache").json()
+    assert stats["branches"]["hits"] == 4
+    assert stats["branches"]["misses"] == 1
+
+
+def test_collection_list_pagination(client: TestClient, fake_firestore) -> None:
+    bucket = fake_firestore._store.setdefault("auditLogs", {})
+    for idx in range(7):
+        bucket[f"log_{idx}"] = {
+            "action": "update",
+            "timestamp": f"2025-04-0{idx % 3 + 1}T09:00:00Z",
+            "actorId": "staff_demo_001",
+        }
+
+    seen: list[str] = []
+    token = None
+    pages = 0
+    while True:
+        url = "/collections/auditLogs?limit=3&orderBy=timestamp desc&action=update"
+        if token:
+            url += f"&pageToken={token}"
+        response = client.get(url)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        pages += 1
+        seen.extend(item["id"] for item in body["items"])
+        token = body["nextPageToken"]
+        if not token:
+            break
+
+    assert pages == 3
+    assert sorted(seen) == sorted(bucket)
+    timestamps = [bucket[doc_id]["timestamp"] for doc_id in seen]
+    assert timestamps == sorted(timestamps, reverse=True)
+
+    other_order = client.get("/collections/auditLogs?limit=1&orderBy=timestamp").json()
+    mismatched = client.get(f"/collections/auditLogs?limit=3&pageToken={other_order['nextPageToken']}")
+    assert mismatched.status_code == 422
+
+    assert client.get("/collections/auditLogs?limit=0").status_code == 422
+    for values in (["log_1"], ["2025-04-01T09:00:00Z", 7], [{"nested": 1}, "log_1"]):
+        raw = json.dumps({"o": "timestamp ASCENDING", "v": values}).encode()
+        forged = base64.urlsafe_b64encode(raw).decode().rstrip("=")
+        response = client.get(f"/collections/auditLogs?limit=3&orderBy=timestamp&pageToken={forged}")
+        assert response.status_code == 422, values
+
+
+def test_collection_list_projection_hides_dotted_order_field(client: TestClient, fake_firestore) -> None:
+    bucket = fake_firestore._store.setdefault("auditLogs", {})
+    for idx in range(3):
+        bucket[f"log_{idx}"] = {"action": "update", "metadata": {"seq": idx, "note": "n"}}
+
+    first = client.get("/collections/auditLogs?limit=2&orderBy=metadata.seq&fields=action").json()
+    assert first["items"] == [{"id": "log_0", "action": "update"}, {"id": "log_1", "action": "update"}]
+    rest = client.get(
+        f"/collections/auditLogs?limit=2&orderBy=metadata.seq&fields=action&pageToken={first['nextPageToken']}"
+    ).json()
+    assert rest["items"] == [{"id": "log_2", "action": "update"}]
+
+
+def test_collection_list_typed_operator_filters(client: TestClient, fake_firestore) -> None:
+    records = fake_firestore._store.setdefault("attendanceRecords", {})
+    for day in range(1, 8):
+        records[f"rec_{day}"] = {"batchId": "batch_a", "sessionDate": f"2025-04-0{day}", "status": "present"}
+    invoices = fake_firestore._store.setdefault("invoices", {})
+    invoices["inv_due"] = {"status": "due", "totalAmount": 100}
+    invoices["inv_overdue"] = {"status": "overdue", "totalAmount": 200}
+    invoices["inv_paid"] = {"status": "paid", "totalAmount": 300}
+    guardians = fake_firestore._store.setdefault("guardians", {})
+    guardians["g1"] = {"name": "G1", "studentIds": ["s1", "s2"]}
+    guardians["g2"] = {"name": "G2", "studentIds": ["s3"]}
+
+    between = client.get(
+        "/collections/attendanceRecords",
+        params={"batchId": "batch_a", "sessionDate[gte]": "2025-04-03", "sessionDate[lt]": "2025-04-06"},
+    )
+    assert between.status_code == 200, between.text
+    assert sorted(doc["sessionDate"] for doc in between.json()) == ["2025-04-03", "2025-04-04", "2025-04-05"]
+
+    pending = client.get("/collections/invoices", params={"status[in]": "due,overdue"}).json()
+    assert sorted(doc["id"] for doc in pending) == ["inv_due", "inv_overdue"]
+    large = client.get("/collections/invoices", params={"totalAmount[gt]": "150"}).json()
+    assert sorted(doc["id"] for doc in large) == ["inv_overdue", "inv_paid"]
+
+    linked = client.get("/collections/guardians", params={"studentIds[contains]": "s2"}).json()
+    assert [doc["id"] for doc in linked] == ["g1"]
+
+    bad_type = client.get("/collections/invoices", params={"totalAmount[gt]": "lots"})
+    assert bad_type.status_code == 422
+    bad_op = client.get("/collections/invoices", params={"status[like]": "due"})
+    assert bad_op.status_code == 422
+    two_ranges = client.get(
+        "/collections/invoices", params={"dueDate[gte]": "2025-04-01", "totalAmount[gt]": "1"}
+    )
+    assert two_ranges.status_code == 422
+    unindexed = client.get(
+        "/collections/attendanceRecords", params={"status": "present", "sessionDate[gte]": "2025-04-01"}
+    )
+    assert unindexed.status_code == 400
+    assert "composite index" in unindexed.json()["detail"]
+
+    client.get("/collections/attendanceRecords", params={"status": "present", "sessionDate[gte]": "2025-04-02"})
+    stats = client.get("/collections/_stats/queries").json()
+    assert stats["uncovered"] == [
+        {"collection": "attendanceRecords", "index": ["status", "sessionDate"], "count": 2}
+    ]
+
+
+def test_collection_list_field_projection(client: TestClient) -> None:
+    _create_branch(client)
+
+    rows = client.get("/collections/branches?fields=name,address.city").json()
+    assert rows == [
+        {"id": "branch_demo_001", "name": "Koramangala Center", "address": {"city": "Bengaluru"}}
+    ]
+
+    page = client.get("/collections/branches?fields=code&limit=5&orderBy=name").json()
+    assert page["items"] == [{"id": "branch_demo_001", "code": "KRM001"}]
+
+    unknown = client.get("/collections/branches?fields=name,secretSauce")
+    assert unknown.status_code == 422
+    assert "secretSauce" in unknown.json()["detail"]
+
+
+def test_collection_list_streams_ndjson(client: TestClient, fake_firestore) -> None:
+    bucket = fake_firestore._store.setdefault("auditLogs", {})
+    for idx in range(25):
+        bucket[f"log_{idx:02d}"] = {"action": "login", "timestamp": datetime(2025, 4, 1, tzinfo=timezone.utc)}
+
+    response = client.get(
+        "/collections/auditLogs?fields=action",
+        headers={"Accept": "application/x-ndjson"},
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == 25
+    assert lines[0] == {"id": "log_00", "action": "login"}
+
+    forbidden = client.get(
+        "/collections/students?branchId=other_branch",
+        headers={"Accept": "application/x-ndjson"},
+    )
+    assert forbidden.status_code == 403
+
+
+def test_count_and_sum_use_aggregation_queries(client: TestClient, fake_firestore) -> None:
+    _create_branch(client)
+    students = fake_firestore._store.setdefault("students", {})
+    for idx in range(3):
+        students[f"agg_{idx}"] = {"branchId": "branch_demo_001", "status": "active"}
+    students["agg_other"] = {"branchId": "branch_other", "status": "active"}
+    invoices = fake_firestore._store.setdefault("invoices", {})
+    invoices["inv_1"] = {"status": "pending", "totalAmount": 1500}
+    invoices["inv_2"] = {"status": "pending", "totalAmount": 250.5}
+    invoices["inv_3"] = {"status": "paid", "totalAmount": 999}
+    reads_before = fake_firestore.reads
+
+    count_resp = client.get("/collections/students:count", params={"status": "active"})
+    assert count_resp.status_code == 200, count_resp.text
+    assert count_resp.json() == {"count": 3}
+
+    sum_resp = client.get(
+        "/collections/invoices:sum", params={"field": "totalAmount", "status": "pending"}
+    )
+    assert sum_resp.status_code == 200, sum_resp.text
+    assert sum_resp.json() == {"field": "totalAmount", "sum": 1750.5}
+
+    assert fake_firestore.aggregations == 2
+    assert fake_firestore.reads == reads_before
+
+    bad_field = client.get("/collections/invoices:sum", params={"field": "bogus"})
+    assert bad_field.status_code == 422
+    other_branch = client.get("/collections/students:count", params={"branchId": "branch_other"})
+    assert other_branch.status_code == 403
+
+
+def test_batch_create_reports_each_item(client: TestClient, fake_firestore) -> None:
+    _create_branch(client)
+    clear_existence_cache()
+    fake_firestore.batch_reads.clear()
+
+    students = [
+        {
+            "id": f"bulk_{idx}",
+            "firstName": f"Bulk {idx}",
+            "lastName": "Import",
+            "branchId": "branch_demo_001",
+            "status": "active",
+        }
+        for idx in range(1200)
+    ]
+    students.append({"firstName": "No", "lastName": "Branch", "status": "active"})
+    students.append({**students[0]})
+    response = client.post("/collections/students:batchCreate", json=students)
+    assert response.status_code == 200, response.text
+    body = response.json()
+
+    assert body["created"] == 1200
+    assert body["failed"] == 2
+    assert body["results"][1200]["statusCode"] == 422
+    assert "duplicate id" in body["results"][1201]["error"]
+    # 497 students plus one branchStats counter shard and two roster chunks per batch.
+    assert fake_firestore.commits == [500, 500, 209]
+    # One batched read for the referenced branch and one for the payload ids.
+    assert sorted(len(read) for read in fake_firestore.batch_reads) == [1, 1200]
+    assert len(fake_firestore._store["students"]) == 1200
+
+    # An existing id fails only its own item; the rest of the chunk is committed.
+    retry = [{**students[5], "id": f"more_{idx}"} for idx in range(5)] + [students[7]]
+    body = client.post("/collections/students:batchCreate", json=retry).json()
+    assert (body["created"], body["failed"]) == (5, 1)
+    assert body["results"][5]["statusCode"] == 409
+    assert "already exists" in body["results"][5]["error"]
+
+
+def test_csv_import_maps_columns_and_reports_bad_rows(client: TestClient, fake_firestore) -> None:
+    _create_branch(client)
+    rows = ["first_name,Last Name,branch_id,status,contact.phone"]
+    rows += [f"Imp{idx},Student,branch_demo_001,active,+91-{idx:05d}" for idx in range(5)]
+    rows.append("Lost,Student,branch_missing,active,")
+    upload = ("\n".join(rows) + "\n").encode()
+
+    response = client.post(
+        "/collections/students:import",
+        files={"file": ("students.csv", upload, "text/csv")},
+    )
+    assert response.status_code == 200, response.text
+    body = response.json()
+
+    assert body["status"] == "completed"
+    assert body["committedRows"] == 6
+    assert body["created"] == 5
+    assert body["failed"] == 1
+    assert body["errors"][0]["row"] == 6
+    imported = [doc for doc in fake_firestore._store["students"].values() if doc["lastName"] == "Student"]
+    assert {doc["firstName"] for doc in imported} == {f"Imp{idx}" for idx in range(5)}
+    assert imported[0]["contact"]["phone"].startswith("+91-")
+    assert fake_firestore._store["importJobs"][body["jobId"]]["status"] == "completed"
+
+
+def test_import_resumes_after_last_committed_chunk(client: TestClient, fake_firestore, monkeypatch) -> None:
+    _create_branch(client)
+    lines = [
+        json.dumps(
+            {"id": f"nd_{idx}", "firstName": "Nd", "lastName": str(idx), "branchId": "branch_demo_001", "status": "active"}
+        )
+        for idx in range(10)
+    ]
+    upload = ("\n".join(lines) + "\n").encode()
+    user = {"uid": "dev", "roles": ["admin"], "branchId": None}
+
+    batch_type = type(fake_firestore.batch())
+    original_commit = batch_type.commit
+
+    async def _flaky_commit(self):
+        if len(fake_firestore.commits) == 2:
+            raise RuntimeError("deadline exceeded")
+        return await original_commit(self)
+
+    monkeypatch.setattr(batch_type, "commit", _flaky_commit)
+    with pytest.raises(ImportJobError):
+        asyncio.run(run_import("students", io.BytesIO(upload), "ndjson", user, job_id="job-1", chunk_size=4))
+    job = fake_firestore._store["importJobs"]["job-1"]
+    assert job["status"] == "failed"
+    assert job["committedRows"] == 8
+
+    monkeypatch.setattr(batch_type, "commit", original_commit)
+    progress: list[int] = []
+    summary = asyncio.run(
+        run_import(
+            "students",
+            io.BytesIO(upload),
+            "ndjson",
+            user,
+            job_id="job-1",
+            chunk_size=4,
+            on_progress=lambda state: progress.append(state["committedRows"]),
+        )
+    )
+
+    assert summary["resumedFrom"] == 8
+    assert summary["created"] == 10
+    assert progress == [10]
+    assert sorted(fake_firestore._store["students"]) == [f"nd_{idx}" for idx in range(10)]
+
+
+
+def test_import_records_existing_ids_and_resumes(client: TestClient, fake_firestore, monkeypatch) -> None:
+    _create_branch(client)
+    rows = [
+        {"id": f"ex_{idx}", "firstName": "Ex", "lastName": str(idx), "branchId": "branch_demo_001", "status": "active"}
+        for idx in range(8)
+    ]
+    fake_firestore._store["students"] = {"ex_6": {**rows[6], "lastName": "Original"}}
+    upload = ("\n".join(json.dumps(row) for row in rows) + "\n").encode()
+    user = {"uid": "dev", "roles": ["admin"], "branchId": None}
+
+    batch_type = type(fake_firestore.batch())
+    original_commit = batch_type.commit
+
+    async def _flaky_commit(self):
+        if len(fake_firestore.commits) == 1:
+            raise RuntimeError("deadline exceeded")
+        return await original_commit(self)
+
+    monkeypatch.setattr(batch_type, "commit", _flaky_commit)
+    with pytest.raises(ImportJobError):
+        asyncio.run(run_import("students", io.BytesIO(upload), "ndjson", user, job_id="job-ex", chunk_size=4))
+    monkeypatch.setattr(batch_type, "commit", original_commit)
+
+    summary = asyncio.run(run_import("students", io.BytesIO(upload), "ndjson", user, job_id="job-ex", chunk_size=4))
+
+    assert summary["status"] == "completed"
+    assert (summary["resumedFrom"], summary["created"], summary["failed"]) == (4, 7, 1)
+    assert [(error["row"], error["statusCode"]) for error in summary["errors"]] == [(7, 409)]
+    assert fake_firestore._store["students"]["ex_6"]["lastName"] == "Original"
+
 def test_student_route_uses_role_guard(client: TestClient) -> None:
     payload = {
         "name": "Aarav Patel",
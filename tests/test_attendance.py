@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from fastapi.testclient import TestClient
+
+SESSION_URL = "/batches/b1/sessions/2025-04-07/attendance"
+
+
+def _seed(fake_firestore, students: int = 40) -> list[str]:
+    store = fake_firestore._store
+    student_ids = [f"s{idx:02d}" for idx in range(students)]
+    store["students"] = {sid: {"firstName": sid, "branchId": "branch_demo_001"} for sid in student_ids}
+    store["students"]["s_other"] = {"firstName": "Elsewhere", "branchId": "branch_other"}
+    store["batches"] = {
+        "b1": {"name": "Morning", "branchId": "branch_demo_001"},
+        "b_other": {"name": "Elsewhere", "branchId": "branch_other"},
+    }
+    store["staff"] = {"staff_1": {"name": "Lead"}}
+    return student_ids
+
+
+def _payload(student_ids: list[str], status: str = "present") -> dict:
+    return {"recordedBy": "staff_1", "records": [{"studentId": sid, "status": status} for sid in student_ids]}
+
+
+def test_session_attendance_is_one_commit_and_idempotent(client: TestClient, fake_firestore) -> None:
+    student_ids = _seed(fake_firestore)
+    store = fake_firestore._store
+
+    response = client.post(SESSION_URL, json=_payload(student_ids))
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert (body["created"], body["updated"], body["unchanged"]) == (40, 0, 0)
+    assert body["records"][0] == {"studentId": "s00", "id": "b1_2025-04-07_s00", "result": "created"}
+    # batches, students, staff and the existing records: one batched read each.
+    assert len(fake_firestore.batch_reads) == 4
+    assert fake_firestore.commits == [80]
+    assert store["attendanceRecords"]["b1_2025-04-07_s05"]["status"] == "present"
+    assert store["attendanceSummaries"]["s05_b1_2025-04"]["presentCount"] == 1
+
+    retry = client.post(SESSION_URL, json=_payload(student_ids))
+    assert retry.json()["unchanged"] == 40
+    assert fake_firestore.commits == [80]
+
+    payload = _payload(student_ids)
+    payload["records"][5] = {"studentId": "s05", "status": "absent", "notes": "sick"}
+    changed = client.post(SESSION_URL, json=payload)
+    assert (changed.json()["updated"], changed.json()["unchanged"]) == (1, 39)
+    assert fake_firestore.commits[-1] == 2
+    record = store["attendanceRecords"]["b1_2025-04-07_s05"]
+    assert (record["status"], record["notes"]) == ("absent", "sick")
+    summary = store["attendanceSummaries"]["s05_b1_2025-04"]
+    assert (summary["presentCount"], summary["absentCount"]) == (0, 1)
+
+
+def test_session_attendance_rejects_invalid_sessions(client: TestClient, fake_firestore) -> None:
+    student_ids = _seed(fake_firestore, students=3)
+
+    unknown = client.post(SESSION_URL, json=_payload([*student_ids, "ghost", "s_other"]))
+    assert unknown.status_code == 422
+    assert "ghost, s_other" in unknown.json()["detail"]
+    assert client.post("/batches/b_other/sessions/2025-04-07/attendance", json=_payload(student_ids)).status_code == 404
+    assert client.post("/batches/b1/sessions/07-04-2025/attendance", json=_payload(student_ids)).status_code == 422
+    assert client.post(SESSION_URL, json=_payload(["s00", "s00"])).status_code == 422
+    bad_staff = {**_payload(student_ids), "recordedBy": "ghost"}
+    assert client.post(SESSION_URL, json=bad_staff).status_code == 422
+    assert fake_firestore.commits == []
+    assert "attendanceRecords" not in fake_firestore._store
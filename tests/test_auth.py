@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import time
+from typing import Any
+
+import pytest
+from fastapi import HTTPException
+
+from backend.cache_utils import ExpiringLRUCache
+from backend.config import Settings
+from backend.deps import auth
+from backend.deps.token_verifier import FirebaseTokenVerifier, SigningKeyStore
+
+
+@pytest.fixture(autouse=True)
+def live_auth(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    settings = Settings(
+        DEV_AUTH_BYPASS=False,
+        AUTH_TOKEN_CACHE_SIZE=2,
+        FIREBASE_LOCAL_TOKEN_VERIFICATION=False,
+    )
+    verified: list[str] = []
+
+    def _fake_verify(token: str) -> dict[str, Any]:
+        verified.append(token)
+        claims: dict[str, Any] = {"uid": f"uid-{token}", "exp": time.time() + 3600}
+        if not token.startswith("legacy"):
+            claims.update(roles=["staff"], branchId="b1")
+        return claims
+
+    async def _no_profile(uid: str) -> None:
+        return None
+
+    monkeypatch.setattr(auth, "get_settings", lambda: settings)
+    monkeypatch.setattr(auth, "_ensure_firebase_initialized", lambda: None)
+    monkeypatch.setattr(auth.fb_auth, "verify_id_token", _fake_verify)
+    monkeypatch.setattr(auth, "get_user_profile", _no_profile)
+    monkeypatch.setattr(auth, "_verifier", None)
+    auth.reset_token_cache()
+    yield verified
+    auth.reset_token_cache()
+
+
+def test_repeat_token_skips_verification(live_auth: list[str]) -> None:
+    first = asyncio.run(auth.get_user("token-a"))
+    second = asyncio.run(auth.get_user("token-a"))
+
+    assert first["uid"] == second["uid"] == "uid-token-a"
+    assert live_auth == ["token-a"]
+    stats = auth.token_cache_stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+
+def test_token_cache_evicts_least_recently_used(live_auth: list[str]) -> None:
+    asyncio.run(auth.get_user("token-a"))
+    asyncio.run(auth.get_user("token-b"))
+    asyncio.run(auth.get_user("token-a"))
+    asyncio.run(auth.get_user("token-c"))  # evicts token-b
+    asyncio.run(auth.get_user("token-b"))
+
+    assert live_auth == ["token-a", "token-b", "token-c", "token-b"]
+    assert auth.token_cache_stats()["evictions"] == 2
+
+
+def test_claims_skip_profile_read(live_auth: list[str], monkeypatch: pytest.MonkeyPatch) -> None:
+    profile_reads: list[str] = []
+
+    async def _record_read(uid: str) -> None:
+        profile_reads.append(uid)
+
+    monkeypatch.setattr(auth, "get_user_profile", _record_read)
+
+    with_claims = asyncio.run(auth.get_user("token-a"))
+    without_claims = asyncio.run(auth.get_user("legacy-token"))
+
+    assert with_claims["roles"] == ["staff"]
+    assert with_claims["profile"] is None
+    assert without_claims["roles"] == ["student"]
+    assert profile_reads == ["uid-legacy-token"]
+
+
+def test_cold_key_store_answers_503(monkeypatch: pytest.MonkeyPatch) -> None:
+    def _unreachable() -> tuple[dict[str, str], float | None]:
+        raise OSError("certificate endpoint unreachable")
+
+    store = SigningKeyStore(_unreachable, retry_interval=60)
+    monkeypatch.setattr(auth, "_verifier", FirebaseTokenVerifier("demo-project", store))
+    header = base64.urlsafe_b64encode(json.dumps({"alg": "RS256", "kid": "k1"}).encode()).decode()
+    try:
+        with pytest.raises(HTTPException) as excinfo:
+            asyncio.run(auth.get_user(f"{header.rstrip('=')}.e30.c2ln"))
+    finally:
+        store.stop()
+
+    assert excinfo.value.status_code == 503
+    assert excinfo.value.headers == {"Retry-After": "1"}
+
+
+def test_project_id_file_is_read_once(tmp_path, monkeypatch: pytest.MonkeyPatch) -> None:
+    credentials = tmp_path / "service-account.json"
+    credentials.write_text(json.dumps({"project_id": "demo-project"}))
+    settings = Settings(FIREBASE_CREDENTIALS_FILE=str(credentials))
+    monkeypatch.setattr(auth, "get_settings", lambda: settings)
+    auth._project_id_from_file.cache_clear()
+
+    assert auth._resolve_project_id() == "demo-project"
+    credentials.unlink()
+    assert auth._resolve_project_id() == "demo-project"
+    auth._project_id_from_file.cache_clear()
+
+
+def test_expiring_cache_drops_entries_after_expiry() -> None:
+    now = [1000.0]
+    cache: ExpiringLRUCache[str, str] = ExpiringLRUCache(4, clock=lambda: now[0])
+    cache.set("key", "value", expires_at=1010.0)
+
+    assert cache.get("key") == "value"
+    now[0] = 1010.0
+    assert cache.get("key") is None
+    assert cache.stats()["size"] == 0
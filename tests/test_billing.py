@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from backend.services.billing import build_invoice, run_billing
+
+ADMIN = {"uid": "admin_1", "roles": ["admin"], "branchId": "branch_demo_001"}
+
+
+def _enrollment(branch: str = "branch_demo_001", status: str = "active", **plan) -> dict:
+    return {
+        "studentId": "s1",
+        "batchId": "b1",
+        "branchId": branch,
+        "status": status,
+        "joinedAt": "2025-01-15",
+        "tuitionPlan": {"feeAmount": 15000, "currency": "INR", "billingCycle": "monthly", **plan},
+    }
+
+
+def test_billing_run_creates_invoices_once(client: TestClient, fake_firestore) -> None:
+    store = fake_firestore._store
+    store["enrollments"] = {f"e{idx:04d}": _enrollment() for idx in range(1100)}
+    store["enrollments"].update(
+        {
+            "e_other": _enrollment(branch="branch_other"),
+            "e_left": _enrollment(status="withdrawn"),
+            "e_quarterly": _enrollment(billingCycle="quarterly"),
+            "e_free": _enrollment(feeAmount=0),
+        }
+    )
+
+    response = client.post("/billing/runs", json={"branchId": "branch_demo_001", "billingPeriod": "2025-04"})
+
+    assert response.status_code == 200, response.text
+    report = response.json()
+    assert (report["enrollments"], report["created"], report["existing"], report["skipped"]) == (1102, 1101, 0, 1)
+    assert report["skippedReasons"] == {"missing tuitionPlan.feeAmount": 1}
+    assert report["chunks"] == 3
+    # 499 invoices plus one branchStats counter shard per batch.
+    assert sorted(fake_firestore.commits) == [104, 500, 500]
+    invoice = store["invoices"]["e0007_2025-04"]
+    assert invoice["totalAmount"] == 15000
+    assert (invoice["issueDate"], invoice["dueDate"]) == ("2025-04-01", "2025-04-10")
+    assert (invoice["branchId"], invoice["currency"], invoice["status"]) == ("branch_demo_001", "INR", "pending")
+    assert "e_quarterly_2025-04" in store["invoices"]
+
+    rerun = client.post("/billing/runs", json={"branchId": "branch_demo_001", "billingPeriod": "2025-04"})
+    assert (rerun.json()["created"], rerun.json()["existing"]) == (0, 1101)
+    assert len(fake_firestore.commits) == 3
+
+    assert client.post("/billing/runs", json={"branchId": "branch_other", "billingPeriod": "2025-04"}).status_code == 403
+    assert client.post("/billing/runs", json={"branchId": "branch_demo_001", "billingPeriod": "April"}).status_code == 422
+
+
+def test_billing_run_bounds_concurrent_chunks(fake_firestore) -> None:
+    fake_firestore._store["enrollments"] = {f"e{idx:03d}": _enrollment() for idx in range(50)}
+    batch_type = type(fake_firestore.batch())
+    original_commit = batch_type.commit
+    in_flight = peak = 0
+
+    async def slow_commit(self):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        try:
+            return await original_commit(self)
+        finally:
+            in_flight -= 1
+
+    batch_type.commit = slow_commit
+    try:
+        report = asyncio.run(
+            run_billing("branch_demo_001", "2025-04", ADMIN, chunk_size=5, max_concurrent_chunks=3)
+        )
+    finally:
+        batch_type.commit = original_commit
+
+    assert (report["created"], report["chunks"]) == (50, 10)
+    assert peak == 3
+    assert report["invoicesPerSecond"] > 0
+
+
+def test_build_invoice_follows_billing_cycle() -> None:
+    quarterly = _enrollment(billingCycle="quarterly")
+    issue, due = date(2025, 4, 1), date(2025, 4, 10)
+    assert build_invoice("e1", quarterly, "2025-04", issue, due)[0] is not None
+    assert build_invoice("e1", quarterly, "2025-05", issue, due) == (None, "not due this period (quarterly)")
+    assert build_invoice("e1", quarterly, "2024-12", issue, due) == (None, "joined after the billing period")
+    assert build_invoice("e1", _enrollment(billingCycle="weekly"), "2025-04", issue, due)[1] == (
+        "unknown billingCycle 'weekly'"
+    )
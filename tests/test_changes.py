@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend.services import changes
+from backend.services.collections import AuthorizationError
+
+
+class FakeWatch:
+    def __init__(self, collection: str, scope_field: str | None, branch: str | None, callback) -> None:
+        self.collection = collection
+        self.scope_field = scope_field
+        self.branch = branch
+        self.callback = callback
+        self.active = True
+
+    def unsubscribe(self) -> None:
+        self.active = False
+
+    def emit(self, *events: tuple[str, str, dict[str, Any] | None]) -> None:
+        """Deliver a snapshot from a separate thread, as the Firestore client does."""
+
+        snapshot_changes = [
+            SimpleNamespace(
+                type=SimpleNamespace(name=kind),
+                document=SimpleNamespace(id=doc_id, to_dict=lambda data=data: data),
+            )
+            for kind, doc_id, data in events
+        ]
+        thread = threading.Thread(target=self.callback, args=([], snapshot_changes, None))
+        thread.start()
+        thread.join()
+
+
+@pytest.fixture
+def watches(monkeypatch: pytest.MonkeyPatch) -> list[FakeWatch]:
+    started: list[FakeWatch] = []
+
+    def _start(collection, scope_field, branch, callback):
+        watch = FakeWatch(collection, scope_field, branch, callback)
+        started.append(watch)
+        return watch
+
+    monkeypatch.setattr(changes, "_start_listener", _start)
+    yield started
+    changes.close_change_feeds()
+
+
+USER = {"uid": "staff_1", "roles": ["staff"], "branchId": "branch_demo_001"}
+
+
+def test_subscribers_share_one_listener_per_branch(watches: list[FakeWatch]) -> None:
+    async def scenario() -> None:
+        first = changes.subscribe_changes("students", USER)
+        second = changes.subscribe_changes("students", USER)
+        other = changes.subscribe_changes("students", {**USER, "branchId": "branch_other"})
+        assert len(watches) == 2
+        assert watches[0].scope_field == "branchId" and watches[0].branch == "branch_demo_001"
+
+        watches[0].emit(("ADDED", "student_0", {"firstName": "Initial"}))  # initial snapshot
+        watches[0].emit(
+            ("ADDED", "student_1", {"firstName": "Asha"}),
+            ("REMOVED", "student_0", None),
+        )
+        for subscription in (first, second):
+            batch = await subscription.next(1)
+            assert batch == [
+                {"type": "added", "id": "student_1", "data": {"firstName": "Asha"}},
+                {"type": "removed", "id": "student_0", "data": None},
+            ]
+        assert await other.next(0.01) is None
+
+        first.close()
+        assert watches[0].active
+        second.close()
+        assert not watches[0].active
+        assert changes.change_feed_hub().stats() == {"students/branch_other": 1}
+        other.close()
+
+    asyncio.run(scenario())
+
+
+def test_slow_subscriber_is_dropped(watches: list[FakeWatch], monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("CHANGE_FEED_MAX_PENDING", "2")
+    from backend.config import reset_settings_cache
+
+    reset_settings_cache()
+
+    async def scenario() -> None:
+        slow = changes.subscribe_changes("students", USER)
+        fast = changes.subscribe_changes("students", USER)
+        watch = watches[0]
+        watch.emit()
+        for idx in range(3):
+            watch.emit(("MODIFIED", f"student_{idx}", {"status": "active"}))
+            await asyncio.sleep(0)
+            assert (await fast.next(1))[0]["id"] == f"student_{idx}"
+
+        assert await slow.next(1) is changes.DROPPED
+        assert slow.dropped
+        assert changes.change_feed_hub().stats() == {"students/branch_demo_001": 1}
+        fast.close()
+        assert not watch.active
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        reset_settings_cache()
+
+
+def test_branch_scope_is_enforced(watches: list[FakeWatch]) -> None:
+    async def scenario() -> None:
+        with pytest.raises(AuthorizationError):
+            changes.subscribe_changes("students", USER, "branch_other")
+        with pytest.raises(AuthorizationError):
+            changes.subscribe_changes("auditLogs", USER)
+
+    asyncio.run(scenario())
+    assert watches == []
+
+
+def test_changes_route_streams_server_sent_events(
+    client: TestClient, override_auth_dependency, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    def _start(collection, scope_field, branch, callback):
+        watch = FakeWatch(collection, scope_field, branch, callback)
+
+        def _feed() -> None:
+            watch.emit()
+            watch.emit(("MODIFIED", "student_1", {"status": "inactive"}))
+            changes.close_change_feeds()
+
+        threading.Thread(target=_feed).start()
+        return watch
+
+    monkeypatch.setattr(changes, "_start_listener", _start)
+    override_auth_dependency(USER)
+
+    response = client.get("/collections/students/changes")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.text == (
+        ": connected\n\n"
+        "event: modified\n"
+        'data: {"id": "student_1", "data": {"status": "inactive"}}\n\n'
+    )
+    assert changes.change_feed_hub().stats() == {}
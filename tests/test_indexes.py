@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from backend.services.collections import CollectionDefinition, CompositeIndex
+from backend.services.indexes import MANIFEST_PATH, build_index_manifest, render_index_manifest
+
+
+def test_manifest_matches_collection_definitions() -> None:
+    # Regenerate with `python test.py --write-indexes` after changing declared indexes.
+    assert MANIFEST_PATH.read_text(encoding="utf-8") == render_index_manifest()
+
+
+def test_manifest_field_specs() -> None:
+    definition = CollectionDefinition(
+        name="guardians",
+        required_fields=(),
+        indexes=(
+            CompositeIndex(("studentIds[]", "name")),
+            CompositeIndex(("studentIds[]", "name")),
+            CompositeIndex(("branchId", "createdAt desc")),
+        ),
+    )
+
+    manifest = build_index_manifest({"guardians": definition})
+
+    assert manifest["fieldOverrides"] == []
+    assert [entry["fields"] for entry in manifest["indexes"]] == [
+        [
+            {"fieldPath": "studentIds", "arrayConfig": "CONTAINS"},
+            {"fieldPath": "name", "order": "ASCENDING"},
+        ],
+        [
+            {"fieldPath": "branchId", "order": "ASCENDING"},
+            {"fieldPath": "createdAt", "order": "DESCENDING"},
+        ],
+    ]
+    assert {entry["collectionGroup"] for entry in manifest["indexes"]} == {"guardians"}
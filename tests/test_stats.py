@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from backend.services.stats import reconcile_branch_stats
+
+STATS_URL = "/stats/branches/branch_demo_001"
+
+
+def _student(idx: int, status: str = "active", branch: str = "branch_demo_001") -> dict:
+    return {"id": f"st_{idx}", "firstName": f"S{idx}", "lastName": "Count", "branchId": branch, "status": status}
+
+
+def _shards(fake_firestore, branch: str = "branch_demo_001") -> dict:
+    return fake_firestore._store.get(f"branchStats/{branch}/shards", {})
+
+
+def test_writes_keep_sharded_branch_counters(client: TestClient, fake_firestore) -> None:
+    fake_firestore._store["branches"] = {"branch_demo_001": {"name": "Main"}, "branch_other": {"name": "Other"}}
+
+    assert client.post("/collections/students", json=_student(0)).status_code == 200
+    client.post(
+        "/collections/students:batchCreate",
+        json=[_student(idx) for idx in range(1, 30)] + [_student(30, status="inactive")],
+    )
+    client.post("/collections/students", json=_student(31, branch="branch_other"))
+    # The single create and the batch each landed their increments on one shard.
+    assert sum(shard.get("activeStudents", 0) for shard in _shards(fake_firestore).values()) == 30
+
+    assert client.patch("/collections/students/st_3", json={"status": "inactive"}).status_code == 200
+    assert client.patch("/collections/students/st_30", json={"status": "active"}).status_code == 200
+    assert client.patch("/collections/students/st_4", json={"lastName": "Renamed"}).status_code == 200
+
+    stats = client.get(STATS_URL)
+    assert stats.status_code == 200, stats.text
+    counters = stats.json()["counters"]
+    assert counters["activeStudents"] == 30
+    assert counters["activeBatches"] == 0 and counters["pendingInvoices"] == 0
+    assert client.get("/stats/branches/branch_other").status_code == 403
+
+
+def test_reconcile_corrects_drifted_counters(client: TestClient, fake_firestore) -> None:
+    store = fake_firestore._store
+    store["branches"] = {"branch_demo_001": {"name": "Main"}}
+    client.post("/collections/students:batchCreate", json=[_student(idx) for idx in range(5)])
+    # Written around the API, so the counters never saw it.
+    store["students"]["st_raw"] = _student(99)
+    store["invoices"] = {"inv_1": {"status": "pending", "branchId": "branch_demo_001"}}
+
+    response = client.post(f"{STATS_URL}:reconcile")
+
+    assert response.status_code == 200, response.text
+    assert response.json()["corrections"] == {"activeStudents": 1, "pendingInvoices": 1}
+    counters = client.get(STATS_URL).json()
+    assert counters["counters"]["activeStudents"] == 6
+    assert counters["counters"]["pendingInvoices"] == 1
+    assert counters["reconciledAt"] is not None
+
+    again = asyncio.run(reconcile_branch_stats())
+    assert again["branches"]["branch_demo_001"]["corrections"] == {}
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+
+from fastapi.testclient import TestClient
+
+from backend.services.collections import update_document
+from backend.services.students import list_students, rebuild_roster
+
+BRANCH = "branch_demo_001"
+ROSTER_CHUNKS = f"branchRosters/{BRANCH}/chunks"
+ADMIN = {"uid": "admin_1", "roles": ["admin"]}
+
+
+def _student(name: str, branch: str = BRANCH) -> dict:
+    return {"name": name, "guardianPhone": "+91-90000-11111", "branchId": branch}
+
+
+def test_student_list_is_one_batched_read(client: TestClient, fake_firestore) -> None:
+    for name in ("Aarav", "Diya", "Kabir"):
+        assert client.post("/students", json=_student(name)).status_code == 201
+    client.post("/students", json=_student("Other", branch="branch_other"))
+    asyncio.run(rebuild_roster(BRANCH))
+    fake_firestore.batch_reads.clear()
+
+    response = client.get("/students")
+
+    assert response.status_code == 200, response.text
+    assert sorted(item["name"] for item in response.json()) == ["Aarav", "Diya", "Kabir"]
+    assert {item["branchId"] for item in response.json()} == {BRANCH}
+    assert len(fake_firestore.batch_reads) == 1
+    assert fake_firestore.batch_reads[0] == (
+        f"branchRosters/{BRANCH}",
+        f"{ROSTER_CHUNKS}/chunk_0",
+        f"{ROSTER_CHUNKS}/chunk_1",
+    )
+
+    # Students created after the rebuild land in the roster with their own batch.
+    created = client.post("/students", json=_student("Meera")).json()
+    names = {item["id"]: item["name"] for item in client.get("/students").json()}
+    assert names[created["id"]] == "Meera" and len(names) == 4
+
+
+def test_missing_roster_falls_back_to_query_and_rebuilds(fake_firestore) -> None:
+    now = datetime.now(timezone.utc)
+    fake_firestore._store["students"] = {
+        f"s{idx}": {**_student(f"S{idx}"), "createdAt": now} for idx in range(5)
+    }
+
+    students = asyncio.run(list_students(BRANCH))
+
+    assert sorted(student.id for student in students) == [f"s{idx}" for idx in range(5)]
+    meta = fake_firestore._store["branchRosters"][BRANCH]
+    assert (meta["complete"], meta["chunks"]) == (True, 2)
+    chunks = fake_firestore._store[ROSTER_CHUNKS]
+    assert sum(len(chunk["students"]) for chunk in chunks.values()) == 5
+
+    # Served from the roster now, so a student written around the service stays hidden.
+    fake_firestore._store["students"]["s_raw"] = {**_student("Raw"), "createdAt": now}
+    assert [student.id for student in asyncio.run(list_students(BRANCH))] == [f"s{idx}" for idx in range(5)]
+
+
+def test_collection_student_writes_keep_the_roster(client: TestClient, fake_firestore) -> None:
+    fake_firestore._store["branches"] = {BRANCH: {"name": "Main"}, "branch_north": {"name": "North"}}
+    asyncio.run(rebuild_roster(BRANCH))
+    student = {
+        "id": "st_col",
+        "firstName": "Ananya",
+        "lastName": "Sharma",
+        "branchId": BRANCH,
+        "status": "active",
+        "contact": {"phone": "+91-98888-33333"},
+    }
+
+    assert client.post("/collections/students", json=student).status_code == 200
+    client.post("/collections/students:batchCreate", json=[{**student, "id": "st_bulk", "firstName": "Bulk"}])
+    listed = {item["id"]: item for item in client.get("/students").json()}
+    assert listed["st_col"]["name"] == "Ananya Sharma"
+    assert listed["st_col"]["guardianPhone"] == "+91-98888-33333"
+    assert listed["st_bulk"]["name"] == "Bulk Sharma"
+
+    assert client.patch("/collections/students/st_col", json={"lastName": "Rao"}).status_code == 200
+    assert client.patch("/collections/students/st_col", json={"contact.phone": "+91-97777-44444"}).status_code == 200
+    listed = {item["id"]: item for item in client.get("/students").json()}
+    assert (listed["st_col"]["name"], listed["st_col"]["guardianPhone"]) == ("Ananya Rao", "+91-97777-44444")
+
+    # Moving branches (an unscoped admin) takes the entry off the old roster.
+    asyncio.run(update_document("students", "st_col", {"branchId": "branch_north"}, ADMIN))
+    assert "st_col" not in {item["id"] for item in client.get("/students").json()}
+    north = fake_firestore._store["branchRosters/branch_north/chunks"]
+    assert any("st_col" in chunk["students"] for chunk in north.values())
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import asyncio
+from typing import Any
+
+from fastapi.testclient import TestClient
+
+from backend.services.summaries import rebuild_summaries
+
+
+def _seed(store: dict[str, dict[str, dict[str, Any]]]) -> None:
+    store["students"] = {"s1": {"firstName": "Asha"}, "s2": {"firstName": "Ravi"}}
+    store["batches"] = {"b1": {"name": "Morning"}}
+    store["staff"] = {"staff_1": {"name": "Lead"}}
+
+
+def _record(student_id: str, session_date: str, status: str, **extra: Any) -> dict[str, Any]:
+    return {
+        "studentId": student_id,
+        "batchId": "b1",
+        "sessionDate": session_date,
+        "status": status,
+        "recordedBy": "staff_1",
+        "recordedAt": session_date,
+        **extra,
+    }
+
+
+def _counts(summary: dict[str, Any]) -> tuple[int, int, int]:
+    return summary["presentCount"], summary["absentCount"], summary["lateCount"]
+
+
+def test_attendance_writes_maintain_summaries(client: TestClient, fake_firestore) -> None:
+    store = fake_firestore._store
+    _seed(store)
+
+    created = client.post("/collections/attendanceRecords", json=_record("s1", "2025-04-01", "present", id="r1"))
+    assert created.status_code == 200, created.text
+    batch = client.post(
+        "/collections/attendanceRecords:batchCreate",
+        json=[
+            _record("s1", "2025-04-02", "absent", id="r2"),
+            _record("s1", "2025-04-03", "present", id="r3"),
+            _record("s2", "2025-05-01", "late", id="r4"),
+            _record("s2", "2025-05-02", "excused", id="r5"),
+        ],
+    )
+    assert batch.json()["created"] == 4
+    # Records and their increments share one batch commit.
+    assert fake_firestore.commits[-1] == 6
+
+    summaries = store["attendanceSummaries"]
+    assert set(summaries) == {"s1_b1_2025-04", "s2_b1_2025-05"}
+    april = summaries["s1_b1_2025-04"]
+    assert (april["studentId"], april["batchId"], april["year"], april["month"]) == ("s1", "b1", 2025, 4)
+    assert _counts(april) == (2, 1, 0)
+    assert _counts(summaries["s2_b1_2025-05"]) == (0, 0, 1)
+
+    duplicate = client.post("/collections/attendanceRecords", json=_record("s1", "2025-04-01", "present", id="r1"))
+    assert duplicate.status_code == 409
+    assert _counts(summaries["s1_b1_2025-04"]) == (2, 1, 0)
+
+    moved = client.patch("/collections/attendanceRecords/r2", json={"status": "late"})
+    assert moved.status_code == 200, moved.text
+    assert _counts(summaries["s1_b1_2025-04"]) == (2, 0, 1)
+
+    client.patch("/collections/attendanceRecords/r3", json={"sessionDate": "2025-05-30"})
+    assert _counts(summaries["s1_b1_2025-04"]) == (1, 0, 1)
+    assert _counts(summaries["s1_b1_2025-05"]) == (1, 0, 0)
+
+    commits = len(fake_firestore.commits)
+    assert client.patch("/collections/attendanceRecords/r1", json={"notes": "on time"}).status_code == 200
+    assert len(fake_firestore.commits) == commits
+
+
+def test_rebuild_summaries_recomputes_from_records(client: TestClient, fake_firestore) -> None:
+    store = fake_firestore._store
+    _seed(store)
+    client.post(
+        "/collections/attendanceRecords:batchCreate",
+        json=[_record("s1", f"2025-04-{day:02d}", "present") for day in range(1, 21)]
+        + [_record("s2", "2025-04-01", "absent")],
+    )
+    expected = {doc_id: _counts(summary) for doc_id, summary in store["attendanceSummaries"].items()}
+
+    store["attendanceSummaries"]["s1_b1_2025-04"]["presentCount"] = 99
+    store["attendanceSummaries"]["ghost_b1_2024-01"] = {"presentCount": 3, "absentCount": 0, "lateCount": 0}
+
+    result = asyncio.run(rebuild_summaries("attendanceRecords", page_size=7))
+
+    assert result == {"records": 21, "summaries": 2, "deleted": 1, "batches": 1}
+    assert {doc_id: _counts(summary) for doc_id, summary in store["attendanceSummaries"].items()} == expected
+    assert expected == {"s1_b1_2025-04": (20, 0, 0), "s2_b1_2025-04": (0, 1, 0)}
@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import datetime
+import threading
+import time
+from typing import Any
+
+import pytest
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from google.auth import crypt, jwt
+
+from backend.deps.token_verifier import (
+    FirebaseTokenVerifier,
+    SigningKeyStore,
+    SigningKeysUnavailableError,
+    TokenVerificationError,
+    parse_max_age,
+)
+
+PROJECT_ID = "demo-project"
+
+
+class LocalKeyServer:
+    """Stand-in for the Google certificate endpoint backed by local RSA keys."""
+
+    def __init__(self, max_age: float | None = 3600.0) -> None:
+        self.max_age = max_age
+        self.fetches = 0
+        self._keys: dict[str, tuple[str, str]] = {}
+
+    def add_key(self, kid: str) -> None:
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        subject = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, kid)])
+        now = datetime.datetime.now(datetime.timezone.utc)
+        cert = (
+            x509.CertificateBuilder()
+            .subject_name(subject)
+            .issuer_name(subject)
+            .public_key(key.public_key())
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now - datetime.timedelta(days=1))
+            .not_valid_after(now + datetime.timedelta(days=1))
+            .sign(key, hashes.SHA256())
+        )
+        private_pem = key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ).decode()
+        cert_pem = cert.public_bytes(serialization.Encoding.PEM).decode()
+        self._keys[kid] = (private_pem, cert_pem)
+
+    def fetch(self) -> tuple[dict[str, str], float | None]:
+        self.fetches += 1
+        return {kid: cert for kid, (_, cert) in self._keys.items()}, self.max_age
+
+    def sign(self, kid: str, **overrides: Any) -> str:
+        now = int(time.time())
+        claims = {
+            "iss": f"https://securetoken.google.com/{PROJECT_ID}",
+            "aud": PROJECT_ID,
+            "sub": "user-123",
+            "iat": now,
+            "exp": now + 3600,
+            "roles": ["staff"],
+        }
+        claims.update(overrides)
+        signer = crypt.RSASigner.from_string(self._keys[kid][0], key_id=kid)
+        return jwt.encode(signer, claims).decode()
+
+
+@pytest.fixture
+def key_server() -> LocalKeyServer:
+    server = LocalKeyServer()
+    server.add_key("key-1")
+    return server
+
+
+def test_verifies_token_with_in_memory_keys(key_server: LocalKeyServer) -> None:
+    store = SigningKeyStore(key_server.fetch)
+    verifier = FirebaseTokenVerifier(PROJECT_ID, store)
+    store.refresh()
+
+    claims = verifier.verify(key_server.sign("key-1"))
+    verifier.verify(key_server.sign("key-1", sub="user-456"))
+
+    assert claims["uid"] == "user-123"
+    assert claims["roles"] == ["staff"]
+    assert key_server.fetches == 1
+
+
+@pytest.mark.parametrize(
+    "overrides",
+    [
+        {"aud": "other-project"},
+        {"iss": "https://securetoken.google.com/other-project"},
+        {"sub": ""},
+        {"iat": int(time.time()) - 7200, "exp": int(time.time()) - 3600},
+    ],
+)
+def test_rejects_tokens_with_bad_claims(key_server: LocalKeyServer, overrides: dict[str, Any]) -> None:
+    store = SigningKeyStore(key_server.fetch)
+    store.refresh()
+    verifier = FirebaseTokenVerifier(PROJECT_ID, store)
+
+    with pytest.raises(TokenVerificationError):
+        verifier.verify(key_server.sign("key-1", **overrides))
+
+
+def test_unknown_key_requests_background_refresh(key_server: LocalKeyServer) -> None:
+    store = SigningKeyStore(key_server.fetch)
+    verifier = FirebaseTokenVerifier(PROJECT_ID, store)
+    store.refresh()
+
+    key_server.add_key("key-2")
+    try:
+        with pytest.raises(TokenVerificationError):
+            verifier.verify(key_server.sign("key-2"))
+        deadline = time.time() + 5
+        while "key-2" not in store.certs() and time.time() < deadline:
+            time.sleep(0.01)
+        assert key_server.fetches == 2
+    finally:
+        store.stop()
+
+
+def test_cold_or_expired_keys_never_fetch_inline(key_server: LocalKeyServer) -> None:
+    caller = threading.current_thread()
+    fetched_on: list[threading.Thread] = []
+
+    def _fetch() -> tuple[dict[str, str], float | None]:
+        fetched_on.append(threading.current_thread())
+        return key_server.fetch()
+
+    now = [time.time()]
+    store = SigningKeyStore(_fetch, clock=lambda: now[0])
+    verifier = FirebaseTokenVerifier(PROJECT_ID, store)
+    try:
+        with pytest.raises(SigningKeysUnavailableError):
+            verifier.verify(key_server.sign("key-1"))
+        deadline = time.time() + 5
+        while store.expires_at == 0.0 and time.time() < deadline:
+            time.sleep(0.01)
+        assert verifier.verify(key_server.sign("key-1"))["uid"] == "user-123"
+        assert fetched_on and caller not in fetched_on
+
+        store.stop()
+        now[0] = store.expires_at + 1
+        with pytest.raises(SigningKeysUnavailableError, match="expired"):
+            store.certs()
+    finally:
+        store.stop()
+
+
+def test_refresh_schedule_honours_cache_control(key_server: LocalKeyServer) -> None:
+    now = [1000.0]
+    key_server.max_age = 600
+    store = SigningKeyStore(key_server.fetch, clock=lambda: now[0], refresh_margin=120)
+    store.refresh()
+
+    assert store.expires_at == 1600.0
+    assert store.next_refresh == 1480.0
+    assert parse_max_age("public, max-age=19302, must-revalidate") == 19302.0
+    assert parse_max_age("no-cache") is None
+
+
+def test_background_refresher_rotates_keys(key_server: LocalKeyServer) -> None:
+    key_server.max_age = 0.2
+    store = SigningKeyStore(key_server.fetch, refresh_margin=0.1)
+    verifier = FirebaseTokenVerifier(PROJECT_ID, store)
+    store.start()
+    try:
+        key_server.add_key("key-2")
+        deadline = time.time() + 5
+        while "key-2" not in store.certs() and time.time() < deadline:
+            time.sleep(0.05)
+        assert verifier.verify(key_server.sign("key-2"))["uid"] == "user-123"
+    finally:
+        store.stop()
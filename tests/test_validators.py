@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+from backend.services.collections import COLLECTION_DEFINITIONS, PathAccessor, ValidationError
+from benchmarks.validation import (
+    check_relationships,
+    extract_values,
+    guardian_payload,
+    notification_payload,
+    relationship_references,
+    validate_required_fields,
+)
+
+
+def _interpreted_error(collection: str, payload: dict[str, Any], existing: set) -> str | None:
+    definition = COLLECTION_DEFINITIONS[collection]
+    try:
+        validate_required_fields(definition, payload)
+        check_relationships(definition, payload, existing)
+    except ValidationError as exc:
+        return str(exc)
+    return None
+
+
+def _compiled_error(collection: str, payload: dict[str, Any], existing: set) -> str | None:
+    validator = COLLECTION_DEFINITIONS[collection].validator
+    try:
+        validator.validate(payload)
+        validator.check_relationships(payload, existing)
+    except ValidationError as exc:
+        return str(exc)
+    return None
+
+
+@pytest.mark.parametrize(
+    "path",
+    ["studentIds[]", "guardianLinks[].guardianId", "recipient.id", "branchRoles[].branchId", "missing.path"],
+)
+def test_path_accessor_matchesextract_values(path: str) -> None:
+    payload = {
+        "studentIds": ["s1", None, "s2"],
+        "guardianLinks": [{"guardianId": "g1"}, {"relationship": "Mother"}, "junk", {"guardianId": ""}],
+        "recipient": {"id": "staff_1"},
+        "branchRoles": "not-a-list",
+    }
+    assert PathAccessor(path).values(payload) == extract_values(payload, path)
+
+
+def test_compiled_validator_agrees_with_interpreted_path() -> None:
+    guardian = guardian_payload(50)
+    notification = notification_payload(5)
+    cases = [
+        ("guardians", guardian),
+        ("guardians", {**guardian, "studentIds": guardian["studentIds"] + ["ghost"]}),
+        ("guardians", {key: value for key, value in guardian.items() if key != "email"}),
+        ("guardians", {**guardian, "studentIds": ["s1", 7]}),
+        ("notifications", notification),
+        ("notifications", {**notification, "recipient": {"id": "nobody"}}),
+    ]
+    for collection, payload in cases:
+        definition = COLLECTION_DEFINITIONS[collection]
+        existing = {
+            (target, doc_id)
+            for target, ids in relationship_references(definition, guardian_payload(50)).items()
+            for doc_id in ids
+        } | {("guardians", "guardian_00001")}
+        assert definition.validator.references(payload) == relationship_references(definition, payload)
+        assert _compiled_error(collection, payload, existing) == _interpreted_error(collection, payload, existing)
+
+
+def test_compiled_validator_checks_declared_field_types() -> None:
+    validator = COLLECTION_DEFINITIONS["invoices"].validator
+    invoice = {
+        "enrollmentId": "e1",
+        "billingPeriod": "2025-04",
+        "issueDate": "2025-04-01",
+        "dueDate": "2025-04-10",
+        "status": "due",
+        "totalAmount": 15000,
+    }
+    validator.validate(invoice)
+    validator.validate({**invoice, "totalAmount": 149.5})
+
+    with pytest.raises(ValidationError, match="'totalAmount': expected number"):
+        validator.validate({**invoice, "totalAmount": "15000"})
+    with pytest.raises(ValidationError, match="'dueDate': expected date"):
+        validator.validate({**invoice, "dueDate": "next week"})
+    with pytest.raises(ValidationError, match="'studentIds': expected array"):
+        COLLECTION_DEFINITIONS["guardians"].validator.validate({**guardian_payload(1), "studentIds": "s1"})